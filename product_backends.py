@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Storage Backends
+Where the catalog is kept: data/products.json or an SQLite database
+
+Both backends offer the same operations:
+
+- get(product_id), query(category=..., product_type=..., out_of_stock=...)
+  and all(), returning full products in catalog order
+- transaction(): a context manager yielding an object with the ProductStore
+  editing methods (get, put, create, update, delete and `in`); everything
+  done inside it is committed together, or not at all if it raises
+- backup(note) / restore(snapshot_id) through the BackupStore
+- export_json(path), writing products.json for the Node side
+
+With memory mode 'columnar' (PRODUCTS_MEMORY_MODE=columnar, as for the
+GUI, or --memory-mode) the products a command loads are packed into a
+ColumnarCatalog instead of one dict each, for 512 MB hosts; other modes
+keep dicts.
+
+JsonBackend is the products.json file the GUI and the Node servers share.
+Every call reads the whole file (plus the change journal), and a
+transaction rewrites it under the products.json lock, so the cost of each
+operation grows with the catalog.
+
+SqliteBackend keeps one row per product in data/products.db, in WAL mode so
+readers are never blocked by a writer. The full product is stored as JSON
+next to indexed id, category, productType and stock columns, so a lookup
+by ID, a category or type listing and an out-of-stock query are index
+searches, and editing a product rewrites one row. migrate_json() copies
+products.json in once, streamed and in a single transaction, and
+export_json() writes exactly what the manager writes to products.json.
+"""
+
+import contextlib
+import json
+import os
+from datetime import datetime
+
+from product_io import FileLock
+from product_store import (BACKENDS, BACKUP_DIR, PRODUCTS_DB, PRODUCTS_FILE, ProductStore, as_dict,
+                           encode_catalog, generate_product_id, load_catalog, product_key, save_catalog,
+                           stock_level)
+
+# Products inserted per executemany() call while migrating
+MIGRATE_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY,
+    id TEXT,
+    category TEXT,
+    product_type TEXT,
+    stock REAL NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_by_id ON products (id);
+CREATE INDEX IF NOT EXISTS products_by_category ON products (category, position);
+CREATE INDEX IF NOT EXISTS products_by_type ON products (product_type, position);
+CREATE INDEX IF NOT EXISTS products_by_stock ON products (stock);
+CREATE INDEX IF NOT EXISTS products_by_position ON products (position);
+"""
+
+
+def is_out_of_stock(product):
+    """True for products the list shows as 'Out of Stock'"""
+    stock = stock_level(product)
+    return not stock or stock <= 0
+
+
+def open_backend(kind=None, products_file=PRODUCTS_FILE, db_path=PRODUCTS_DB, memory_mode=None):
+    """Open the backend named by `kind` or $PRODUCTS_BACKEND (default: json)"""
+    kind = kind or os.environ.get('PRODUCTS_BACKEND') or 'json'
+    compact = os.environ.get('PRODUCTS_COMPACT_JSON') == '1'
+    columnar = (memory_mode or os.environ.get('PRODUCTS_MEMORY_MODE')) == 'columnar'
+    if kind == 'json':
+        return JsonBackend(products_file, compact=compact, columnar=columnar)
+    if kind == 'sqlite':
+        return SqliteBackend(db_path, compact=compact, columnar=columnar)
+    raise ValueError(f"Unknown storage backend '{kind}' (expected one of {', '.join(BACKENDS)})")
+
+
+def _backup_store(data_dir):
+    from product_backup import BackupStore
+    return BackupStore(os.path.join(data_dir, os.path.basename(BACKUP_DIR)))
+
+
+def _snapshot(backups, data, count, note):
+    """Snapshot data, or note it on the newest snapshot if that holds the same"""
+    entry = backups.snapshot(data, count=count, note=note)
+    if entry is None and note:
+        entry = backups.annotate(data, note)
+    return entry
+
+
+def _columnar_store(products):
+    """Return a ProductStore holding products packed into a ColumnarCatalog"""
+    # Imported here, so the default mode starts without it
+    from product_columnar import ColumnarCatalog
+    catalog = ColumnarCatalog()
+    store = ProductStore()
+    # Subscribed first, so duplicate IDs dropped while loading are freed too
+    catalog.track(store)
+    for product in catalog.pack(products):
+        store.delete(product_key(product))
+        store.add(product)
+    return store
+
+
+class JsonBackend:
+    """products.json with its change journal and backups"""
+
+    name = 'json'
+
+    def __init__(self, products_file=PRODUCTS_FILE, compact=False, columnar=False):
+        self.products_file = products_file
+        self.data_dir = os.path.dirname(products_file)
+        self.journal_file = os.path.join(self.data_dir, 'products.journal.jsonl')
+        self.compact = compact
+        self.columnar = columnar
+        self.journal = None
+        if self.data_dir:
+            os.makedirs(self.data_dir, exist_ok=True)
+
+    def backups(self):
+        return _backup_store(self.data_dir)
+
+    def load(self):
+        """Return a ProductStore with products.json plus any journaled changes"""
+        # load_catalog() would create a missing file, taking the lock we may hold
+        if not os.path.exists(self.products_file):
+            store = ProductStore()
+        elif self.columnar:
+            # Streamed, so the whole file is never parsed into dicts at once
+            from product_loader import stream_products
+            store = _columnar_store(product for product, _, _ in stream_products(self.products_file))
+        else:
+            store = ProductStore(load_catalog(self.products_file))
+        if os.path.exists(self.journal_file):
+            from product_journal import ChangeJournal
+            self.journal = ChangeJournal(self.journal_file)
+            self.journal.replay(store)
+        return store
+
+    def _save(self, store, backup=True):
+        """Write the store back (caller holds the lock) and compact the journal"""
+        snapshot = save_catalog(self.products_file, store.iter_full(),
+                                self.backups() if backup else None,
+                                compact=self.compact, lock=False)
+        if self.journal is not None:
+            self.journal.checkpoint()
+        return snapshot
+
+    def get(self, product_id):
+        return self.load().get(product_id)
+
+    def query(self, category=None, product_type=None, out_of_stock=False):
+        """Return products matching every given criterion"""
+        store = self.load()
+        criteria = {}
+        if category is not None:
+            criteria['category'] = category
+        if product_type is not None:
+            criteria['productType'] = product_type
+        products = store.filter(**criteria) if criteria else store.all()
+        if out_of_stock:
+            products = [p for p in products if is_out_of_stock(p)]
+        return products
+
+    def all(self):
+        return self.load().all()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Yield the catalog as a ProductStore and save it afterwards if it changed"""
+        with FileLock(self.products_file):
+            store = self.load()
+            changes = []
+            store.subscribe(lambda op, key, old, new: changes.append(key))
+            yield store
+            if changes:
+                self._save(store)
+
+    def replace_all(self, products):
+        """Replace the whole catalog"""
+        with FileLock(self.products_file):
+            self.load()
+            save_catalog(self.products_file, products, self.backups(), compact=self.compact, lock=False)
+            if self.journal is not None:
+                self.journal.checkpoint()
+
+    def backup(self, note=''):
+        """Snapshot products.json and return the entry
+
+        Returns None if it matches the newest snapshot, unless a note is
+        given: then the note is added to that snapshot and it is returned.
+        """
+        with FileLock(self.products_file):
+            store = self.load()
+            # Fold journaled edits in first, so the backup (and its note) has them
+            pending = self.journal is not None and self.journal.pending
+            if pending or not os.path.exists(self.products_file):
+                self._save(store, backup=False)
+            with open(self.products_file, 'rb') as f:
+                data = f.read()
+            return _snapshot(self.backups(), data, len(store), note)
+
+    def restore(self, snapshot_id):
+        """Replace products.json with a backup snapshot"""
+        self.backups().restore(snapshot_id, self.products_file)
+        # Changes journaled since the last save belong to the replaced catalog
+        if os.path.exists(self.journal_file):
+            from product_journal import ChangeJournal
+            ChangeJournal(self.journal_file).checkpoint()
+
+    def export_json(self, path=None):
+        """Write the catalog to path in products.json format, returning the count
+
+        For products.json itself (the default) this folds the journal in.
+        """
+        path = path or self.products_file
+        with FileLock(self.products_file):
+            store = self.load()
+            if os.path.abspath(path) == os.path.abspath(self.products_file):
+                self._save(store)
+                return len(store)
+        save_catalog(path, store.iter_full(), compact=self.compact)
+        return len(store)
+
+    def close(self):
+        pass
+
+
+class SqliteBackend:
+    """One indexed row per product in an SQLite database (WAL mode)"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path=PRODUCTS_DB, compact=False, timeout=10.0, columnar=False):
+        self.db_path = db_path
+        self.data_dir = os.path.dirname(db_path)
+        self.compact = compact
+        self.columnar = columnar
+        if self.data_dir:
+            os.makedirs(self.data_dir, exist_ok=True)
+
+        # Autocommit mode; transaction() issues BEGIN/COMMIT itself
+        # Imported here, so the json backend (and the CLI) starts without it
+        import sqlite3
+        self.conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._depth = 0
+
+    def backups(self):
+        return _backup_store(self.data_dir)
+
+    def close(self):
+        self.conn.close()
+
+    # Reading
+
+    def _find(self, product_id):
+        """Return (key, data) of the row with this _id or id, or None"""
+        if product_id is None:
+            return None
+        product_id = str(product_id)
+        row = self.conn.execute('SELECT key, data FROM products WHERE key = ?', (product_id,)).fetchone()
+        if row is None:
+            row = self.conn.execute('SELECT key, data FROM products WHERE id = ? LIMIT 1',
+                                    (product_id,)).fetchone()
+        return row
+
+    def __contains__(self, product_id):
+        return self._find(product_id) is not None
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+
+    def get(self, product_id):
+        """Return the product with the given _id or id, or None"""
+        row = self._find(product_id)
+        return json.loads(row[1]) if row is not None else None
+
+    def query(self, category=None, product_type=None, out_of_stock=False):
+        """Return products matching every given criterion, in catalog order"""
+        clauses = []
+        params = []
+        if category is not None:
+            clauses.append('category = ?')
+            params.append(category)
+        if product_type is not None:
+            clauses.append('product_type = ?')
+            params.append(product_type)
+        if out_of_stock:
+            clauses.append('stock <= 0')
+        sql = 'SELECT data FROM products'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        # Unary + keeps SQLite from scanning the position index to avoid a
+        # sort; the few matching rows are sorted instead
+        sql += ' ORDER BY +position' if out_of_stock else ' ORDER BY position'
+        products = (json.loads(data) for data, in self.conn.execute(sql, params))
+        if self.columnar:
+            from product_columnar import ColumnarCatalog
+            return list(ColumnarCatalog(products))
+        return list(products)
+
+    def all(self):
+        return self.query()
+
+    def iter_all(self):
+        """Iterate products in catalog order without holding them all in memory"""
+        for data, in self.conn.execute('SELECT data FROM products ORDER BY position'):
+            yield json.loads(data)
+
+    # Writing
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Group writes into one transaction; nested calls join the outer one"""
+        if self._depth == 0:
+            # IMMEDIATE takes the write lock now, like the products.json FileLock
+            self.conn.execute('BEGIN IMMEDIATE')
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self.conn.execute('ROLLBACK')
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self.conn.execute('COMMIT')
+
+    @staticmethod
+    def _columns(key, product):
+        category = product.get('category')
+        product_type = product.get('productType')
+        return (
+            key,
+            product.get('id') if isinstance(product.get('id'), str) else None,
+            category if isinstance(category, str) else None,
+            product_type if isinstance(product_type, str) else None,
+            # Missing or non-numeric stock counts as out of stock
+            stock_level(product) or 0,
+            json.dumps(as_dict(product), ensure_ascii=False, separators=(',', ':')),
+        )
+
+    def put(self, product):
+        """Insert a product or replace the stored one with the same _id/id"""
+        key = product_key(product)
+        if not key:
+            raise ValueError("Product has no _id or id")
+        with self.transaction():
+            row = self._find(key)
+            if row is not None:
+                key = row[0]
+            self.conn.execute(
+                'INSERT INTO products (key, id, category, product_type, stock, data, position) '
+                'VALUES (?, ?, ?, ?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM products)) '
+                'ON CONFLICT (key) DO UPDATE SET id = excluded.id, category = excluded.category, '
+                'product_type = excluded.product_type, stock = excluded.stock, data = excluded.data',
+                self._columns(key, product),
+            )
+        return product
+
+    def create(self, product_data):
+        """Create a new product with a fresh ID and timestamps"""
+        product = dict(product_data)
+        product['_id'] = generate_product_id()
+        product['id'] = product['_id']
+        now = datetime.now().isoformat()
+        product['createdAt'] = now
+        product['updatedAt'] = now
+        return self.put(product)
+
+    def update(self, product_id, changes, touch=True):
+        """Merge changes into an existing product and return the new record"""
+        with self.transaction():
+            old = self.get(product_id)
+            if old is None:
+                raise KeyError(product_id)
+            updated = {**old, **changes}
+            if touch:
+                updated['updatedAt'] = datetime.now().isoformat()
+            return self.put(updated)
+
+    def delete(self, product_id):
+        """Remove a product and return it, or None if it does not exist"""
+        with self.transaction():
+            row = self._find(product_id)
+            if row is None:
+                return None
+            self.conn.execute('DELETE FROM products WHERE key = ?', (row[0],))
+        return json.loads(row[1])
+
+    def replace_all(self, products):
+        """Replace the whole catalog, returning the number of products"""
+        count = 0
+        with self.transaction():
+            self.conn.execute('DELETE FROM products')
+            batch = []
+            for product in products:
+                key = product_key(product)
+                if not key:
+                    key = generate_product_id()
+                    product = {**product, '_id': key, 'id': key}
+                count += 1
+                batch.append(self._columns(key, product) + (count,))
+                if len(batch) >= MIGRATE_BATCH:
+                    self._insert(batch)
+                    batch = []
+            self._insert(batch)
+        # Fresh statistics let the planner choose between the indexes
+        self.conn.execute('ANALYZE')
+        return count
+
+    def _insert(self, rows):
+        # Duplicate IDs in a hand-edited file: the last record wins, as when loading
+        self.conn.executemany(
+            'INSERT INTO products (key, id, category, product_type, stock, data, position) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET id = excluded.id, category = excluded.category, '
+            'product_type = excluded.product_type, stock = excluded.stock, data = excluded.data',
+            rows,
+        )
+
+    def migrate_json(self, products_file=PRODUCTS_FILE):
+        """One-shot copy of products.json into the database, returning the count"""
+        from product_loader import stream_products
+        return self.replace_all(product for product, _, _ in stream_products(products_file))
+
+    # Backups and export
+
+    def backup(self, note=''):
+        """Snapshot the catalog in products.json format (see JsonBackend.backup)"""
+        # One SELECT reads a consistent snapshot, even while others write
+        data, count = encode_catalog(self.iter_all(), compact=self.compact)
+        return _snapshot(self.backups(), data, count, note)
+
+    def restore(self, snapshot_id):
+        """Replace the catalog with a backup snapshot"""
+        self.replace_all(self.backups().load_snapshot(snapshot_id))
+
+    def export_json(self, path=None):
+        """Write products.json for the GUI and the Node side, returning the count
+
+        Defaults to the products.json next to the database, which is backed
+        up like a GUI save; edits made there since are snapshotted first.
+        """
+        products_file = os.path.join(self.data_dir, os.path.basename(PRODUCTS_FILE))
+        path = path or products_file
+        backups = self.backups() if os.path.abspath(path) == os.path.abspath(products_file) else None
+        products = self.all()
+        save_catalog(path, products, backups, compact=self.compact)
+        return len(products)
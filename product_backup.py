@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Backups
+Content-addressed, compressed snapshots of products.json with retention
+
+Each distinct version of the catalog is stored once, gzipped, under
+`objects/<hash[:2]>/<hash>.json.gz` and referenced from `manifest.json`.
+Saving unchanged data adds nothing, and old snapshots are pruned by a
+keep-last / hourly / daily retention policy so the directory stays bounded.
+
+The full `products_backup_<timestamp>.json` copies older versions of the
+manager left in the same directory are folded in by migrate_legacy(), as
+snapshots dated by their file names, and then deleted.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from datetime import datetime
+
+from product_io import FileLock, atomic_write_bytes, atomic_write_json
+from product_store import decode_catalog, product_key
+
+MANIFEST_VERSION = 1
+
+# Full copies written before the snapshot store, e.g. products_backup_20250825_221114.json
+LEGACY_BACKUP = re.compile(r'products_backup_(\d{8}_\d{6})\.json$')
+
+
+class BackupStore:
+    """Deduplicated snapshot store for products.json
+
+    Retention keeps the `keep_last` newest snapshots, plus the newest
+    snapshot of each of the last `keep_hourly` hours and `keep_daily` days
+    that have one. Pass 0 to disable a rule.
+    """
+
+    def __init__(self, backup_dir, keep_last=20, keep_hourly=24, keep_daily=30, compress_level=6):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, 'objects')
+        self.manifest_file = os.path.join(backup_dir, 'manifest.json')
+        self.keep_last = keep_last
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.compress_level = compress_level
+
+    # Manifest
+
+    def _read_manifest(self):
+        """Load the manifest, or an empty one"""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        manifest.setdefault('version', MANIFEST_VERSION)
+        manifest.setdefault('snapshots', [])
+        manifest.setdefault('source', {})
+        return manifest
+
+    def _write_manifest(self, manifest):
+        atomic_write_json(self.manifest_file, manifest)
+
+    # Objects
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.json.gz")
+
+    def _store_object(self, digest, data):
+        """Write compressed content for a hash unless it is already stored"""
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # mtime=0 keeps the gzip output deterministic for identical content
+        atomic_write_bytes(path, gzip.compress(data, compresslevel=self.compress_level, mtime=0))
+
+    def _read_object(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            return gzip.decompress(f.read())
+
+    # Snapshots
+
+    def snapshot(self, data, count=None, note=''):
+        """Store the given products.json bytes and return the snapshot entry
+
+        Returns None without writing anything if the content is identical
+        to the newest snapshot.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+        with FileLock(self.manifest_file):
+            manifest = self._read_manifest()
+            snapshots = manifest['snapshots']
+            if snapshots and snapshots[-1]['hash'] == digest:
+                return None
+
+            self._store_object(digest, data)
+
+            now = datetime.now()
+            snapshot_id = now.strftime("%Y%m%d_%H%M%S_%f")
+            if snapshots and snapshots[-1]['id'] >= snapshot_id:
+                # Clock went backwards or two snapshots in the same microsecond
+                snapshot_id = f"{snapshots[-1]['id']}_{digest[:8]}"
+            entry = {
+                'id': snapshot_id,
+                'hash': digest,
+                'created': now.isoformat(),
+                'size': len(data),
+                'products': count,
+                'note': note,
+            }
+            snapshots.append(entry)
+
+            self._apply_retention(manifest)
+            self._write_manifest(manifest)
+            return entry
+
+    def migrate_legacy(self):
+        """Turn old products_backup_<timestamp>.json copies into snapshots, returning how many
+
+        Each becomes a snapshot noted 'legacy backup' and dated by its file
+        name, so retention prunes them like any other; a file is deleted
+        once the manifest refers to its content.
+        """
+        try:
+            names = sorted(name for name in os.listdir(self.backup_dir) if LEGACY_BACKUP.match(name))
+        except FileNotFoundError:
+            return 0
+        if not names:
+            return 0
+
+        with FileLock(self.manifest_file):
+            manifest = self._read_manifest()
+            snapshots = manifest['snapshots']
+            ids = {s['id'] for s in snapshots}
+            for name in names:
+                with open(os.path.join(self.backup_dir, name), 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                self._store_object(digest, data)
+                try:
+                    count = len(decode_catalog(json.loads(data.decode('utf-8'))))
+                except (ValueError, AttributeError):
+                    # Kept as it is; restoring it gives back the same bytes
+                    count = None
+
+                created = datetime.strptime(LEGACY_BACKUP.match(name).group(1), "%Y%m%d_%H%M%S")
+                snapshot_id = created.strftime("%Y%m%d_%H%M%S_%f")
+                if snapshot_id in ids:
+                    snapshot_id = f"{snapshot_id}_{digest[:8]}"
+                ids.add(snapshot_id)
+                snapshots.append({
+                    'id': snapshot_id,
+                    'hash': digest,
+                    'created': created.isoformat(),
+                    'size': len(data),
+                    'products': count,
+                    'note': 'legacy backup',
+                })
+
+            snapshots.sort(key=lambda s: s['id'])
+            self._apply_retention(manifest)
+            self._write_manifest(manifest)
+
+        for name in names:
+            os.remove(os.path.join(self.backup_dir, name))
+        return len(names)
+
+    def annotate(self, data, note):
+        """Add a note to the newest snapshot if it holds exactly `data`
+
+        For a backup asked for with a note when nothing changed since the
+        newest snapshot. Returns the updated entry, or None if the newest
+        snapshot holds something else.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        with FileLock(self.manifest_file):
+            manifest = self._read_manifest()
+            snapshots = manifest['snapshots']
+            if not snapshots or snapshots[-1]['hash'] != digest:
+                return None
+            entry = snapshots[-1]
+            if note and note != entry['note']:
+                entry['note'] = f"{entry['note']}; {note}" if entry['note'] else note
+                self._write_manifest(manifest)
+            return entry
+
+    def capture_file(self, products_file):
+        """Snapshot products_file if it changed since the last save we recorded
+
+        This catches edits made outside the manager (by hand or by a sync
+        server) before they are overwritten. The common case only costs a
+        stat() call.
+        """
+        try:
+            stat = os.stat(products_file)
+        except FileNotFoundError:
+            return None
+
+        source = self._read_manifest()['source']
+        if source.get('size') == stat.st_size and source.get('mtime_ns') == stat.st_mtime_ns:
+            return None
+
+        with open(products_file, 'rb') as f:
+            data = f.read()
+        return self.snapshot(data, note='external change')
+
+    def remember_file(self, products_file):
+        """Record the size and mtime of a file we just wrote"""
+        stat = os.stat(products_file)
+        with FileLock(self.manifest_file):
+            manifest = self._read_manifest()
+            manifest['source'] = {
+                'path': os.path.abspath(products_file),
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+            }
+            self._write_manifest(manifest)
+
+    def list_snapshots(self):
+        """Return snapshot entries, oldest first"""
+        return list(self._read_manifest()['snapshots'])
+
+    def _find(self, snapshot_id):
+        for entry in self._read_manifest()['snapshots']:
+            if entry['id'] == snapshot_id:
+                return entry
+        raise KeyError(f"Snapshot '{snapshot_id}' not found")
+
+    def read_snapshot(self, snapshot_id):
+        """Return the raw products.json bytes of a snapshot"""
+        return self._read_object(self._find(snapshot_id)['hash'])
+
+    def load_snapshot(self, snapshot_id):
+        """Return the products list stored in a snapshot"""
+        return decode_catalog(json.loads(self.read_snapshot(snapshot_id).decode('utf-8')))
+
+    def restore(self, snapshot_id, products_file):
+        """Atomically replace products_file with a snapshot
+
+        The current file is captured first, so a restore can itself be undone.
+        """
+        data = self.read_snapshot(snapshot_id)
+        with FileLock(products_file):
+            self.capture_file(products_file)
+            atomic_write_bytes(products_file, data)
+            self.remember_file(products_file)
+
+    def diff(self, old_id, new_id):
+        """Compare two snapshots by product ID
+
+        Returns {'added': [...], 'removed': [...], 'changed': [...]} lists of
+        product IDs.
+        """
+        def by_key(products):
+            return {product_key(p): p for p in products}
+
+        old = by_key(self.load_snapshot(old_id))
+        new = by_key(self.load_snapshot(new_id))
+        return {
+            'added': [k for k in new if k not in old],
+            'removed': [k for k in old if k not in new],
+            'changed': [k for k in new if k in old and new[k] != old[k]],
+        }
+
+    # Retention
+
+    def _apply_retention(self, manifest):
+        """Drop snapshots outside the retention policy and unreferenced objects"""
+        snapshots = manifest['snapshots']
+        keep = set()
+
+        newest_first = list(reversed(snapshots))
+        if self.keep_last:
+            keep.update(s['id'] for s in newest_first[:self.keep_last])
+
+        for limit, bucket_format in ((self.keep_hourly, "%Y%m%d%H"), (self.keep_daily, "%Y%m%d")):
+            seen = set()
+            for entry in newest_first:
+                if len(seen) >= limit:
+                    break
+                bucket = datetime.fromisoformat(entry['created']).strftime(bucket_format)
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(entry['id'])
+
+        removed = [s for s in snapshots if s['id'] not in keep]
+        manifest['snapshots'] = [s for s in snapshots if s['id'] in keep]
+
+        referenced = {s['hash'] for s in manifest['snapshots']}
+        for entry in removed:
+            if entry['hash'] not in referenced:
+                try:
+                    os.remove(self._object_path(entry['hash']))
+                except FileNotFoundError:
+                    pass
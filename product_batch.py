@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Batch Edits
+Price, stock and status changes (or deletes) for many products in one pass
+
+A BatchEdit holds the changes to make, e.g. price +10%, stock = 0 and
+deactivate. Like an ImportPlan, plan() works out the new version of every
+product without touching the catalog, so the result can be reviewed, and
+apply() then writes it. A batch is all or nothing: if a product would end
+up invalid (a negative price, say) nothing is applied, and if writing
+fails halfway the products already changed are put back.
+
+Price and stock adjustments are written the way a user types them:
+
+- `1499` or `=1499` sets the value
+- `+100` / `-100` adds or subtracts
+- `+10%` / `-10%` changes the price by a percentage (not for stock)
+
+apply() returns the (key, old, new) triples it wrote, with new None for a
+deleted product; revert() undoes them.
+"""
+
+from datetime import datetime
+
+from product_store import ValidationError, as_dict, price_level, product_key, stock_level
+
+# Status changes offered for a batch, as the isActive value they set
+STATUS_CHANGES = {'activate': True, 'deactivate': False}
+
+
+def parse_adjustment(text, field='price'):
+    """Parse a typed adjustment into (op, amount), or None if the text is empty
+
+    op is 'set', 'add' or 'percent'. Percentages are only accepted for price,
+    and stock amounts must be whole numbers.
+    """
+    text = text.strip().replace('₹', '').replace(',', '')
+    if not text:
+        return None
+
+    op = 'set'
+    if text[0] in '+-':
+        op = 'add'
+    elif text[0] == '=':
+        text = text[1:].strip()
+    if text.endswith('%'):
+        if op != 'add' or field != 'price':
+            raise ValidationError(f"Use +N% or -N% to change the {field} by a percentage"
+                                  if field == 'price' else f"The {field} cannot change by a percentage")
+        op = 'percent'
+        text = text[:-1]
+
+    try:
+        amount = float(text)
+    except ValueError:
+        raise ValidationError(f"Invalid {field} change: {text}")
+    if field == 'stock':
+        if not amount.is_integer():
+            raise ValidationError(f"Invalid {field} change: {text}")
+        amount = int(amount)
+    if op == 'set' and amount < 0:
+        raise ValidationError(f"The {field} cannot be negative")
+    return op, amount
+
+
+def describe_adjustment(field, adjustment):
+    """Return an adjustment as the user would type it, e.g. 'price +10%'"""
+    op, amount = adjustment
+    if op == 'set':
+        return f"{field} = {amount:g}"
+    sign = '+' if amount >= 0 else '-'
+    return f"{field} {sign}{abs(amount):g}{'%' if op == 'percent' else ''}"
+
+
+def _adjust(product, field, adjustment):
+    """Return the new value of price or stock after an adjustment"""
+    op, amount = adjustment
+    if op == 'set':
+        value = amount
+    else:
+        current = price_level(product) if field == 'price' else stock_level(product)
+        if current is None:
+            raise ValidationError(f"'{product.get('name', product_key(product))}' has no valid {field} to change")
+        value = current * (1 + amount / 100) if op == 'percent' else current + amount
+
+    if value < 0:
+        raise ValidationError(f"The {field} of '{product.get('name', product_key(product))}' "
+                              f"would become negative ({value:g})")
+    # Stored as the add/edit form stores them: price as a float, stock as an int
+    return round(value, 2) if field == 'price' else int(value)
+
+
+class BatchEdit:
+    """One change applied to many products, planned before it touches the catalog
+
+    Pass `price` and `stock` as parse_adjustment() results, `active` as
+    True/False to activate/deactivate, or delete=True. Call plan() with the
+    product keys, review summary()/describe()/errors, then apply().
+    """
+
+    def __init__(self, store, price=None, stock=None, active=None, delete=False):
+        self.store = store
+        self.price = price
+        self.stock = stock
+        self.active = active
+        self.delete = delete
+        # key -> (old record, new record or None to delete), in list order
+        self.changes = {}
+        self.unchanged = 0
+        self.errors = []
+        self.now = datetime.now().isoformat()
+
+    def is_empty(self):
+        return not self.delete and self.price is None and self.stock is None and self.active is None
+
+    def label(self):
+        """Short description of the change, e.g. for an undo entry"""
+        if self.delete:
+            return "delete"
+        parts = []
+        if self.price is not None:
+            parts.append(describe_adjustment('price', self.price))
+        if self.stock is not None:
+            parts.append(describe_adjustment('stock', self.stock))
+        if self.active is not None:
+            parts.append('activate' if self.active else 'deactivate')
+        return ', '.join(parts)
+
+    def plan(self, keys):
+        """Work out the new version of each product; problems go to self.errors"""
+        for key in keys:
+            if key in self.changes or key not in self.store:
+                continue
+            old = as_dict(self.store.get(key))
+            key = product_key(old)
+            if self.delete:
+                self.changes[key] = (old, None)
+                continue
+
+            new = dict(old)
+            try:
+                if self.price is not None:
+                    new['price'] = _adjust(old, 'price', self.price)
+                if self.stock is not None:
+                    new['stock'] = _adjust(old, 'stock', self.stock)
+            except ValidationError as e:
+                self.errors.append((key, str(e)))
+                continue
+            if self.active is not None:
+                new['isActive'] = self.active
+
+            if new == old:
+                self.unchanged += 1
+                continue
+            new['updatedAt'] = self.now
+            self.changes[key] = (old, new)
+        return self
+
+    def summary(self):
+        """One-line count of what the batch would do"""
+        action = "to delete" if self.delete else "to change"
+        return (f"{len(self.changes)} products {action}, {self.unchanged} unchanged, "
+                f"{len(self.errors)} with errors")
+
+    def describe(self, limit=200):
+        """Yield human-readable diff lines, at most `limit` per section"""
+        for key, (old, new) in list(self.changes.items())[:limit]:
+            if new is None:
+                yield f"- {key}  {old.get('name', '')}"
+                continue
+            for field in ('price', 'stock', 'isActive'):
+                if old.get(field) != new.get(field):
+                    yield f"~ {key}  {field}: {old.get(field)!r} -> {new.get(field)!r}"
+        for key, message in self.errors[:limit]:
+            yield f"! {key}: {message}"
+
+    def apply(self):
+        """Write the planned changes and return them as (key, old, new) triples
+
+        Refuses with ValidationError if any product had an error, so a
+        batch never applies partly.
+        """
+        if self.errors:
+            key, message = self.errors[0]
+            raise ValidationError(f"{len(self.errors)} products cannot be changed, e.g. {message}")
+
+        applied = []
+        try:
+            for key, (old, new) in self.changes.items():
+                if new is None:
+                    self.store.delete(key)
+                else:
+                    self.store.put(new)
+                applied.append((key, old, new))
+        except Exception:
+            revert(self.store, applied)
+            raise
+        return applied
+
+
+def revert(store, changes):
+    """Undo (key, old, new) triples, newest first, and return the keys skipped
+
+    A product that no longer matches `new` (edited or deleted since) is
+    left alone rather than overwritten, and its key is returned.
+    """
+    skipped = []
+    for key, old, new in reversed(changes):
+        current = store.get(key) if key in store else None
+        if (as_dict(current) if current is not None else None) != new:
+            skipped.append(key)
+        elif old is None:
+            store.delete(key)
+        else:
+            # Deleted products come back at the end of the list
+            store.put(dict(old))
+    return skipped
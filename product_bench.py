@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Benchmarks
+Repeatable timings and peak memory of the product manager's catalog work
+
+Each benchmark runs against synthetic catalogs from product_generate
+(cached under data/bench/, so every run measures the same files). It is
+timed `--repeat` times with time.perf_counter() and reported by its best
+and median run, then run once more under tracemalloc for the peak memory
+it allocated. Nothing is timed while tracemalloc is on.
+
+Benchmarks, all headless unless noted:
+
+- load / load_lazy: products.json into a ProductStore, fully or as
+  summaries behind an offset index (the GUI's large-catalog mode)
+- save: write the catalog back with save_catalog()
+- backup: one BackupStore snapshot of the encoded catalog
+- lookup: LOOKUPS random get() calls
+- sort / sort_cached: a two-column sort, cold and with cached sort values
+- search_index / search: build the inverted index, then run QUERIES (count,
+  first page and facet counts of each)
+- refresh: what refresh_product_list() does apart from drawing: sort, facet
+  counts and formatting the visible rows
+- export_csv: CSV export of the whole catalog
+- check_images: check_images() on every distinct image URL, served by a
+  stand-in HTTP server on 127.0.0.1 that answers HEAD with an image; it
+  runs in the same process, so the time includes serving the requests
+- gui_load, gui_refresh, gui_sort, gui_scroll (with --gui): the real
+  window and Treeview, which needs a display; run under a virtual one:
+
+    xvfb-run -a python3 product_bench.py --gui
+
+Results are written as JSON with -o, and --compare checks them against
+an earlier results file, exiting with status 1 on a regression.
+"""
+
+import argparse
+import gc
+import http.server
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from product_backup import BackupStore
+from product_export import export_products
+from product_generate import parse_count, write_catalog
+from product_images import check_images, product_images
+from product_loader import CatalogIndex, index_products, lazy_loading_supported
+from product_metrics import max_rss_bytes
+from product_search import FACET_FIELDS, SearchIndex
+from product_store import ProductStore, encode_catalog, load_catalog, save_catalog
+
+# Format of the results file
+RESULTS_VERSION = 1
+
+# Where generated catalogs and scratch files go
+BENCH_DIR = os.path.join('data', 'bench')
+
+# Catalog sizes and runs per benchmark unless given on the command line;
+# 1M products take minutes and several GB, so ask for them explicitly
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_REPEAT = 3
+
+LOOKUPS = 10000
+
+# Category, then price high to low, as after two header clicks
+SORT_SPEC = [('category', False), ('price', True)]
+
+# (text, filters) as typed into the search box and facet boxes
+QUERIES = (
+    ('ਜੁੱਤੀ', None),
+    ('bridal red', None),
+    ('ph', None),
+    ('', {'category': 'women'}),
+    ('jutti', {'sizes': '8'}),
+)
+
+# Rows formatted per refresh, as many as the list shows
+PAGE_SIZE = 15
+
+# Slowdown (or memory growth) allowed before --compare reports a regression,
+# and differences too small to be anything but noise
+TOLERANCE = 0.25
+MIN_DELTA_SECONDS = 0.005
+MIN_DELTA_BYTES = 1024 * 1024
+
+
+class Skip(Exception):
+    """Raised by a benchmark that cannot run here"""
+
+
+class Context:
+    """One catalog size: its file, scratch space and shared state built on first use"""
+
+    def __init__(self, path, size, work_dir, seed):
+        self.path = path
+        self.size = size
+        self.work_dir = work_dir
+        self.rng = random.Random(seed)
+        self._products = None
+        self._store = None
+        self._search_index = None
+        # Called when this size is done, newest first
+        self.cleanups = []
+
+    @property
+    def products(self):
+        if self._products is None:
+            self._products = load_catalog(self.path)
+        return self._products
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = ProductStore(self.products)
+        return self._store
+
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.store)
+            self._search_index.prepare()
+        return self._search_index
+
+    def scratch(self, name):
+        """Return a path in a scratch directory emptied after this size"""
+        directory = os.path.join(self.work_dir, 'scratch')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def close(self):
+        for cleanup in reversed(self.cleanups):
+            cleanup()
+        if self._search_index is not None:
+            self._search_index.close()
+        shutil.rmtree(os.path.join(self.work_dir, 'scratch'), ignore_errors=True)
+
+
+# Each benchmark takes a Context and returns (run, reset): run() is the
+# measured work, reset() (or None) restores the starting state, untimed
+
+def bench_load(ctx):
+    return lambda: ProductStore(load_catalog(ctx.path)), None
+
+
+def bench_load_lazy(ctx):
+    if not lazy_loading_supported():
+        raise Skip("lazy loading needs POSIX file semantics")
+
+    def run():
+        index = CatalogIndex(ctx.path)
+        store = ProductStore(materialize=index.read)
+        for record, partial in index_products(ctx.path, index):
+            store.add(record, partial=partial)
+        index.close()
+        return store
+    return run, None
+
+
+def bench_save(ctx):
+    path = ctx.scratch('products.json')
+    store = ctx.store
+    return lambda: save_catalog(path, store.snapshot()), None
+
+
+def bench_backup(ctx):
+    data, count = encode_catalog(ctx.products)
+    directory = ctx.scratch('backups')
+    state = {}
+
+    def reset():
+        # A fresh store each time, or unchanged data would be deduplicated
+        shutil.rmtree(directory, ignore_errors=True)
+        state['backups'] = BackupStore(directory)
+
+    return lambda: state['backups'].snapshot(data, count=count), reset
+
+
+def bench_lookup(ctx):
+    store = ctx.store
+    keys = ctx.rng.choices(store.keys(), k=LOOKUPS) if len(store) else []
+
+    def run():
+        for key in keys:
+            store.get(key)
+    return run, None
+
+
+def bench_sort(ctx):
+    products = ctx.products
+    state = {}
+
+    def reset():
+        # A new store has no cached sort values
+        state['store'] = None
+        state['store'] = ProductStore(products)
+
+    def run():
+        store = state['store']
+        return store.sort_keys(store.keys(), SORT_SPEC)
+    return run, reset
+
+
+def bench_sort_cached(ctx):
+    store = ctx.store
+    store.sort_keys(store.keys(), SORT_SPEC)
+    return lambda: store.sort_keys(store.keys(), SORT_SPEC), None
+
+
+def bench_search_index(ctx):
+    store = ctx.store
+
+    def run():
+        index = SearchIndex(store)
+        index.prepare()
+        index.close()
+    return run, None
+
+
+def bench_search(ctx):
+    index = ctx.search_index
+
+    def run():
+        for text, filters in QUERIES:
+            result = index.search(text, filters)
+            # What the list shows: the count and the first page
+            len(result)
+            result[:PAGE_SIZE]
+            for field in FACET_FIELDS:
+                index.facet_counts(field, result)
+    return run, None
+
+
+def bench_refresh(ctx):
+    try:
+        from product_gui import product_row_values
+    except ImportError as e:
+        raise Skip(f"product_gui cannot be imported: {e}")
+    store = ctx.store
+    index = ctx.search_index
+
+    def run():
+        keys = store.sort_keys(store.keys(), SORT_SPEC)
+        for field in FACET_FIELDS:
+            index.facet_counts(field)
+        return [product_row_values(store.peek(key)) for key in keys[:PAGE_SIZE]]
+    return run, None
+
+
+def bench_export_csv(ctx):
+    path = ctx.scratch('products.csv')
+    store = ctx.store
+    return lambda: export_products(store.snapshot(), path, fmt='csv'), None
+
+
+class _ImageHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in image host: every path is a PNG"""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _ImageServer(http.server.ThreadingHTTPServer):
+    # The default backlog of 5 drops connections from a full pool of checkers
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def bench_check_images(ctx):
+    server = _ImageServer(('127.0.0.1', 0), _ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    ctx.cleanups.append(stop)
+
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    products = [{'id': product['id'], 'images': [base + url for url in product_images(product)]}
+                for product in ctx.products]
+    return lambda: check_images(products), None
+
+
+class GuiSession:
+    """A ProductManager window on a copy of the catalog, in its own data directory"""
+
+    def __init__(self, ctx):
+        try:
+            import tkinter as tk
+            from product_gui import ProductManager
+        except ImportError as e:
+            raise Skip(f"Tkinter is not available: {e}")
+        if os.name == 'posix' and not os.environ.get('DISPLAY'):
+            raise Skip("no display; run under xvfb-run")
+        self.tk = tk
+        self.ProductManager = ProductManager
+
+        # The manager works on data/ relative to the current directory
+        self.home = os.path.abspath(ctx.scratch('gui'))
+        os.makedirs(os.path.join(self.home, 'data'), exist_ok=True)
+        self.products_file = os.path.join(self.home, 'data', 'products.json')
+        if not os.path.exists(self.products_file):
+            try:
+                os.link(ctx.path, self.products_file)
+            except OSError:
+                shutil.copyfile(ctx.path, self.products_file)
+        self.root = None
+        self.app = None
+
+    def open(self):
+        """Open the window and wait until every product is loaded"""
+        cwd = os.getcwd()
+        os.chdir(self.home)
+        try:
+            self.root = self.tk.Tk()
+            self.app = self.ProductManager(self.root)
+            while self.app.loading:
+                self.root.update()
+            self.root.update()
+        finally:
+            os.chdir(cwd)
+        return self.app
+
+    def close(self):
+        if self.app is not None:
+            if self.app.watcher is not None:
+                self.app.watcher.stop()
+            self.app.tasks.shutdown()
+            self.app = None
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+
+    def settle(self):
+        """Let Tk finish drawing"""
+        self.root.update_idletasks()
+
+
+def bench_gui_load(ctx):
+    session = GuiSession(ctx)
+    return session.open, session.close
+
+
+def _open_session(ctx):
+    session = GuiSession(ctx)
+    session.open()
+    ctx.cleanups.append(session.close)
+    return session
+
+
+def bench_gui_refresh(ctx):
+    session = _open_session(ctx)
+
+    def run():
+        session.app.refresh_product_list()
+        session.settle()
+    return run, None
+
+
+def bench_gui_sort(ctx):
+    session = _open_session(ctx)
+
+    def run():
+        # Each click toggles the direction, so every run really sorts
+        session.app.sort_treeview('Price')
+        session.settle()
+    return run, None
+
+
+def bench_gui_scroll(ctx):
+    session = _open_session(ctx)
+    product_list = session.app.product_list
+
+    def run():
+        # Jump through the list a page at a time, as dragging the scrollbar does
+        keys = product_list.keys
+        step = max(1, len(keys) // 100)
+        for key in itertools.islice(keys, 0, None, step):
+            product_list.see(key, select=False)
+            session.settle()
+    return run, None
+
+
+BENCHMARKS = {
+    'load': bench_load,
+    'load_lazy': bench_load_lazy,
+    'save': bench_save,
+    'backup': bench_backup,
+    'lookup': bench_lookup,
+    'sort': bench_sort,
+    'sort_cached': bench_sort_cached,
+    'search_index': bench_search_index,
+    'search': bench_search,
+    'refresh': bench_refresh,
+    'export_csv': bench_export_csv,
+    'check_images': bench_check_images,
+}
+
+GUI_BENCHMARKS = {
+    'gui_load': bench_gui_load,
+    'gui_refresh': bench_gui_refresh,
+    'gui_sort': bench_gui_sort,
+    'gui_scroll': bench_gui_scroll,
+}
+
+
+def measure(run, reset, repeat, memory=True):
+    """Time run() `repeat` times, then return (seconds per run, peak traced bytes)"""
+    times = []
+    for _ in range(repeat):
+        if reset:
+            reset()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    peak = None
+    if memory:
+        if reset:
+            reset()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    if reset:
+        reset()
+    return times, peak
+
+
+def catalog_path(work_dir, size, seed):
+    """Return the generated catalog for a size, writing it first if needed"""
+    path = os.path.join(work_dir, f"catalog-{size}-seed{seed}.json")
+    if not os.path.exists(path):
+        print(f"Generating {size} products...", file=sys.stderr)
+        write_catalog(path, size, seed)
+    return path
+
+
+def run_benchmarks(names, sizes, repeat=DEFAULT_REPEAT, seed=0, work_dir=BENCH_DIR,
+                   memory=True, log=None):
+    """Run the named benchmarks at each catalog size and return the results document"""
+    benchmarks = dict(BENCHMARKS, **GUI_BENCHMARKS)
+    results = []
+    skipped = []
+    for size in sizes:
+        ctx = Context(catalog_path(work_dir, size, seed), size, work_dir, seed)
+        try:
+            for name in names:
+                try:
+                    run, reset = benchmarks[name](ctx)
+                    times, peak = measure(run, reset, repeat, memory)
+                except Skip as e:
+                    skipped.append({'benchmark': name, 'size': size, 'reason': str(e)})
+                    if log:
+                        log(f"{name:<14} {size:>9}  skipped: {e}")
+                    continue
+                result = {
+                    'benchmark': name,
+                    'size': size,
+                    'seconds': min(times),
+                    'median': statistics.median(times),
+                    'runs': times,
+                    'peak_bytes': peak,
+                }
+                results.append(result)
+                if log:
+                    log(format_result(result))
+        finally:
+            ctx.close()
+
+    return {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commit': git_commit(),
+        'seed': seed,
+        'repeat': repeat,
+        'max_rss_bytes': max_rss_bytes(),
+        'results': results,
+        'skipped': skipped,
+    }
+
+
+def git_commit():
+    """Return the checked-out commit, if this is a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_result(result):
+    peak = result['peak_bytes']
+    memory = f"{peak / (1024 * 1024):9.1f} MB" if peak is not None else ''
+    return (f"{result['benchmark']:<14} {result['size']:>9}  "
+            f"{result['seconds'] * 1000:10.2f} ms {result['median'] * 1000:10.2f} ms{memory}")
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Return regression messages for results that are slower or larger than the baseline"""
+    base = {(r['benchmark'], r['size']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results.get('results', []):
+        old = base.get((result['benchmark'], result['size']))
+        if old is None:
+            continue
+        label = f"{result['benchmark']} at {result['size']}"
+
+        before, after = old['seconds'], result['seconds']
+        if after > before * (1 + tolerance) and after - before >= MIN_DELTA_SECONDS:
+            regressions.append(f"{label}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms "
+                               f"(+{(after / before - 1) * 100:.0f}%)")
+
+        before, after = old.get('peak_bytes'), result.get('peak_bytes')
+        if before is not None and after is not None:
+            if after > before * (1 + tolerance) and after - before >= MIN_DELTA_BYTES:
+                regressions.append(f"{label}: peak {before / (1024 * 1024):.1f} MB -> "
+                                   f"{after / (1024 * 1024):.1f} MB")
+    return regressions
+
+
+def parse_names(text):
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    known = dict(BENCHMARKS, **GUI_BENCHMARKS)
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown benchmark: {', '.join(unknown)} "
+                                         f"(choose from {', '.join(known)})")
+    return names
+
+
+def parse_sizes(text):
+    return [parse_count(size) for size in text.split(',') if size.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the product manager's catalog operations")
+    parser.add_argument('--sizes', type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="catalog sizes, e.g. 1k,10k,100k,1M (default: 1k,10k,100k)")
+    parser.add_argument('--only', type=parse_names, help="comma-separated benchmarks to run")
+    parser.add_argument('--gui', action='store_true', help="also run the Treeview benchmarks (needs a display)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="catalog generator seed")
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="skip the tracemalloc run")
+    parser.add_argument('--work-dir', default=BENCH_DIR, help="where catalogs are generated")
+    parser.add_argument('-o', '--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="fail if slower than this results file")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="allowed slowdown before failing, as a fraction (default: 0.25)")
+    parser.add_argument('--results', metavar='FILE',
+                        help="compare an existing results file instead of running")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.results:
+        with open(args.results, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    else:
+        names = args.only or list(BENCHMARKS) + (list(GUI_BENCHMARKS) if args.gui else [])
+        print(f"{'benchmark':<14} {'size':>9}  {'best':>13} {'median':>13} {'peak':>12}")
+        results = run_benchmarks(names, args.sizes, args.repeat, args.seed, args.work_dir,
+                                 args.memory, log=lambda line: print(line, flush=True))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+                f.write('\n')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
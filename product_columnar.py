@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Columnar Products
+Compact in-memory product storage for low-memory hosts (512 MB AWS boxes)
+
+ColumnarCatalog keeps each known field in its own column instead of one
+dict per product:
+
+- category, subcategory, productType and each record's key order are stored
+  as small integer codes into tables of distinct values
+- sizes, colors, images and tags are interned tuples, so the few distinct
+  combinations are stored once
+- price, stock and the other numbers live in typed arrays
+- anything that does not fit its column (unexpected types, unknown keys)
+  is kept as-is in a per-row extras dict
+
+Rows come back as ColumnarRow objects, read-only mappings with __slots__
+that read from the columns on access. dict(row) gives back the original
+record exactly, including key order and unknown keys.
+
+Edits turn a product into a plain dict. track() frees the slots of rows a
+ProductStore replaces or deletes: their views are detached first (keeping
+a copy of the product for whoever still holds them, e.g. undo history),
+then the values in the slots are dropped. Rows are not reused, since only
+loading appends to the catalog.
+"""
+
+import sys
+from array import array
+from collections.abc import Mapping
+
+from product_store import product_key
+
+# Largest integer a double holds exactly
+_MAX_EXACT_FLOAT_INT = 2 ** 53
+_MIN_INT64, _MAX_INT64 = -2 ** 63, 2 ** 63 - 1
+
+# Marks a value that must go to the row's extras
+_NO_FIT = object()
+
+
+class _CodedColumn:
+    """Column of codes into a table of distinct hashable values"""
+
+    def __init__(self):
+        self.table = []
+        self.lookup = {}
+        self.codes = array('I')
+
+    def _code(self, key, value):
+        code = self.lookup.get(key)
+        if code is None:
+            code = len(self.table)
+            self.lookup[key] = code
+            self.table.append(value)
+        return code
+
+    def encode(self, value):
+        if isinstance(value, (list, dict)):
+            return _NO_FIT
+        if isinstance(value, str):
+            value = sys.intern(value)
+        # Keep 1, 1.0 and True apart
+        return self._code((type(value), value), value)
+
+    def decode(self, code):
+        return self.table[code]
+
+    def append(self, code):
+        self.codes.append(code)
+
+    def set(self, row, code):
+        self.codes[row] = code
+
+    def get(self, row):
+        return self.decode(self.codes[row])
+
+    def empty(self):
+        return 0
+
+
+class _ListColumn(_CodedColumn):
+    """Column of lists of scalars, interned as tuples"""
+
+    def encode(self, value):
+        if not isinstance(value, list):
+            return _NO_FIT
+        items = []
+        for item in value:
+            if isinstance(item, (list, dict)):
+                return _NO_FIT
+            items.append((type(item), sys.intern(item) if isinstance(item, str) else item))
+        key = tuple(items)
+        return self._code(key, tuple(item for _, item in items))
+
+    def decode(self, code):
+        # A fresh list each time, so callers cannot alter the shared tuple
+        return list(self.table[code])
+
+
+class _NumberColumn:
+    """Column of ints/floats in a typed array, remembering which was which"""
+
+    INT, FLOAT = 1, 2
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.values = array(typecode)
+        self.kinds = array('b')
+
+    def encode(self, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return _NO_FIT
+        if self.typecode == 'q':
+            if isinstance(value, int) and _MIN_INT64 <= value <= _MAX_INT64:
+                return (value, self.INT)
+            return _NO_FIT
+        if isinstance(value, int):
+            if abs(value) <= _MAX_EXACT_FLOAT_INT:
+                return (float(value), self.INT)
+            return _NO_FIT
+        return (value, self.FLOAT)
+
+    def append(self, encoded):
+        self.values.append(encoded[0])
+        self.kinds.append(encoded[1])
+
+    def set(self, row, encoded):
+        self.values[row] = encoded[0]
+        self.kinds[row] = encoded[1]
+
+    def get(self, row):
+        value = self.values[row]
+        return int(value) if self.kinds[row] == self.INT else value
+
+    def empty(self):
+        return (0, 0)
+
+
+class _BoolColumn:
+    """Column of booleans, one byte each"""
+
+    def __init__(self):
+        self.values = array('b')
+
+    def encode(self, value):
+        return int(value) if isinstance(value, bool) else _NO_FIT
+
+    def append(self, encoded):
+        self.values.append(encoded)
+
+    def set(self, row, encoded):
+        self.values[row] = encoded
+
+    def get(self, row):
+        return bool(self.values[row])
+
+    def empty(self):
+        return 0
+
+
+class _TextColumn:
+    """Column of free-text strings"""
+
+    def __init__(self):
+        self.values = []
+
+    def encode(self, value):
+        return value if isinstance(value, str) else _NO_FIT
+
+    def append(self, encoded):
+        self.values.append(encoded)
+
+    def set(self, row, encoded):
+        self.values[row] = encoded
+
+    def get(self, row):
+        return self.values[row]
+
+    def empty(self):
+        return None
+
+
+class _DetachedRow:
+    """Stands in for the catalog behind a view whose row was released"""
+
+    __slots__ = ('product',)
+
+    def __init__(self, product):
+        self.product = product
+
+    def get_field(self, row, key):
+        return self.product[key]
+
+    def row_keys(self, row):
+        return self.product.keys()
+
+    def to_dict(self, row):
+        return dict(self.product)
+
+
+class ColumnarRow(Mapping):
+    """Read-only view of one product stored in a ColumnarCatalog"""
+
+    __slots__ = ('_catalog', '_row')
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._catalog.get_field(self._row, key)
+
+    def __iter__(self):
+        return iter(self._catalog.row_keys(self._row))
+
+    def __len__(self):
+        return len(self._catalog.row_keys(self._row))
+
+    def __repr__(self):
+        return f"ColumnarRow({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Return the product as a plain dict"""
+        return self._catalog.to_dict(self._row)
+
+
+class ColumnarCatalog:
+    """Column-oriented storage for product records"""
+
+    CATEGORICAL_FIELDS = ('category', 'subcategory', 'productType')
+    LIST_FIELDS = ('sizes', 'colors', 'images', 'tags')
+    NUMBER_FIELDS = {
+        'price': 'd',
+        'originalPrice': 'd',
+        'rating': 'd',
+        'stock': 'q',
+        'stockQuantity': 'q',
+        'reviews': 'q',
+    }
+    BOOLEAN_FIELDS = ('inStock', 'isActive', 'featured')
+    TEXT_FIELDS = (
+        '_id', 'id', 'name', 'punjabiName', 'description', 'punjabiDescription',
+        'createdAt', 'updatedAt',
+    )
+
+    def __init__(self, products=None):
+        self.columns = {}
+        for field in self.CATEGORICAL_FIELDS:
+            self.columns[field] = _CodedColumn()
+        for field in self.LIST_FIELDS:
+            self.columns[field] = _ListColumn()
+        for field, typecode in self.NUMBER_FIELDS.items():
+            self.columns[field] = _NumberColumn(typecode)
+        for field in self.BOOLEAN_FIELDS:
+            self.columns[field] = _BoolColumn()
+        for field in self.TEXT_FIELDS:
+            self.columns[field] = _TextColumn()
+
+        # Key order of each row, coded like a categorical field
+        self.layouts = _CodedColumn()
+
+        # row -> {field: value} for values that do not fit a column
+        self.extras = {}
+
+        # Rows whose products were replaced or deleted, and those of them
+        # not cleared yet
+        self._freed = set()
+        self._released = []
+        self._idle = None
+
+        for product in products or []:
+            self.append(product)
+
+    def __len__(self):
+        return len(self.layouts.codes) - len(self._freed)
+
+    def __getitem__(self, row):
+        if row in self._freed:
+            raise IndexError(f"Row {row} was freed")
+        return ColumnarRow(self, row)
+
+    def __iter__(self):
+        for row in self._rows():
+            yield ColumnarRow(self, row)
+
+    def _rows(self):
+        """Rows that still hold a product"""
+        return (row for row in range(len(self.layouts.codes)) if row not in self._freed)
+
+    def _encode_row(self, product):
+        """Split a product into per-column values and leftover extras"""
+        encoded = {}
+        extras = {}
+        for key, value in product.items():
+            column = self.columns.get(key)
+            value_code = column.encode(value) if column is not None else _NO_FIT
+            if value_code is _NO_FIT:
+                extras[key] = value
+            else:
+                encoded[key] = value_code
+        layout = self.layouts._code(tuple(product), tuple(sys.intern(k) for k in product))
+        return layout, encoded, extras
+
+    def append(self, product):
+        """Store a product and return its row view"""
+        layout, encoded, extras = self._encode_row(product)
+        row = len(self.layouts.codes)
+        for field, column in self.columns.items():
+            column.append(encoded[field] if field in encoded else column.empty())
+        self.layouts.append(layout)
+        if extras:
+            self.extras[row] = extras
+        return ColumnarRow(self, row)
+
+    def pack(self, products):
+        """Yield each product as stored in the catalog
+
+        Products without an ID stay dicts, since the store has to give them one.
+        """
+        for product in products:
+            yield self.append(product) if product_key(product) else product
+
+    def track(self, store, idle=None):
+        """Free the rows of products the store replaces or deletes from now on
+
+        Rows are cleared once `idle()` says no other thread is reading the
+        catalog (right away without it); until then reclaim() leaves them be.
+        """
+        self._idle = idle
+
+        def on_change(op, key, old, new):
+            if op == 'reset':
+                # replace_all() does not say what it dropped: free every
+                # row the store no longer holds
+                held = {record._row for record in store
+                        if isinstance(record, ColumnarRow) and record._catalog is self}
+                for row in list(self._rows()):
+                    if row not in held:
+                        self._freed.add(row)
+                        self._released.append(row)
+            elif isinstance(old, ColumnarRow) and old._catalog is self and old is not new:
+                self.release(old)
+            self.reclaim()
+
+        store.subscribe(on_change)
+
+    def release(self, view):
+        """Detach a row's view, which keeps a copy of the product, and queue the row to be freed"""
+        row = view._row
+        view._catalog = _DetachedRow(self.to_dict(row))
+        self._freed.add(row)
+        self._released.append(row)
+
+    def reclaim(self):
+        """Drop the values held for released rows, unless readers may still be inside them"""
+        if not self._released or (self._idle is not None and not self._idle()):
+            return
+        released, self._released = self._released, []
+        layout = self.layouts._code((), ())
+        for row in released:
+            for column in self.columns.values():
+                column.set(row, column.empty())
+            self.layouts.set(row, layout)
+            self.extras.pop(row, None)
+
+    def row_keys(self, row):
+        """Field names of a row, in their original order"""
+        return self.layouts.get(row)
+
+    def get_field(self, row, key):
+        """Return one field of a row, raising KeyError if it is absent"""
+        extras = self.extras.get(row)
+        if extras is not None and key in extras:
+            return extras[key]
+        if key not in self.layouts.get(row):
+            raise KeyError(key)
+        return self.columns[key].get(row)
+
+    def to_dict(self, row):
+        """Rebuild the original product dict for a row"""
+        extras = self.extras.get(row, {})
+        product = {}
+        for key in self.layouts.get(row):
+            if key in extras:
+                product[key] = extras[key]
+            else:
+                product[key] = self.columns[key].get(row)
+        return product
+
+    def to_products(self):
+        """Return every row as a plain dict"""
+        return [self.to_dict(row) for row in self._rows()]
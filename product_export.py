@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Export
+Streaming CSV and columnar TSV export of the catalog
+
+The header is the union of every product's keys (in first-seen order), so
+products with extra fields no longer break the export. Cells are encoded
+deterministically: strings as-is, numbers and booleans as JSON literals,
+and lists/objects as compact JSON with sorted keys, e.g. ["UK 7","UK 8"]
+instead of a Python repr. A string that would read back as something else
+("123", "true", "null", "", or text that is itself JSON) is written as a
+quoted JSON string, so product_import gets back exactly what was exported.
+
+Two formats are supported:
+
+- 'csv': one row per product
+- 'columns': columnar TSV, one line per field holding that field's value
+  for every product, for analytics jobs that read a column at a time
+
+Either can be gzipped. Exports are written atomically and report progress
+and honour a cancel Event, so they can run on a worker thread.
+"""
+
+import csv
+import gzip
+import io
+import json
+import re
+import tempfile
+
+from product_io import AtomicFile
+
+FORMATS = ('csv', 'columns')
+
+# How often progress is reported, in products
+PROGRESS_EVERY = 1000
+
+# Strings product_import.decode_cell() would not read back as the same string
+_JSON_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\Z')
+_JSON_WORDS = frozenset(('true', 'false', 'null', '-Infinity'))
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled before it finished"""
+
+
+def _ambiguous(text):
+    """True if a string cell needs quoting to be read back as that string"""
+    if not text or text in _JSON_WORDS:
+        return True
+    first = text[0]
+    if first in '[{"':
+        try:
+            json.loads(text)
+        except ValueError:
+            return False
+        return True
+    return first in '-0123456789' and _JSON_NUMBER.match(text) is not None
+
+
+def encode_cell(value):
+    """Encode one field value as text"""
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        if _ambiguous(value):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+
+def _escape_tsv(text):
+    """Escape a cell for the columnar TSV format"""
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _check(cancel):
+    if cancel is not None and cancel.is_set():
+        raise ExportCancelled("Export cancelled")
+
+
+def union_fieldnames(products, progress=None, cancel=None):
+    """Return every field used by any product, in first-seen order"""
+    fields = {}
+    total = len(products)
+    for done, product in enumerate(products, 1):
+        for key in product.keys():
+            if key not in fields:
+                fields[key] = None
+        if done % PROGRESS_EVERY == 0:
+            _check(cancel)
+            if progress:
+                progress('schema', done, total)
+    return list(fields)
+
+
+def iter_rows(products, fieldnames):
+    """Yield each product as a list of encoded cells"""
+    for product in products:
+        yield [encode_cell(product[f]) if f in product else '' for f in fieldnames]
+
+
+def _write_csv(text, products, fieldnames, progress, cancel):
+    writer = csv.writer(text)
+    writer.writerow(fieldnames)
+    total = len(products)
+    for done, row in enumerate(iter_rows(products, fieldnames), 1):
+        writer.writerow(row)
+        if done % PROGRESS_EVERY == 0:
+            _check(cancel)
+            if progress:
+                progress('rows', done, total)
+
+
+def _write_columns(text, products, fieldnames, progress, cancel):
+    # Each column is spooled to its own temp file, so memory stays flat
+    spools = [tempfile.TemporaryFile('w+', encoding='utf-8', newline='') for _ in fieldnames]
+    try:
+        total = len(products)
+        for done, row in enumerate(iter_rows(products, fieldnames), 1):
+            separator = '\t' if done > 1 else ''
+            for spool, cell in zip(spools, row):
+                spool.write(separator)
+                spool.write(_escape_tsv(cell))
+            if done % PROGRESS_EVERY == 0:
+                _check(cancel)
+                if progress:
+                    progress('rows', done, total)
+
+        for field, spool in zip(fieldnames, spools):
+            text.write(_escape_tsv(field))
+            text.write('\t')
+            spool.seek(0)
+            while True:
+                chunk = spool.read(1 << 20)
+                if not chunk:
+                    break
+                text.write(chunk)
+            text.write('\n')
+    finally:
+        for spool in spools:
+            spool.close()
+
+
+def write_products(stream, products, fmt='csv', compress=False, fieldnames=None,
+                   progress=None, cancel=None):
+    """Write an export to an open binary stream (e.g. sys.stdout.buffer)
+
+    Takes the same arguments as export_products(); the stream is flushed
+    but left open.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+    if fieldnames is None:
+        fieldnames = union_fieldnames(products, progress, cancel)
+
+    target = gzip.GzipFile(fileobj=stream, mode='wb', mtime=0) if compress else stream
+    text = io.TextIOWrapper(target, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        _write_csv(text, products, fieldnames, progress, cancel)
+    else:
+        _write_columns(text, products, fieldnames, progress, cancel)
+    _check(cancel)
+
+    # Flush through the wrappers without closing the underlying stream
+    text.flush()
+    text.detach()
+    if compress:
+        target.close()
+    stream.flush()
+
+    if progress:
+        progress('rows', len(products), len(products))
+    return len(products)
+
+
+def export_products(products, path, fmt='csv', compress=None, fieldnames=None,
+                    progress=None, cancel=None):
+    """Export products to path and return the number written
+
+    `products` must be sized and re-iterable (a list or
+    ProductStore.snapshot()), because the schema pass reads it once before
+    the rows are written. `compress` defaults to gzip when path ends in .gz.
+    `progress(stage, done, total)` is called every PROGRESS_EVERY products
+    with stage 'schema' or 'rows'. Setting the `cancel` Event aborts with
+    ExportCancelled and leaves no partial file behind.
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    with AtomicFile(path) as f:
+        return write_products(f, products, fmt=fmt, compress=compress, fieldnames=fieldnames,
+                              progress=progress, cancel=cancel)
+
+
+def guess_format(path):
+    """Pick the export format from a file name"""
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'columns' if name.endswith('.tsv') else 'csv'
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Catalog Generator
+Synthetic products.json files for benchmarks and load testing
+
+Products follow the schema the manager and the Node store use, and pass
+validate_product(): English and Gurmukhi names and descriptions, juttis in
+the men/women/kids categories and fulkaris in their own, sizes and colors
+lists, prices, stock, ratings and timestamps. A few products are out of
+stock, and a few lack optional fields, as in a real hand-maintained
+catalog.
+
+The output depends only on the count and the seed, so a benchmark run on
+one machine can be repeated exactly on another. Files are written one
+record at a time in the manager's own layout, so a million products need
+no more memory than one.
+
+    python3 product_generate.py 100000 -o data/products.json --seed 1
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+from product_io import AtomicFile
+
+# Timestamps are spread over the year before this date, not before today,
+# so the same seed always gives the same file
+BASE_DATE = datetime(2024, 1, 1)
+_EPOCH = datetime(1970, 1, 1)
+
+# Catalog sizes the benchmarks use by default
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+STYLES = (
+    ('Traditional', 'ਪਰੰਪਰਾਗਤ'),
+    ('Bridal', 'ਦੁਲਹਨ'),
+    ('Embroidered', 'ਕਢਾਈ ਵਾਲੀ'),
+    ('Handmade', 'ਹੱਥ ਨਾਲ ਬਣੀ'),
+    ('Royal', 'ਸ਼ਾਹੀ'),
+    ('Classic', 'ਕਲਾਸਿਕ'),
+    ('Festive', 'ਤਿਉਹਾਰੀ'),
+    ('Punjabi', 'ਪੰਜਾਬੀ'),
+    ('Patiala', 'ਪਟਿਆਲਾ'),
+    ('Wedding', 'ਵਿਆਹ ਵਾਲੀ'),
+)
+
+COLORS = (
+    ('Red', 'ਲਾਲ'),
+    ('Maroon', 'ਮੈਰੂਨ'),
+    ('Gold', 'ਸੁਨਹਿਰੀ'),
+    ('Black', 'ਕਾਲੀ'),
+    ('Brown', 'ਭੂਰੀ'),
+    ('Tan', 'ਹਲਕੀ ਭੂਰੀ'),
+    ('Pink', 'ਗੁਲਾਬੀ'),
+    ('Blue', 'ਨੀਲੀ'),
+    ('Green', 'ਹਰੀ'),
+    ('White', 'ਚਿੱਟੀ'),
+    ('Orange', 'ਸੰਤਰੀ'),
+    ('Multicolor', 'ਰੰਗ-ਬਿਰੰਗੀ'),
+)
+
+# product type -> [(English, Gurmukhi)]
+ITEMS = {
+    'jutti': (
+        ('Jutti', 'ਜੁੱਤੀ'),
+        ('Leather Jutti', 'ਚਮੜੇ ਦੀ ਜੁੱਤੀ'),
+        ('Mojari', 'ਮੋਜੜੀ'),
+        ('Khussa', 'ਖੁੱਸਾ'),
+    ),
+    'fulkari': (
+        ('Phulkari Dupatta', 'ਫੁਲਕਾਰੀ ਦੁਪੱਟਾ'),
+        ('Phulkari Shawl', 'ਫੁਲਕਾਰੀ ਸ਼ਾਲ'),
+        ('Bagh', 'ਬਾਗ'),
+        ('Phulkari Suit', 'ਫੁਲਕਾਰੀ ਸੂਟ'),
+    ),
+}
+
+# product type -> [(category, weight)]; validate_product() puts every
+# fulkari in the fulkari category
+CATEGORIES = {
+    'jutti': (('men', 4), ('women', 5), ('kids', 2)),
+    'fulkari': (('fulkari', 1),),
+}
+
+SIZES = {
+    'men': ['6', '7', '8', '9', '10', '11', '12'],
+    'women': ['4', '5', '6', '7', '8', '9'],
+    'kids': ['10C', '11C', '12C', '13C', '1', '2', '3'],
+    'fulkari': ['Free Size'],
+}
+
+DESCRIPTIONS = (
+    ('Handcrafted by artisans in Punjab with traditional {motif} work.',
+     'ਪੰਜਾਬ ਦੇ ਕਾਰੀਗਰਾਂ ਵੱਲੋਂ ਰਵਾਇਤੀ {motif} ਕੰਮ ਨਾਲ ਹੱਥੀਂ ਬਣਾਈ ਗਈ।'),
+    ('Comfortable for daily wear and perfect for weddings and festivals.',
+     'ਰੋਜ਼ਾਨਾ ਪਹਿਨਣ ਲਈ ਆਰਾਮਦਾਇਕ ਅਤੇ ਵਿਆਹਾਂ ਤੇ ਤਿਉਹਾਰਾਂ ਲਈ ਸੰਪੂਰਨ।'),
+    ('Finished with {motif} detailing in {color} thread.',
+     '{color_pa} ਧਾਗੇ ਵਿੱਚ {motif} ਸਜਾਵਟ ਨਾਲ।'),
+)
+
+MOTIFS = ('tilla', 'zari', 'mirror', 'bagh', 'dabka', 'gota')
+
+BADGES = (
+    ('Best Seller', 'ਸਭ ਤੋਂ ਵਧੀਆ'),
+    ('New Arrival', 'ਨਵਾਂ'),
+    ('Bridal Special', 'ਦੁਲਹਨ ਸਪੈਸ਼ਲ'),
+    ('Limited Edition', 'ਸੀਮਤ ਐਡੀਸ਼ਨ'),
+)
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def generate_product(rng, number):
+    """Return one synthetic product; `number` makes its ID unique"""
+    product_type = 'jutti' if rng.random() < 0.7 else 'fulkari'
+    category = _weighted(rng, CATEGORIES[product_type])
+    style, style_pa = rng.choice(STYLES)
+    item, item_pa = rng.choice(ITEMS[product_type])
+    # The subcategory is the product type, as validate_product() sets it
+    subcategory = product_type
+    colors = rng.sample(COLORS, rng.randint(1, 4))
+    color, color_pa = colors[0]
+    motif = rng.choice(MOTIFS)
+
+    sizes = SIZES[category]
+    if len(sizes) > 1:
+        start = rng.randrange(len(sizes) - 1)
+        sizes = sizes[start:start + rng.randint(2, len(sizes))]
+
+    created = BASE_DATE - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+    updated = created + timedelta(seconds=rng.randrange(30 * 24 * 3600))
+    # IDs look like generate_product_id()'s, with the time taken as UTC
+    millis = (created - _EPOCH) // timedelta(milliseconds=1)
+    key = f"product_{millis}_{number:08x}"
+
+    price = rng.randrange(499, 9999, 50) + 49
+    # Roughly one product in twenty is sold out
+    stock = 0 if rng.random() < 0.05 else rng.randint(1, 200)
+
+    details = rng.sample(DESCRIPTIONS, 2)
+    fill = {'motif': motif, 'color': color.lower(), 'color_pa': color_pa}
+    product = {
+        '_id': key,
+        'id': key,
+        'name': f"{style} {color} {item}",
+        'punjabiName': f"{style_pa} {color_pa} {item_pa}",
+        'description': ' '.join(en.format(**fill) for en, _ in details),
+        'punjabiDescription': ' '.join(pa.format(**fill) for _, pa in details),
+        'price': price,
+        'originalPrice': price + rng.randrange(0, 1500, 100),
+        'category': category,
+        'subcategory': subcategory,
+        'productType': product_type,
+        'images': [f"/{category}-{subcategory}-{color.lower()}-{number % 50}.png"],
+        'colors': [en for en, _ in colors],
+        'sizes': list(sizes),
+        'stock': stock,
+        'rating': round(rng.uniform(3.5, 5.0), 1),
+        'reviews': rng.randint(0, 500),
+        'isActive': stock > 0 or rng.random() < 0.5,
+        'createdAt': created.isoformat(),
+        'updatedAt': updated.isoformat(),
+    }
+
+    # Optional fields are missing on some products, as in a real catalog
+    if rng.random() < 0.2:
+        product['badgeEn'], product['badge'] = rng.choice(BADGES)
+    if rng.random() < 0.1:
+        del product['originalPrice']
+    if rng.random() < 0.05:
+        del product['punjabiDescription']
+    return product
+
+
+def generate_catalog(count, seed=0):
+    """Yield `count` synthetic products; the same seed gives the same products"""
+    rng = random.Random(seed)
+    for number in range(count):
+        yield generate_product(rng, number)
+
+
+def write_catalog_stream(stream, count, seed=0, compact=False):
+    """Write a synthetic products.json to an open binary stream, one record at a time
+
+    The bytes are what product_store.encode_catalog() would produce for
+    the same products.
+    """
+    if compact:
+        head, sep, tail = '{"products":[', ',', ']}'
+    elif count:
+        head, sep, tail = '{\n  "products": [\n    ', ',\n    ', '\n  ]\n}'
+    else:
+        head, sep, tail = '{\n  "products": [', '', ']\n}'
+
+    stream.write(head.encode('utf-8'))
+    for number, product in enumerate(generate_catalog(count, seed)):
+        if compact:
+            text = json.dumps(product, ensure_ascii=False, separators=(',', ':'))
+        else:
+            text = json.dumps(product, indent=2, ensure_ascii=False).replace('\n', '\n    ')
+        stream.write(((sep if number else '') + text).encode('utf-8'))
+    stream.write(tail.encode('utf-8'))
+    return count
+
+
+def write_catalog(path, count, seed=0, compact=False):
+    """Write a synthetic products.json atomically and return the count"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with AtomicFile(path) as f:
+        return write_catalog_stream(f, count, seed, compact)
+
+
+def parse_count(text):
+    """Parse a catalog size such as 5000, 10k or 1M"""
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    if scale > 1:
+        text = text[:-1]
+    try:
+        count = int(float(text) * scale)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid catalog size: '{text}'")
+    if count < 0:
+        raise argparse.ArgumentTypeError("catalog size must not be negative")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic products.json")
+    parser.add_argument('count', type=parse_count, help="number of products, e.g. 5000, 10k or 1M")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument('--compact', action='store_true', help="write without indentation")
+    args = parser.parse_args(argv)
+
+    if args.output == '-':
+        write_catalog_stream(sys.stdout.buffer, args.count, args.seed, args.compact)
+        sys.stdout.buffer.flush()
+    else:
+        write_catalog(args.output, args.count, args.seed, args.compact)
+        print(f"Wrote {args.count} products to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1939 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Manager GUI
+A GUI application to directly manage products in the JSON file
+
+Started by `python3 product_manager.py` with no arguments; the command-line
+mode in product_manager.py never imports this module, so it runs without a
+display.
+"""
+
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog, scrolledtext
+import os
+import base64
+import contextlib
+import itertools
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from product_backup import BackupStore
+from product_batch import STATUS_CHANGES, BatchEdit, parse_adjustment
+from product_columnar import ColumnarCatalog
+from product_export import ExportCancelled, export_products, guess_format
+from product_history import History
+from product_images import ThumbnailCache, check_images, check_urls, product_images
+from product_import import ImportPlan, read_rows
+from product_io import FileLock
+from product_journal import ChangeJournal
+from product_loader import CatalogIndex, IndexOutdated, index_products, lazy_loading_supported
+from product_merge import ChangedOnDisk, SyncState, read_changes, record_version
+from product_metrics import metrics
+from product_search import SearchIndex, SearchResult
+from product_tasks import TaskCancelled, TaskExecutor
+from product_watch import FileWatcher, file_signature
+from product_store import (BACKUP_DIR, HISTORY_FILE, JOURNAL_FILE, PRODUCTS_FILE, ProductStore, ValidationError,
+                           load_catalog, save_catalog, product_key, product_status, validate_product)
+
+# Treeview columns, in display order
+COLUMNS = ('ID', 'Name', 'Punjabi Name', 'Category', 'Subcategory', 'Price', 'Stock', 'Status')
+
+# Product field each column sorts on
+COLUMN_FIELDS = {
+    'ID': '_id',
+    'Name': 'name',
+    'Punjabi Name': 'punjabiName',
+    'Category': 'category',
+    'Subcategory': 'subcategory',
+    'Price': 'price',
+    'Stock': 'stock',
+    'Status': 'status',
+}
+
+# How many columns take part in a multi-column sort
+MAX_SORT_COLUMNS = 3
+
+# Products shown before the rest of the file is streamed in the background
+FIRST_PAGE_SIZE = 200
+LOAD_BATCH_SIZE = 2000
+
+# Background tasks in this group write products.json and run one at a time
+CATALOG_TASKS = 'products.json'
+
+# How often closing the window checks whether the catalog tasks are done
+CLOSE_POLL_MS = 100
+
+# Files at least this big keep only product summaries in memory and read
+# full records from disk when a product is opened
+LAZY_LOAD_BYTES = 5 * 1024 * 1024
+
+# Conflicting fields listed after merging outside changes to products.json
+MAX_CONFLICTS_SHOWN = 10
+
+# Search box delay after the last keystroke, and the facet filters shown
+# next to it as (label, product field)
+SEARCH_DELAY_MS = 150
+SEARCH_FACETS = (
+    ('Category', 'category'),
+    ('Type', 'productType'),
+    ('Size', 'sizes'),
+    ('Color', 'colors'),
+)
+ALL_VALUES = 'All'
+
+# How products are held in memory (PRODUCTS_MEMORY_MODE): 'full' dicts,
+# 'lazy' summaries plus on-demand reads, 'columnar' compact columns, or
+# 'auto' to pick between full and lazy by file size
+MEMORY_MODES = ('auto', 'full', 'lazy', 'columnar')
+
+# Actions that can be undone; undoing or redoing more products than
+# BULK_UNDO at once is journaled in one write and then saved in full
+MAX_UNDO_STEPS = 100
+BULK_UNDO = 100
+
+# Thumbnails of each product's first image in the list (PRODUCTS_THUMBNAILS=0
+# turns them off) and of the selected image in the product form; they load
+# on worker threads, and PhotoImages are kept for the most recently used
+LIST_THUMBNAIL_SIZE = 32
+FORM_THUMBNAIL_SIZE = 128
+THUMBNAIL_TASKS = 'thumbnails'
+THUMBNAIL_WORKERS = 4
+MAX_THUMBNAIL_IMAGES = 500
+
+# Broken images listed after checking the whole catalog
+MAX_BROKEN_SHOWN = 500
+
+# How often the diagnostics window updates, and the operations it can profile
+# (label, timer name); loading is profiled with PRODUCTS_PROFILE=load.read
+DIAGNOSTICS_REFRESH_MS = 1000
+PROFILE_TARGETS = (
+    ('Refresh list', 'refresh'),
+    ('Sort by column', 'sort'),
+    ('Save (background)', 'save.write'),
+    ('Export (background)', 'export.write'),
+    ('Batch edit', 'batch'),
+    ('Check images (background)', 'images.check'),
+)
+
+
+def tk_thumbnail(data, size, path):
+    """Write a PNG thumbnail of PNG or GIF data with Tk alone, for when Pillow is missing"""
+    image = tk.PhotoImage(data=base64.b64encode(data).decode('ascii'))
+    factor = max(1, math.ceil(max(image.width(), image.height()) / size))
+    image.subsample(factor).write(path, format='png')
+
+
+def product_row_values(product):
+    """Format a product as a Treeview row"""
+    return (
+        product_key(product) or '',
+        product.get('name', ''),
+        product.get('punjabiName', ''),
+        product.get('category', ''),
+        product.get('subcategory', ''),
+        f"₹{product.get('price', 0)}",
+        product.get('stock', 0),
+        product_status(product)
+    )
+
+
+class VirtualProductList:
+    """Virtualized product list on top of a ttk.Treeview
+    
+    Only the rows currently in view are materialized as Treeview items, with
+    the product key as the item iid. The full display order lives in
+    `self.keys`, so scrolling, adds, edits and deletes touch at most one
+    screenful of rows instead of re-inserting the whole catalog. It may be
+    a SearchResult, which is paged as it is and only copied into a list
+    once the list is edited.
+    """
+    
+    def __init__(self, tree, scrollbar, get_product, row_values, on_select=None, row_image=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.get_product = get_product
+        self.row_values = row_values
+        self.on_select = on_select
+        # Optional row_image(product) -> image for the tree column, or None
+        self.row_image = row_image
+        
+        # Display order of product keys and the first visible position
+        self.keys = []
+        self.offset = 0
+        self.page_size = int(str(tree.cget('height')))
+        
+        # Selected keys survive scrolling out of view
+        self.selected = []
+        
+        # iid -> values currently shown in the Treeview
+        self.rendered = {}
+        
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.configure(yscrollcommand=self._on_tree_yview)
+        tree.bind('<Configure>', self._on_configure, add='+')
+        tree.bind('<<TreeviewSelect>>', self._on_tree_select, add='+')
+        tree.bind('<MouseWheel>', self._on_mousewheel)
+        tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        tree.bind('<Up>', lambda e: self._move_focus(-1))
+        tree.bind('<Down>', lambda e: self._move_focus(1))
+        tree.bind('<Prior>', lambda e: self._move_focus(-self.page_size))
+        tree.bind('<Next>', lambda e: self._move_focus(self.page_size))
+        tree.bind('<Home>', lambda e: self._move_focus(-len(self.keys)))
+        tree.bind('<End>', lambda e: self._move_focus(len(self.keys)))
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def set_keys(self, keys):
+        """Replace the displayed products, keeping the scroll position"""
+        if isinstance(keys, SearchResult):
+            self.keys = present = keys
+        else:
+            self.keys = list(keys)
+            present = set(self.keys)
+        self.selected = [k for k in self.selected if k in present]
+        self.render()
+    
+    def _editable_keys(self):
+        """The display order as a list that can be changed"""
+        if not isinstance(self.keys, list):
+            self.keys = list(self.keys)
+        return self.keys
+    
+    def append(self, key):
+        """Add a product at the end of the list"""
+        self._editable_keys().append(key)
+        self.render()
+    
+    def extend(self, keys):
+        """Add several products at the end of the list"""
+        self._editable_keys().extend(keys)
+        self.render()
+    
+    def update(self, key):
+        """Re-render a single product's row if it is in view"""
+        if key in self.rendered:
+            product = self.get_product(key)
+            values = self.row_values(product)
+            if values != self.rendered[key]:
+                self.tree.item(key, values=values)
+                self.rendered[key] = values
+            if self.row_image:
+                self.tree.item(key, image=self.row_image(product) or '')
+    
+    def refresh_images(self):
+        """Re-read the images of the rows in view, e.g. once thumbnails have loaded"""
+        if self.row_image:
+            for key in self.rendered:
+                self.tree.item(key, image=self.row_image(self.get_product(key)) or '')
+    
+    def remove(self, key):
+        """Remove a product from the list"""
+        try:
+            self._editable_keys().remove(key)
+        except ValueError:
+            return
+        if key in self.selected:
+            self.selected.remove(key)
+        self.render()
+    
+    def selection(self):
+        """Return the selected product keys"""
+        return list(self.selected)
+    
+    def see(self, key, select=True):
+        """Scroll a product into view and optionally select it"""
+        try:
+            position = self.keys.index(key)
+        except ValueError:
+            return
+        if position < self.offset or position >= self.offset + self.page_size:
+            self.offset = position - self.page_size // 2
+        if select:
+            self.selected = [key]
+        self.render()
+        if key in self.rendered:
+            self.tree.focus(key)
+    
+    def render(self):
+        """Materialize exactly the rows in view, reusing existing items"""
+        with metrics.timer('list.render'):
+            self._render()
+    
+    def _render(self):
+        total = len(self.keys)
+        self.offset = max(0, min(self.offset, total - self.page_size))
+        window = self.keys[self.offset:self.offset + self.page_size + 1]
+        wanted = set(window)
+        
+        # Drop rows that scrolled out of view
+        stale = [iid for iid in self.rendered if iid not in wanted]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                del self.rendered[iid]
+        
+        # Insert new rows and refresh changed ones
+        for index, key in enumerate(window):
+            product = self.get_product(key)
+            values = self.row_values(product)
+            if key not in self.rendered:
+                image = self.row_image(product) if self.row_image else None
+                self.tree.insert('', index, iid=key, values=values, image=image or '')
+                metrics.incr('list.rows_inserted')
+            elif values != self.rendered[key]:
+                self.tree.item(key, values=values)
+            self.rendered[key] = values
+        
+        # Reorder only if the visible order changed
+        if tuple(window) != self.tree.get_children(''):
+            for index, key in enumerate(window):
+                self.tree.move(key, '', index)
+        
+        visible_selection = [k for k in self.selected if k in wanted]
+        if set(visible_selection) != set(self.tree.selection()):
+            self.tree.selection_set(visible_selection)
+        
+        self.tree.yview_moveto(0)
+        if total:
+            first = self.offset / total
+            last = min(1.0, (self.offset + self.page_size) / total)
+            self.scrollbar.set(first, last)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def _row_metrics(self):
+        """Return (header height, row height) measured from a rendered row"""
+        for iid in self.tree.get_children(''):
+            bbox = self.tree.bbox(iid)
+            if bbox:
+                return bbox[1], bbox[3]
+        return 25, 20
+    
+    def _on_configure(self, event):
+        header, row_height = self._row_metrics()
+        page_size = max(1, (event.height - header) // max(1, row_height))
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.render()
+    
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.offset = int(float(amount) * len(self.keys))
+        elif action == 'scroll':
+            step = int(amount)
+            self.offset += step * self.page_size if unit == 'pages' else step
+        self.render()
+    
+    def _on_tree_yview(self, first, last):
+        # The Treeview scrolled itself (e.g. clicking the partial last row);
+        # fold that into our offset instead
+        if float(first) > 0:
+            shift = max(1, round(float(first) * len(self.rendered)))
+            self.tree.after_idle(self._scroll_by, shift)
+    
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+    
+    def _scroll_by(self, rows):
+        self.offset += rows
+        self.render()
+        return 'break'
+    
+    def _move_focus(self, step):
+        if not self.keys:
+            return 'break'
+        focus = self.tree.focus()
+        if focus in self.rendered:
+            position = self.offset + self.tree.index(focus)
+        else:
+            position = self.offset - 1 if step > 0 else self.offset
+        position = max(0, min(len(self.keys) - 1, position + step))
+        self.see(self.keys[position])
+        if self.on_select:
+            self.on_select(None)
+        return 'break'
+    
+    def _on_tree_select(self, event):
+        # Ignore the echo of selections restored by render()
+        visible_selection = set(self.tree.selection())
+        if visible_selection == {k for k in self.selected if k in self.rendered}:
+            return
+        self.selected = list(self.tree.selection())
+        if self.on_select:
+            self.on_select(event)
+
+
+class ProductManager:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Punjabi E-commerce Store - Product Manager")
+        self.root.geometry("1200x800")
+        self.root.configure(bg='#f0f0f0')
+        
+        # File paths
+        self.products_file = PRODUCTS_FILE
+        self.backup_dir = BACKUP_DIR
+        self.journal_file = JOURNAL_FILE
+        self.history_file = HISTORY_FILE
+        
+        # Write products.json without indentation (smaller, faster saves)
+        self.compact_json = os.environ.get('PRODUCTS_COMPACT_JSON') == '1'
+        
+        # Ensure directories exist
+        os.makedirs("data", exist_ok=True)
+        os.makedirs(self.backup_dir, exist_ok=True)
+        self.backups = BackupStore(self.backup_dir)
+        
+        # Products are streamed in; large catalogs keep only summaries in
+        # memory and read full records through the offset index on demand
+        self.store = ProductStore(materialize=self.read_product)
+        self.catalog_index = None
+        self.columnar = None
+        self.journal = ChangeJournal(self.journal_file)
+        self.loading = False
+        
+        # products.json as last loaded/saved, so outside changes (e.g. from
+        # the Node sync servers) are merged in instead of overwritten
+        self.sync = SyncState()
+        self.watcher = None
+        
+        # Full-text index, kept up to date as the store changes
+        self.search_index = SearchIndex(self.store)
+        self.search_after_id = None
+        
+        # Active sort as [(column, descending), ...], most significant first
+        self.sort_spec = []
+        
+        # Undo/redo of every add, edit, delete, batch edit and import;
+        # PRODUCTS_KEEP_HISTORY=1 keeps it across restarts
+        self.keep_history = os.environ.get('PRODUCTS_KEEP_HISTORY') == '1'
+        self.history = History(MAX_UNDO_STEPS)
+        if self.keep_history:
+            try:
+                self.history = History.load(self.history_file, MAX_UNDO_STEPS)
+            except (OSError, ValueError):
+                # An unreadable history only costs the undo steps
+                pass
+        
+        # Slow file work runs on worker threads; results come back via after()
+        self.tasks = TaskExecutor(self.root.after, on_change=self.show_task_status)
+        self.status_shows_tasks = False
+        
+        # Thumbnails are cached in data/thumbnails and loaded as rows come into view
+        self.show_thumbnails = os.environ.get('PRODUCTS_THUMBNAILS', '1') != '0'
+        self.thumbnails = ThumbnailCache()
+        # (url, size) -> PhotoImage, least recently used first
+        self.thumbnail_images = OrderedDict()
+        # (url, size) -> reason it could not be loaded
+        self.thumbnail_failed = {}
+        # Queued or being fetched, and callbacks waiting for them
+        self.thumbnail_pending = set()
+        self.thumbnail_queue = []
+        self.thumbnail_waiters = {}
+        self.thumbnail_loading = False
+        
+        # Timings are always collected; PRODUCTS_PROFILE arms profiles of e.g. loading
+        metrics.arm_from_environment()
+        self.diagnostics_window = None
+        
+        # Create GUI
+        self.create_gui()
+        # Set while closing waits for catalog saves to finish
+        self.closing = False
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        
+        # Show the first page now and load the rest in the background
+        self.load_products()
+        self.migrate_old_backups()
+    
+    @property
+    def products(self):
+        """All products in catalog order"""
+        return self.store.all()
+    
+    def load_products(self):
+        """Load products from JSON file, showing the first page immediately"""
+        # Until finish_loading(), i.e. until every product can be edited
+        self.load_timer = metrics.start('load')
+        first_page_timer = metrics.start('load.first_page')
+        try:
+            if not os.path.exists(self.products_file):
+                # Creates an empty products file
+                load_catalog(self.products_file)
+                self.sync.signature = file_signature(self.products_file)
+                self.finish_loading()
+                return
+            
+            # Taken first, so a change made while loading counts as a change
+            self.sync.signature = file_signature(self.products_file)
+            mode = self.memory_mode()
+            if mode == 'lazy':
+                self.catalog_index = CatalogIndex(self.products_file)
+            records = index_products(self.products_file, self.catalog_index)
+            if mode == 'columnar':
+                # Rows of edited and deleted products are freed while no
+                # worker thread may be reading them
+                self.columnar = ColumnarCatalog()
+                self.columnar.track(self.store, idle=lambda: not self.tasks.busy())
+                records = ((record, False) for record in self.columnar.pack(record for record, _ in records))
+            first_page = list(itertools.islice(records, FIRST_PAGE_SIZE))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load products: {str(e)}")
+            self.finish_loading()
+            return
+        
+        self.add_loaded(first_page)
+        self.refresh_product_list()
+        metrics.stop(first_page_timer)
+        
+        # Stream the rest on a worker thread; batches come back via after()
+        self.loading = True
+        self.tasks.submit("Loading products", self._load_rest, records, group=CATALOG_TASKS,
+                          cancellable=False, on_publish=self.on_loaded_batch,
+                          on_done=lambda task, count: self.finish_loading(),
+                          on_error=self.on_load_failed)
+    
+    def migrate_old_backups(self):
+        """Fold products_backup_*.json copies from older versions into the backup store"""
+        def migrated(task, count):
+            if count:
+                self.status_var.set(f"Moved {count} old backup files into the backup store")
+        
+        self.tasks.submit("Migrating old backups", lambda task: self.backups.migrate_legacy(),
+                          cancellable=False, on_done=migrated,
+                          on_error=lambda task, error: self.status_var.set(f"Could not migrate old backups: {error}"))
+    
+    def memory_mode(self):
+        """Pick how loaded products are held in memory"""
+        mode = os.environ.get('PRODUCTS_MEMORY_MODE', 'auto')
+        if mode not in MEMORY_MODES:
+            mode = 'auto'
+        if mode == 'auto':
+            large = os.path.getsize(self.products_file) >= LAZY_LOAD_BYTES
+            mode = 'lazy' if large else 'full'
+        if mode == 'lazy' and not lazy_loading_supported():
+            mode = 'full'
+        return mode
+    
+    def _load_rest(self, task, records):
+        """Worker thread: parse the remaining products in batches"""
+        count = 0
+        with metrics.timer('load.read'):
+            while True:
+                batch = list(itertools.islice(records, LOAD_BATCH_SIZE))
+                if not batch:
+                    return count
+                task.publish(batch)
+                count += len(batch)
+                task.report(count, message="Loading products")
+    
+    def on_loaded_batch(self, task, batch):
+        """Move a loaded batch into the store on the Tk thread"""
+        with metrics.timer('load.add'):
+            keys = self.add_loaded(batch)
+            self.product_list.extend(keys)
+    
+    def on_load_failed(self, task, error):
+        """Keep what was loaded and report the error"""
+        messagebox.showerror("Error", f"Failed to load products: {str(error)}")
+        self.finish_loading()
+    
+    def add_loaded(self, records):
+        """Add streamed (record, partial) pairs to the store, returning their keys"""
+        keys = []
+        versions = self.sync.versions
+        for record, partial in records:
+            # Duplicate IDs in a hand-edited file: the last record wins
+            self.store.delete(product_key(record))
+            key = product_key(self.store.add(record, partial=partial))
+            versions[key] = record_version(record)
+            keys.append(key)
+        return keys
+    
+    def finish_loading(self):
+        """Apply journaled changes and start journaling new ones"""
+        # Journaled changes are edits not yet in products.json
+        self.store.subscribe(self.sync.on_change)
+        with metrics.timer('load.journal_replay'):
+            self.journal.replay(self.store)
+        
+        # From here on every add/update/delete is journaled as it happens
+        self.store.subscribe(self.journal.record)
+        self.loading = False
+        with metrics.timer('load.search_index'):
+            self.search_index.prepare()
+        self.refresh_product_list()
+        self.start_watching()
+        metrics.stop(self.load_timer)
+        metrics.incr('load.products', len(self.store))
+    
+    def read_product(self, key):
+        """Read a full product record from disk through the offset index"""
+        return self.catalog_index.read(key)
+    
+    def still_loading(self):
+        """Tell the user to wait if products are still being loaded"""
+        if self.loading:
+            messagebox.showinfo("Please wait", "Products are still loading. Try again in a moment.")
+        return self.loading
+    
+    def save_products(self, quiet=False, on_saved=None):
+        """Save products to JSON file with backup in the background, compacting the journal"""
+        if self.still_loading():
+            return
+        if quiet and on_saved is None and self.tasks.busy(CATALOG_TASKS):
+            # A save is already queued; it compacts the journal as well
+            return
+        
+        # The snapshot and its journal position are taken together here, so
+        # edits made while the save runs stay in the journal
+        products = self.store.snapshot()
+        seq = self.journal.seq
+        since = self.sync.begin_save()
+        save_timer = metrics.start('save')
+        
+        def saved(task, result):
+            metrics.stop(save_timer)
+            snapshot, versions, signature = result
+            self.sync.saved(since, versions, signature)
+            if self.watcher is not None:
+                self.watcher.remember(signature)
+            self.save_history()
+            if quiet:
+                self.status_var.set("Journal compacted into products.json")
+            else:
+                if snapshot:
+                    backup_note = f"Backup snapshot: {snapshot['id']}"
+                else:
+                    backup_note = "No changes since the last backup"
+                messagebox.showinfo("Success", f"Products saved successfully!\n{backup_note}")
+            if on_saved:
+                on_saved()
+        
+        def failed(task, error):
+            metrics.stop(save_timer, failed=True)
+            self.sync.save_failed(since)
+            if isinstance(error, ChangedOnDisk):
+                # Someone else wrote the file: merge their changes, then save again
+                self.merge_outside_changes(on_merged=lambda: self.save_products(quiet, on_saved))
+                return
+            messagebox.showerror("Error", f"Failed to save products: {str(error)}")
+        
+        self.tasks.submit("Saving products", self._save_catalog, products, seq,
+                          group=CATALOG_TASKS, cancellable=False, on_done=saved, on_error=failed)
+    
+    def _save_catalog(self, task, products, seq):
+        """Worker thread: write products.json and its backup, then compact the journal
+        
+        Refuses with ChangedOnDisk if the file is no longer the one last
+        loaded or saved here, rather than overwriting someone else's changes.
+        The signature is read only now: an earlier save queued in the same
+        group has updated it by the time this one starts.
+        """
+        expected = self.sync.signature
+        versions = {}
+        
+        def tracked():
+            # Full records are read back one at a time while encoding
+            for product in products:
+                versions[product_key(product)] = record_version(product)
+                yield product
+        
+        with metrics.timer('save.write'):
+            with FileLock(self.products_file):
+                if file_signature(self.products_file) != expected:
+                    raise ChangedOnDisk(f"{self.products_file} was changed by another program")
+                snapshot = save_catalog(self.products_file, tracked(), self.backups,
+                                        compact=self.compact_json, lock=False)
+                signature = file_signature(self.products_file)
+            with metrics.timer('save.checkpoint'):
+                self.journal.checkpoint(seq)
+        return snapshot, versions, signature
+    
+    def start_watching(self):
+        """Watch products.json for changes made by other programs"""
+        if self.watcher is None:
+            self.watcher = FileWatcher(self.products_file, self.root.after, self.on_file_changed,
+                                       paused=lambda: self.tasks.busy(CATALOG_TASKS))
+            self.watcher.remember(self.sync.signature)
+            self.watcher.start()
+    
+    def on_file_changed(self, signature):
+        """products.json was changed by another program"""
+        self.merge_outside_changes()
+    
+    def merge_outside_changes(self, on_merged=None):
+        """Read what changed in products.json and merge it into the catalog"""
+        def merged(task, result):
+            changed, removed, signature, index = result
+            conflicts = self.sync.apply(self.store, changed, removed, signature,
+                                        journal=self.journal.record)
+            if index is not None:
+                # Unchanged partial records are re-read from the new file
+                old_index, self.catalog_index = self.catalog_index, index
+                old_index.close()
+            if self.watcher is not None:
+                self.watcher.remember(signature)
+            
+            self.refresh_product_list()
+            count = len(changed) + len(removed)
+            if count:
+                self.status_var.set(f"Merged {count} changes made to products.json by another program")
+            if conflicts:
+                self.show_conflicts(conflicts)
+            if on_merged:
+                on_merged()
+        
+        def failed(task, error):
+            # Typically hand-edited JSON that does not parse; the next save
+            # replaces it, and the backups keep a copy of it
+            signature = file_signature(self.products_file)
+            self.sync.signature = signature
+            if self.watcher is not None:
+                self.watcher.remember(signature)
+            self.status_var.set(f"products.json was changed on disk but could not be read: {error}")
+            if on_merged:
+                on_merged()
+        
+        self.tasks.submit("Merging outside changes", self._read_changes, self.sync.versions,
+                          group=CATALOG_TASKS, cancellable=False, on_done=merged, on_error=failed)
+    
+    def _read_changes(self, task, versions):
+        """Worker thread: find the products that changed in products.json"""
+        signature = file_signature(self.products_file)
+        index = CatalogIndex(self.products_file) if self.catalog_index is not None else None
+        try:
+            changed, removed = read_changes(self.products_file, versions, index)
+        except Exception:
+            if index is not None:
+                index.close()
+            raise
+        return changed, removed, signature, index
+    
+    def show_conflicts(self, conflicts):
+        """Tell the user which fields were edited on both sides"""
+        lines = []
+        for key, fields in conflicts[:MAX_CONFLICTS_SHOWN]:
+            product = self.store.peek(key) or {}
+            lines.append(f"• {product.get('name', key)}: {', '.join(fields)}")
+        if len(conflicts) > MAX_CONFLICTS_SHOWN:
+            lines.append(f"... and {len(conflicts) - MAX_CONFLICTS_SHOWN} more")
+        messagebox.showwarning(
+            "Changes Merged",
+            "products.json was changed by another program while you were editing.\n"
+            "These fields were changed on both sides; your values were kept:\n\n"
+            + "\n".join(lines)
+            + "\n\nThe other version is kept in the backups.",
+        )
+    
+    def create_gui(self):
+        """Create the main GUI"""
+        # Main frame
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Configure grid weights
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        main_frame.rowconfigure(3, weight=1)
+        
+        # Title
+        title_label = ttk.Label(main_frame, text="🛍️ Punjabi E-commerce Store Product Manager", 
+                               font=('Arial', 16, 'bold'))
+        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
+        
+        # Buttons frame
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.grid(row=1, column=0, columnspan=3, pady=(0, 20), sticky=(tk.W, tk.E))
+        
+        ttk.Button(buttons_frame, text="➕ Add New Product", command=self.add_product_window).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="✏️ Edit Selected", command=self.edit_product_window).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🗑️ Delete Selected", command=self.delete_product).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🧮 Batch Edit", command=self.batch_edit_window).pack(side=tk.LEFT, padx=5)
+        self.undo_button = ttk.Button(buttons_frame, text="↩️ Undo", command=self.undo)
+        self.undo_button.pack(side=tk.LEFT, padx=5)
+        self.redo_button = ttk.Button(buttons_frame, text="↪️ Redo", command=self.redo)
+        self.redo_button.pack(side=tk.LEFT, padx=5)
+        self.update_undo_buttons()
+        self.root.bind('<Control-z>', lambda e: self.undo())
+        self.root.bind('<Control-y>', lambda e: self.redo())
+        self.root.bind('<Control-Z>', lambda e: self.redo())
+        ttk.Button(buttons_frame, text="💾 Save All Changes", command=self.save_products).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🔄 Refresh List", command=self.refresh_product_list).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="📊 Export to CSV", command=self.export_to_csv).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="📥 Import", command=self.import_products).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="🖼️ Check Images", command=self.check_all_images).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="📁 Open Data Folder", command=self.open_data_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons_frame, text="📈 Diagnostics", command=self.open_diagnostics).pack(side=tk.LEFT, padx=5)
+        
+        # Search box and facet filters
+        search_frame = ttk.Frame(main_frame)
+        search_frame.grid(row=2, column=0, columnspan=3, pady=(0, 10), sticky=(tk.W, tk.E))
+        
+        ttk.Label(search_frame, text="🔍 Search:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        ttk.Entry(search_frame, textvariable=self.search_var, width=30).pack(side=tk.LEFT, padx=5)
+        
+        # Facet values are shown with their counts, e.g. "men (120)"
+        self.facet_boxes = {}
+        self.facet_choices = {}
+        self.facet_selected = {}
+        for label, field in SEARCH_FACETS:
+            ttk.Label(search_frame, text=f"{label}:").pack(side=tk.LEFT, padx=(10, 0))
+            box = ttk.Combobox(search_frame, state='readonly', width=14, values=[ALL_VALUES])
+            box.set(ALL_VALUES)
+            box.bind('<<ComboboxSelected>>', lambda e, f=field: self.select_facet(f))
+            box.pack(side=tk.LEFT, padx=5)
+            self.facet_boxes[field] = box
+            self.facet_selected[field] = None
+        
+        # Product list frame
+        list_frame = ttk.LabelFrame(main_frame, text="Products List", padding="10")
+        list_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+        list_frame.columnconfigure(0, weight=1)
+        list_frame.rowconfigure(0, weight=1)
+        
+        # Create Treeview; the tree column holds the thumbnails
+        if self.show_thumbnails:
+            ttk.Style(self.root).configure('Treeview', rowheight=LIST_THUMBNAIL_SIZE + 4)
+            self.tree = ttk.Treeview(list_frame, columns=COLUMNS, show='tree headings', height=15)
+            self.tree.column('#0', width=LIST_THUMBNAIL_SIZE + 24, minwidth=LIST_THUMBNAIL_SIZE + 24, stretch=False)
+        else:
+            self.tree = ttk.Treeview(list_frame, columns=COLUMNS, show='headings', height=15)
+        
+        # Configure columns
+        for col in COLUMNS:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_treeview(c))
+            self.tree.column(col, width=120, minwidth=100)
+        
+        # Scrollbars
+        v_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        h_scrollbar = ttk.Scrollbar(list_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        
+        # Only the visible rows are materialized; the scrollbar drives the window
+        self.product_list = VirtualProductList(self.tree, v_scrollbar, self.store.peek,
+                                               product_row_values, on_select=self.on_selection_change,
+                                               row_image=self.list_thumbnail if self.show_thumbnails else None)
+        
+        # Grid layout
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        
+        # Status bar
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=4, column=0, columnspan=3, sticky=(tk.W, tk.E))
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN)
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        # Shown only while a background task that can be stopped is running
+        self.cancel_button = ttk.Button(status_frame, text="✖ Cancel", command=self.cancel_tasks)
+        
+        # Bind double-click to edit
+        self.tree.bind('<Double-1>', lambda e: self.edit_product_window())
+    
+    def add_product_window(self):
+        """Open window to add new product"""
+        if self.still_loading():
+            return
+        self.product_window = tk.Toplevel(self.root)
+        self.product_window.title("Add New Product")
+        self.product_window.geometry("600x700")
+        self.product_window.transient(self.root)
+        self.product_window.grab_set()
+        
+        self.create_product_form(self.product_window, mode="add")
+    
+    def edit_product_window(self):
+        """Open window to edit selected product"""
+        if self.still_loading():
+            return
+        selection = self.product_list.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a product to edit")
+            return
+        if len(selection) > 1:
+            self.batch_edit_window()
+            return
+        
+        try:
+            product = self.store.get(selection[0])
+        except IndexOutdated as e:
+            # The merge that follows the rewrite re-indexes the file
+            messagebox.showerror("Error", f"{str(e)}\n\nTry again once the changes are merged.")
+            return
+        if not product:
+            messagebox.showerror("Error", "Product not found")
+            return
+        
+        self.product_window = tk.Toplevel(self.root)
+        self.product_window.title(f"Edit Product: {product.get('name', 'Unknown')}")
+        self.product_window.geometry("600x700")
+        self.product_window.transient(self.root)
+        self.product_window.grab_set()
+        
+        self.create_product_form(self.product_window, mode="edit", product=product)
+    
+    def create_product_form(self, window, mode="add", product=None):
+        """Create product form in the given window"""
+        # Main frame
+        main_frame = ttk.Frame(window, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Form fields
+        fields = []
+        
+        # Basic Information
+        basic_frame = ttk.LabelFrame(main_frame, text="Basic Information", padding="10")
+        basic_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        fields.append(('name', 'Product Name*:', 'text', basic_frame))
+        fields.append(('punjabiName', 'Punjabi Name:', 'text', basic_frame))
+        fields.append(('description', 'Description:', 'text', basic_frame))
+        
+        # Category Information
+        category_frame = ttk.LabelFrame(main_frame, text="Category Information", padding="10")
+        category_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        fields.append(('productType', 'Product Type*:', 'combo', category_frame, ['jutti', 'fulkari']))
+        fields.append(('category', 'Category*:', 'combo', category_frame, ['men', 'women', 'kids', 'fulkari']))
+        fields.append(('subcategory', 'Subcategory:', 'text', category_frame))
+        
+        # Pricing and Stock
+        pricing_frame = ttk.LabelFrame(main_frame, text="Pricing & Stock", padding="10")
+        pricing_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        fields.append(('price', 'Price (₹)*:', 'number', pricing_frame))
+        fields.append(('stock', 'Stock Quantity*:', 'number', pricing_frame))
+        
+        # Variants
+        variants_frame = ttk.LabelFrame(main_frame, text="Variants", padding="10")
+        variants_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        fields.append(('sizes', 'Available Sizes:', 'list', variants_frame))
+        fields.append(('colors', 'Available Colors:', 'list', variants_frame))
+        
+        # Images
+        images_frame = ttk.LabelFrame(main_frame, text="Images", padding="10")
+        images_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        fields.append(('images', 'Image URLs:', 'list', images_frame))
+        
+        # Create form widgets
+        self.form_widgets = {}
+        for i, field_info in enumerate(fields):
+            field_name, label_text, field_type, parent_frame, *extra = field_info
+            
+            # Label
+            label = ttk.Label(parent_frame, text=label_text)
+            label.grid(row=i, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+            
+            # Input widget
+            if field_type == 'text':
+                widget = ttk.Entry(parent_frame, width=40)
+                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
+            elif field_type == 'number':
+                widget = ttk.Entry(parent_frame, width=40)
+                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
+            elif field_type == 'combo':
+                widget = ttk.Combobox(parent_frame, values=extra[0], width=37)
+                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
+            elif field_type == 'list':
+                # Create frame for list input
+                list_frame = ttk.Frame(parent_frame)
+                list_frame.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
+                
+                entry = ttk.Entry(list_frame, width=30)
+                entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+                
+                add_btn = ttk.Button(list_frame, text="+", width=3, 
+                                   command=lambda e=entry, f=field_name: self.add_list_item(e, f))
+                add_btn.pack(side=tk.LEFT, padx=(5, 0))
+                
+                # Create listbox for display
+                listbox_frame = ttk.Frame(parent_frame)
+                listbox_frame.grid(row=i+1, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=(0, 5))
+                
+                listbox = tk.Listbox(listbox_frame, height=3)
+                listbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+                
+                scrollbar = ttk.Scrollbar(listbox_frame, orient=tk.VERTICAL, command=listbox.yview)
+                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+                listbox.configure(yscrollcommand=scrollbar.set)
+                
+                # Store both entry and listbox
+                widget = {'entry': entry, 'listbox': listbox}
+                
+                # Move to next row for listbox
+                i += 1
+            
+            self.form_widgets[field_name] = widget
+        
+        # Buttons
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(20, 0))
+        
+        if mode == "add":
+            ttk.Button(button_frame, text="Add Product", command=lambda: self.save_product(mode)).pack(side=tk.RIGHT, padx=(5, 0))
+        else:
+            ttk.Button(button_frame, text="Update Product", command=lambda: self.save_product(mode, product)).pack(side=tk.RIGHT, padx=(5, 0))
+        
+        ttk.Button(button_frame, text="Cancel", command=window.destroy).pack(side=tk.RIGHT)
+        
+        # Populate form if editing
+        if mode == "edit" and product:
+            self.populate_form(product)
+        
+        # Preview of the selected image, and a check that every image resolves
+        images_row = len(fields) - 1
+        images_listbox = self.form_widgets['images']['listbox']
+        preview = ttk.Label(images_frame, text="Select an image\nto preview", anchor=tk.CENTER, justify=tk.CENTER)
+        preview.grid(row=images_row, column=2, rowspan=2, padx=(10, 0))
+        images_listbox.bind('<<ListboxSelect>>', lambda e: self.show_image_preview(images_listbox, preview))
+        ttk.Button(images_frame, text="🔍 Check Images",
+                   command=lambda: self.check_form_images(window, images_listbox)).grid(
+            row=images_row + 2, column=1, sticky=tk.W, pady=(5, 0))
+        
+        # Configure grid weights
+        for frame in [basic_frame, category_frame, pricing_frame, variants_frame, images_frame]:
+            frame.columnconfigure(1, weight=1)
+    
+    def add_list_item(self, entry, field_name):
+        """Add item to list field"""
+        value = entry.get().strip()
+        if value:
+            widget = self.form_widgets[field_name]
+            if isinstance(widget, dict) and 'listbox' in widget:
+                widget['listbox'].insert(tk.END, value)
+                entry.delete(0, tk.END)
+    
+    def populate_form(self, product):
+        """Populate form with existing product data"""
+        for field_name, widget in self.form_widgets.items():
+            value = product.get(field_name, '')
+            
+            if isinstance(widget, dict):
+                # List field
+                if 'listbox' in widget:
+                    widget['listbox'].delete(0, tk.END)
+                    if isinstance(value, list):
+                        for item in value:
+                            widget['listbox'].insert(tk.END, item)
+            else:
+                # Regular field
+                if hasattr(widget, 'set'):
+                    widget.set(value)
+                elif hasattr(widget, 'insert'):
+                    widget.delete(0, tk.END)
+                    widget.insert(0, str(value))
+    
+    def save_product(self, mode, product=None):
+        """Save product data"""
+        try:
+            # Collect form data
+            product_data = {}
+            
+            for field_name, widget in self.form_widgets.items():
+                if isinstance(widget, dict):
+                    # List field
+                    if 'listbox' in widget:
+                        values = list(widget['listbox'].get(0, tk.END))
+                        product_data[field_name] = values
+                else:
+                    # Regular field
+                    if hasattr(widget, 'get'):
+                        value = widget.get()
+                    elif hasattr(widget, 'get_value'):
+                        value = widget.get_value()
+                    else:
+                        value = ''
+                    
+                    product_data[field_name] = value
+            
+            # Same rules as bulk imports: numbers, required fields, category
+            try:
+                product_data = validate_product(product_data)
+            except ValidationError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            
+            if mode == "add":
+                # Generates ID and timestamps
+                with self.history.recording(self.store, f"add '{product_data.get('name', '')}'"):
+                    new_product = self.store.create(product_data)
+                self.update_undo_buttons()
+                messagebox.showinfo("Success", "Product added successfully!")
+            else:
+                # Update existing product
+                product_id = product_key(product)
+                if product_id not in self.store:
+                    # Deleted (here, or merged in from another program) while the form was open
+                    messagebox.showerror("Error", f"'{product.get('name', product_id)}' no longer exists, "
+                                                  "so the changes were not saved.")
+                    return
+                with self.history.recording(self.store, f"edit '{product_data.get('name', '')}'"):
+                    self.store.update(product_id, product_data)
+                self.update_undo_buttons()
+                messagebox.showinfo("Success", "Product updated successfully!")
+            
+            # Close window
+            self.product_window.destroy()
+            
+            # Update just the affected row
+            if mode == "add":
+                self.product_list.append(product_key(new_product))
+                self.product_list.see(product_key(new_product))
+            else:
+                self.product_list.update(product_key(product))
+            self.maybe_compact()
+            
+            # Update status
+            self.status_var.set(f"Product {'added' if mode == 'add' else 'updated'} successfully")
+            
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save product: {str(e)}")
+    
+    def delete_product(self):
+        """Delete selected product"""
+        if self.still_loading():
+            return
+        selection = self.product_list.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a product to delete")
+            return
+        if len(selection) > 1:
+            if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {len(selection)} products?"):
+                self.apply_batch(BatchEdit(self.store, delete=True).plan(selection))
+            return
+        
+        product_id = selection[0]
+        product_name = self.store.peek(product_id).get('name', '')
+        
+        # Confirm deletion
+        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{product_name}'?"):
+            return
+        
+        # Remove from products list and just that row from the view
+        with self.history.recording(self.store, f"delete '{product_name}'"):
+            self.store.delete(product_id)
+        self.update_undo_buttons()
+        self.product_list.remove(product_id)
+        self.maybe_compact()
+        
+        # Update status
+        self.status_var.set(f"Product '{product_name}' deleted")
+        
+        messagebox.showinfo("Success", f"Product '{product_name}' deleted successfully!")
+    
+    def batch_edit_window(self):
+        """Change price, stock or status of the selected or all listed products at once"""
+        if self.still_loading():
+            return
+        selection = self.product_list.selection()
+        shown = list(self.product_list.keys)
+        if not shown:
+            messagebox.showwarning("Warning", "There are no products to edit")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Batch Edit")
+        window.geometry("480x360")
+        window.transient(self.root)
+        window.grab_set()
+        
+        main_frame = ttk.Frame(window, padding="20")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Which products: the selection, or everything the search/filters show
+        scope_frame = ttk.LabelFrame(main_frame, text="Products", padding="10")
+        scope_frame.pack(fill=tk.X, pady=(0, 10))
+        scope_var = tk.StringVar(value='selected' if len(selection) > 1 else 'shown')
+        selected_button = ttk.Radiobutton(scope_frame, text=f"Selected products ({len(selection)})",
+                                          variable=scope_var, value='selected')
+        selected_button.pack(anchor=tk.W)
+        if not selection:
+            selected_button.configure(state='disabled')
+        ttk.Radiobutton(scope_frame, text=f"All products in the list ({len(shown)})",
+                        variable=scope_var, value='shown').pack(anchor=tk.W)
+        
+        changes_frame = ttk.LabelFrame(main_frame, text="Changes (leave empty to keep)", padding="10")
+        changes_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(changes_frame, text="Price (₹):").grid(row=0, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        price_entry = ttk.Entry(changes_frame, width=15)
+        price_entry.grid(row=0, column=1, sticky=tk.W, pady=5)
+        ttk.Label(changes_frame, text="1499, +100, -100, +10% or -10%").grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
+        
+        ttk.Label(changes_frame, text="Stock:").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        stock_entry = ttk.Entry(changes_frame, width=15)
+        stock_entry.grid(row=1, column=1, sticky=tk.W, pady=5)
+        ttk.Label(changes_frame, text="0, 25, +10 or -5").grid(row=1, column=2, sticky=tk.W, padx=(10, 0))
+        
+        ttk.Label(changes_frame, text="Status:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=5)
+        status_box = ttk.Combobox(changes_frame, state='readonly', width=13,
+                                  values=['No change'] + [name.capitalize() for name in STATUS_CHANGES])
+        status_box.set('No change')
+        status_box.grid(row=2, column=1, sticky=tk.W, pady=5)
+        
+        def apply():
+            keys = selection if scope_var.get() == 'selected' else shown
+            try:
+                price = parse_adjustment(price_entry.get(), 'price')
+                stock = parse_adjustment(stock_entry.get(), 'stock')
+            except ValidationError as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            active = STATUS_CHANGES.get(status_box.get().lower())
+            batch = BatchEdit(self.store, price=price, stock=stock, active=active)
+            if batch.is_empty():
+                messagebox.showwarning("Warning", "Enter a price, stock or status change", parent=window)
+                return
+            
+            batch.plan(keys)
+            if batch.errors:
+                lines = [message for key, message in batch.errors[:MAX_CONFLICTS_SHOWN]]
+                if len(batch.errors) > MAX_CONFLICTS_SHOWN:
+                    lines.append(f"... and {len(batch.errors) - MAX_CONFLICTS_SHOWN} more")
+                messagebox.showerror("Error", "Nothing was changed:\n\n" + "\n".join(lines), parent=window)
+                return
+            if not messagebox.askyesno("Confirm Batch Edit", f"{batch.label()}\n\n{batch.summary()}. Apply?",
+                                       parent=window):
+                return
+            window.destroy()
+            self.apply_batch(batch)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(button_frame, text="Apply", command=apply).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Cancel", command=window.destroy).pack(side=tk.RIGHT)
+    
+    def apply_batch(self, batch):
+        """Apply a planned BatchEdit in one pass: one refresh, one save, one undo step"""
+        if not batch.changes:
+            self.status_var.set("No products needed changing")
+            return
+        
+        # Journaled in one write, so the edit survives a crash before the full save below
+        with metrics.timer('batch'):
+            try:
+                with self.journal.batch(), \
+                        self.history.recording(self.store, f"{batch.label()} on {len(batch.changes)} products"):
+                    changes = batch.apply()
+            except Exception as e:
+                messagebox.showerror("Error", f"Nothing was changed: {str(e)}")
+                return
+            finally:
+                self.update_undo_buttons()
+            
+            self.refresh_product_list()
+        metrics.incr('batch.products', len(changes))
+        
+        message = f"{len(changes)} products {'deleted' if batch.delete else 'changed'} ({batch.label()})"
+        self.status_var.set(message)
+        self.save_products(quiet=True, on_saved=lambda: self.status_var.set(f"{message}, saved"))
+    
+    def undo(self):
+        """Undo the most recent add, edit, delete, batch edit or import"""
+        self.step_history(redo=False)
+    
+    def redo(self):
+        """Redo the most recently undone step"""
+        self.step_history(redo=True)
+    
+    def step_history(self, redo):
+        if self.still_loading() or not (self.history.can_redo() if redo else self.history.can_undo()):
+            return
+        
+        # Small steps are journaled like any edit; big ones in one write and
+        # then saved in full, like a batch
+        steps = self.history.redo_steps if redo else self.history.undo_steps
+        bulk = len(steps[-1]['changes']) > BULK_UNDO
+        try:
+            with metrics.timer('redo' if redo else 'undo'), \
+                    (self.journal.batch() if bulk else contextlib.nullcontext()):
+                step, skipped = self.history.redo(self.store) if redo else self.history.undo(self.store)
+        finally:
+            self.update_undo_buttons()
+        self.refresh_product_list()
+        
+        message = f"{'Redid' if redo else 'Undid'} {step['label']}"
+        if skipped:
+            message += f"; {len(skipped)} products changed since were left as they are"
+        self.status_var.set(message)
+        if bulk:
+            self.save_products(quiet=True, on_saved=lambda: self.status_var.set(f"{message}, saved"))
+        else:
+            self.maybe_compact()
+    
+    def update_undo_buttons(self):
+        """Enable Undo/Redo when there is something to undo/redo"""
+        self.undo_button.configure(state='normal' if self.history.can_undo() else 'disabled')
+        self.redo_button.configure(state='normal' if self.history.can_redo() else 'disabled')
+    
+    def save_history(self, background=True):
+        """Keep the undo history in the data folder, if PRODUCTS_KEEP_HISTORY=1"""
+        if not self.keep_history:
+            return
+        state = self.history.state()
+        if not background:
+            self.history.save(self.history_file, state)
+            return
+        self.tasks.submit("Saving undo history", lambda task: self.history.save(self.history_file, state),
+                          cancellable=False,
+                          on_error=lambda task, error: self.status_var.set(f"Could not save the undo history: {error}"))
+    
+    def on_close(self):
+        """Save the undo history, if kept, and close the window
+        
+        Waits for queued catalog saves (batch edits, imports and bulk undo
+        save in the background) to finish first, so none is lost.
+        """
+        if self.tasks.busy(CATALOG_TASKS):
+            if not self.closing:
+                self.closing = True
+                self.status_var.set("Finishing the save before closing...")
+                self.root.after(CLOSE_POLL_MS, self.close_when_saved)
+            return
+        try:
+            self.thumbnails.save_index()
+        except OSError:
+            # Only costs re-reading the images next time
+            pass
+        try:
+            self.save_history(background=False)
+        except OSError as e:
+            if not messagebox.askokcancel("Undo History", f"Could not save the undo history: {str(e)}\n\nClose anyway?"):
+                return
+        self.tasks.cancel_all()
+        self.tasks.shutdown(wait=False)
+        self.root.destroy()
+    
+    def close_when_saved(self):
+        """Close once the queued catalog saves are done"""
+        if self.tasks.busy(CATALOG_TASKS):
+            self.root.after(CLOSE_POLL_MS, self.close_when_saved)
+            return
+        self.closing = False
+        self.on_close()
+    
+    def maybe_compact(self):
+        """Fold the journal into products.json once it has grown large"""
+        if self.journal.needs_compaction():
+            self.save_products(quiet=True)
+    
+    def refresh_product_list(self):
+        """Refresh the product list display"""
+        # Only the visible rows are rebuilt; the active search and sort are kept
+        with metrics.timer('refresh'):
+            with metrics.timer('refresh.search'):
+                result = self.search_products()
+                keys = self.store.keys() if result is None else result
+            if self.sort_spec:
+                spec = [(COLUMN_FIELDS[c], descending) for c, descending in self.sort_spec]
+                with metrics.timer('refresh.sort'):
+                    keys = self.store.sort_keys(keys, spec)
+            with metrics.timer('refresh.list'):
+                self.product_list.set_keys(keys)
+            with metrics.timer('refresh.facets'):
+                self.update_facets(result)
+        
+        # Update status
+        if result is None:
+            self.status_var.set(f"Showing {len(self.store)} products")
+        else:
+            self.status_var.set(f"Showing {len(keys)} of {len(self.store)} products")
+    
+    def schedule_search(self):
+        """Search shortly after the user stops typing"""
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY_MS, self.run_search)
+    
+    def run_search(self):
+        """Apply the search box to the product list"""
+        self.search_after_id = None
+        self.refresh_product_list()
+    
+    def select_facet(self, field):
+        """Filter by the facet value picked in a facet box"""
+        self.facet_selected[field] = self.facet_choices.get(field, {}).get(self.facet_boxes[field].get())
+        self.refresh_product_list()
+    
+    def search_products(self):
+        """Run the current search, or return None when nothing is filtered"""
+        text = self.search_var.get().strip()
+        filters = {field: value for field, value in self.facet_selected.items() if value is not None}
+        if not text and not filters:
+            return None
+        return self.search_index.search(text, filters)
+    
+    def update_facets(self, result):
+        """Show facet values with their counts within the current results"""
+        for field, box in self.facet_boxes.items():
+            counts = self.search_index.facet_counts(field, result)
+            selected = self.facet_selected[field]
+            if selected is not None:
+                counts.setdefault(selected, 0)
+            
+            choices = {}
+            for value in sorted(counts, key=str):
+                choices[f"{value} ({counts[value]})"] = value
+            self.facet_choices[field] = choices
+            box.configure(values=[ALL_VALUES] + list(choices))
+            box.set(ALL_VALUES if selected is None else f"{selected} ({counts[selected]})")
+    
+    def sort_treeview(self, col):
+        """Sort treeview by column
+        
+        Clicking the primary sort column toggles its direction; clicking another
+        column makes it primary and keeps the previous columns as tie-breakers.
+        """
+        if self.sort_spec and self.sort_spec[0][0] == col:
+            self.sort_spec[0] = (col, not self.sort_spec[0][1])
+        else:
+            self.sort_spec = [(col, False)] + [s for s in self.sort_spec if s[0] != col]
+            del self.sort_spec[MAX_SORT_COLUMNS:]
+        
+        # Sort the in-memory data, then reorder the view once
+        spec = [(COLUMN_FIELDS[c], descending) for c, descending in self.sort_spec]
+        with metrics.timer('sort'):
+            with metrics.timer('sort.keys'):
+                keys = self.store.sort_keys(self.product_list.keys, spec)
+            with metrics.timer('sort.list'):
+                self.product_list.set_keys(keys)
+        
+        # Show the direction on the primary column only
+        for c in COLUMNS:
+            arrow = ''
+            if c == self.sort_spec[0][0]:
+                arrow = ' ▼' if self.sort_spec[0][1] else ' ▲'
+            self.tree.heading(c, text=c + arrow)
+    
+    def on_selection_change(self, event):
+        """Handle selection change in treeview"""
+        selection = self.product_list.selection()
+        if selection:
+            product_name = self.store.peek(selection[0]).get('name', '')
+            self.status_var.set(f"Selected: {product_name}")
+        else:
+            self.status_var.set("Ready")
+    
+    def export_to_csv(self):
+        """Export products to CSV (or columnar TSV) on a worker thread"""
+        if self.still_loading():
+            return
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[
+                ("CSV files", "*.csv"),
+                ("Gzipped CSV files", "*.csv.gz"),
+                ("Columnar TSV files", "*.tsv"),
+                ("Gzipped columnar TSV files", "*.tsv.gz"),
+                ("All files", "*.*"),
+            ]
+        )
+        if not filename:
+            return
+        
+        # The snapshot is taken here, so edits made during the export are not included
+        export_timer = metrics.start('export')
+        products = self.store.snapshot()
+        
+        def export(task):
+            def progress(stage, done, total):
+                task.report(done, total, "Scanning fields" if stage == 'schema' else "Exporting products")
+            try:
+                with metrics.timer('export.write'):
+                    return export_products(products, filename, fmt=guess_format(filename),
+                                           progress=progress, cancel=task.cancel_event)
+            except ExportCancelled:
+                raise TaskCancelled("Export cancelled")
+        
+        def exported(task, count):
+            metrics.stop(export_timer)
+            metrics.incr('export.rows', count)
+            messagebox.showinfo("Success", f"{count} products exported to {filename}")
+        
+        def failed(task, error):
+            metrics.stop(export_timer, failed=True)
+            messagebox.showerror("Error", f"Failed to export: {str(error)}")
+        
+        self.tasks.submit(
+            "Exporting products", export, on_done=exported, on_error=failed,
+            on_cancelled=lambda task: self.status_var.set("Export cancelled"),
+        )
+    
+    def import_products(self):
+        """Bulk import products from CSV or JSONL, previewing the changes first"""
+        if self.still_loading():
+            return
+        filename = filedialog.askopenfilename(
+            filetypes=[
+                ("CSV or JSONL files", "*.csv *.csv.gz *.jsonl *.jsonl.gz *.ndjson"),
+                ("All files", "*.*"),
+            ]
+        )
+        if not filename:
+            return
+        
+        # Dry-run preview; modal so the catalog is not edited underneath the
+        # plan (outside changes merged meanwhile are caught by apply())
+        window = tk.Toplevel(self.root)
+        window.title("Import Preview")
+        window.geometry("700x500")
+        window.transient(self.root)
+        window.grab_set()
+        
+        summary_var = tk.StringVar(value="Reading file...")
+        ttk.Label(window, textvariable=summary_var).pack(fill=tk.X, padx=10, pady=(10, 5))
+        diff_text = scrolledtext.ScrolledText(window, height=20, wrap=tk.NONE)
+        diff_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        plan = ImportPlan(self.store)
+        apply_button = ttk.Button(button_frame, text="Apply Import", state='disabled',
+                                  command=lambda: (window.destroy(), self.apply_import(plan)))
+        apply_button.pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Cancel", command=window.destroy).pack(side=tk.RIGHT)
+        
+        rows = read_rows(filename)
+        
+        def plan_rows(task):
+            # Rows are planned in batches on a worker thread; the store is only read
+            try:
+                while True:
+                    task.check_cancelled()
+                    batch = list(itertools.islice(rows, LOAD_BATCH_SIZE))
+                    if not batch:
+                        return plan
+                    plan.add_rows(batch)
+                    task.report(plan.rows, message="Checking rows")
+            finally:
+                rows.close()
+        
+        def progress(task):
+            if window.winfo_exists():
+                summary_var.set(f"Checking rows... {plan.rows}")
+        
+        def planned(task, plan):
+            if not window.winfo_exists():
+                return
+            summary_var.set(plan.summary())
+            diff_text.insert('1.0', '\n'.join(plan.describe()) or "No changes")
+            diff_text.configure(state='disabled')
+            if plan.changes:
+                apply_button.configure(state='normal')
+        
+        def failed(task, error):
+            if window.winfo_exists():
+                window.destroy()
+            messagebox.showerror("Error", f"Failed to read {filename}: {str(error)}")
+        
+        task = self.tasks.submit("Checking import", plan_rows, on_done=planned, on_error=failed,
+                                 on_progress=progress)
+        
+        def closed(event):
+            # Closing the preview stops the planning, which closes the file;
+            # the generator is only ever touched by the worker running it
+            if event.widget is window:
+                task.cancel()
+        window.bind('<Destroy>', closed)
+    
+    def apply_import(self, plan):
+        """Apply a reviewed import plan and save it in one go"""
+        # Journaled in one write, so the import survives a crash before the full save below
+        try:
+            with self.journal.batch(), self.history.recording(self.store, "import"):
+                count = plan.apply()
+        except ValidationError as e:
+            messagebox.showerror("Error", f"Nothing was imported: {str(e)}")
+            return
+        finally:
+            self.update_undo_buttons()
+        
+        self.refresh_product_list()
+        
+        def saved():
+            self.status_var.set(f"Imported {count} products")
+            messagebox.showinfo("Success", f"Imported {count} products\n{plan.summary()}")
+        self.save_products(quiet=True, on_saved=saved)
+    
+    def list_thumbnail(self, product):
+        """Thumbnail of a product's first image for its list row, or None until it has loaded"""
+        images = product_images(product)
+        if not images or not images[0].strip():
+            return None
+        return self.thumbnail_image(images[0], LIST_THUMBNAIL_SIZE)
+    
+    def thumbnail_image(self, url, size, on_ready=None):
+        """Return the PhotoImage thumbnail of url if loaded, else queue it and return None
+        
+        on_ready(image, error) is called once it has loaded or failed to.
+        """
+        wanted = (url, size)
+        image = self.thumbnail_images.get(wanted)
+        if image is not None:
+            self.thumbnail_images.move_to_end(wanted)
+            return image
+        if wanted in self.thumbnail_failed:
+            if on_ready:
+                on_ready(None, self.thumbnail_failed[wanted])
+            return None
+        
+        if on_ready:
+            self.thumbnail_waiters.setdefault(wanted, []).append(on_ready)
+        if wanted not in self.thumbnail_pending:
+            self.thumbnail_pending.add(wanted)
+            self.thumbnail_queue.append(wanted)
+            if not self.thumbnail_loading:
+                # Everything a render asks for goes to the worker as one batch
+                self.thumbnail_loading = True
+                self.root.after_idle(self.load_thumbnails)
+        return None
+    
+    def load_thumbnails(self):
+        """Fetch the queued thumbnails on a worker; each shows up as soon as it is ready"""
+        wanted, self.thumbnail_queue = self.thumbnail_queue, []
+        if not wanted:
+            self.thumbnail_loading = False
+            return
+        
+        def finished(task, result=None):
+            # Anything the batch did not get to can be asked for again
+            for item in wanted:
+                if item not in self.thumbnail_images and item not in self.thumbnail_failed:
+                    self.thumbnail_pending.discard(item)
+            self.load_thumbnails()
+        
+        self.tasks.submit("Loading thumbnails", self._fetch_thumbnails, wanted, group=THUMBNAIL_TASKS,
+                          cancellable=False, on_publish=self.on_thumbnail, on_done=finished,
+                          on_error=finished)
+    
+    def _fetch_thumbnails(self, task, wanted):
+        """Worker thread: find or make thumbnails, a few images at a time"""
+        def fetch(item):
+            url, size = item
+            try:
+                path, source = self.thumbnails.get(url, size)
+                return item, path, source, None
+            except (OSError, ValueError) as e:
+                return item, None, None, str(e)
+        
+        # Remote images are read in parallel, local ones are quick anyway
+        with ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix='thumbnail') as pool:
+            for result in pool.map(fetch, wanted):
+                task.publish(result)
+        self.thumbnails.save_index()
+    
+    def on_thumbnail(self, task, result):
+        """Turn a fetched thumbnail into a PhotoImage on the Tk thread and show it"""
+        wanted, path, source, error = result
+        url, size = wanted
+        image = None
+        try:
+            if path is None and source is not None:
+                # No Pillow: Tk scales PNG and GIF images itself
+                digest, data = source
+                with metrics.timer('thumbnails.make'):
+                    path = self.thumbnails.add(digest, size, lambda tmp: tk_thumbnail(data, size, tmp))
+            if path is not None:
+                image = tk.PhotoImage(file=path)
+        except (tk.TclError, OSError) as e:
+            error = "Preview needs Pillow for this image format" if isinstance(e, tk.TclError) else str(e)
+        
+        self.thumbnail_pending.discard(wanted)
+        if image is not None:
+            self.thumbnail_images[wanted] = image
+            while len(self.thumbnail_images) > MAX_THUMBNAIL_IMAGES:
+                self.thumbnail_images.popitem(last=False)
+        else:
+            self.thumbnail_failed[wanted] = error or "No preview"
+        
+        if size == LIST_THUMBNAIL_SIZE:
+            self.product_list.refresh_images()
+        for callback in self.thumbnail_waiters.pop(wanted, []):
+            callback(image, self.thumbnail_failed.get(wanted))
+    
+    def show_image_preview(self, listbox, preview):
+        """Show a thumbnail of the image selected in the product form"""
+        selection = listbox.curselection()
+        if not selection:
+            return
+        url = listbox.get(selection[0])
+        
+        def ready(image, error):
+            # The form may have closed, or another image been selected, meanwhile
+            if not preview.winfo_exists() or preview.url != url:
+                return
+            if image is not None:
+                preview.configure(image=image, text='')
+            else:
+                preview.configure(image='', text=f"No preview:\n{error}", wraplength=FORM_THUMBNAIL_SIZE + 40)
+        
+        preview.url = url
+        image = self.thumbnail_image(url, FORM_THUMBNAIL_SIZE, on_ready=ready)
+        if image is not None:
+            ready(image, None)
+        elif (url, FORM_THUMBNAIL_SIZE) in self.thumbnail_pending:
+            preview.configure(image='', text="Loading preview...")
+    
+    def check_form_images(self, window, listbox):
+        """Check the image URLs in the product form and mark the broken ones"""
+        urls = list(listbox.get(0, tk.END))
+        if not urls:
+            messagebox.showinfo("Check Images", "No image URLs to check", parent=window)
+            return
+        
+        def check(task):
+            return {url: (ok, message) for url, ok, message in check_urls(urls)}
+        
+        def checked(task, results):
+            if not window.winfo_exists():
+                return
+            broken = []
+            for index, url in enumerate(listbox.get(0, tk.END)):
+                ok, message = results.get(url, (True, ''))
+                listbox.itemconfigure(index, foreground='' if ok else 'red')
+                if not ok:
+                    broken.append(f"• {url}: {message}")
+            if broken:
+                messagebox.showwarning("Check Images", "These images cannot be loaded:\n\n" + "\n".join(broken),
+                                       parent=window)
+            else:
+                messagebox.showinfo("Check Images", f"All {len(urls)} images were found", parent=window)
+        
+        self.tasks.submit("Checking images", check, on_done=checked,
+                          on_error=lambda task, error: messagebox.showerror(
+                              "Error", f"Failed to check images: {str(error)}", parent=window))
+    
+    def check_all_images(self):
+        """Check every product's image URLs in the background and list the broken ones"""
+        if self.still_loading():
+            return
+        # Like an export, the check works on the catalog as it is now
+        products = self.store.snapshot()
+        
+        def check(task):
+            def progress(done, total):
+                task.report(done, total, "Checking images")
+            result = check_images(products, progress=progress, cancelled=task.cancel_event)
+            task.check_cancelled()
+            return result
+        
+        def checked(task, result):
+            count, broken = result
+            if not broken:
+                self.status_var.set(f"All {count} image URLs resolve")
+                messagebox.showinfo("Check Images", f"All {count} image URLs resolve")
+                return
+            self.show_broken_images(count, broken)
+        
+        self.tasks.submit(
+            "Checking images", check, on_done=checked,
+            on_error=lambda task, error: messagebox.showerror("Error", f"Failed to check images: {str(error)}"),
+            on_cancelled=lambda task: self.status_var.set("Image check cancelled"),
+        )
+    
+    def show_broken_images(self, count, broken):
+        """List broken product images, with a button to show just those products"""
+        keys = list(dict.fromkeys(key for key, _, _ in broken))
+        summary = f"{len(broken)} broken images in {len(keys)} products ({count} image URLs checked)"
+        self.status_var.set(summary)
+        
+        window = tk.Toplevel(self.root)
+        window.title("Broken Images")
+        window.geometry("800x500")
+        window.transient(self.root)
+        
+        ttk.Label(window, text=summary).pack(fill=tk.X, padx=10, pady=(10, 5))
+        text = scrolledtext.ScrolledText(window, height=20, wrap=tk.NONE)
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        lines = []
+        for key, url, reason in broken[:MAX_BROKEN_SHOWN]:
+            product = self.store.peek(key) or {}
+            lines.append(f"{product.get('name', key)}  {url}: {reason}")
+        if len(broken) > MAX_BROKEN_SHOWN:
+            lines.append(f"... and {len(broken) - MAX_BROKEN_SHOWN} more")
+        text.insert('1.0', '\n'.join(lines))
+        text.configure(state='disabled')
+        
+        def show_products():
+            window.destroy()
+            present = [key for key in keys if key in self.store]
+            self.product_list.set_keys(present)
+            self.status_var.set(f"Showing {len(present)} products with broken images; "
+                                "Refresh List shows all products")
+        
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text="Show These Products", command=show_products).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT)
+    
+    def open_data_folder(self):
+        """Open the data folder in file explorer"""
+        self.tasks.submit(
+            "Opening data folder", self._open_folder, "data", cancellable=False,
+            on_error=lambda task, error: messagebox.showerror("Error", f"Failed to open folder: {str(error)}"),
+        )
+    
+    def _open_folder(self, task, folder):
+        """Worker thread: run the platform's file browser, which may not return quickly"""
+        import subprocess
+        import platform
+        
+        if platform.system() == "Windows":
+            subprocess.run(["explorer", folder])
+        elif platform.system() == "Darwin":  # macOS
+            subprocess.run(["open", folder])
+        else:  # Linux
+            subprocess.run(["xdg-open", folder])
+    
+    def show_task_status(self, tasks):
+        """Show background task progress in the status bar"""
+        # Thumbnails load on every scroll, so they neither show nor reset the status
+        active = [task for task in tasks.active if task.group != THUMBNAIL_TASKS]
+        running = [task for task in active if task.state == 'running']
+        if running:
+            self.status_var.set(" | ".join(task.describe() for task in running))
+        elif not active and self.status_shows_tasks:
+            self.status_var.set("Ready")
+        self.status_shows_tasks = bool(active)
+        
+        if any(task.cancellable for task in tasks.active):
+            self.cancel_button.pack(side=tk.RIGHT, padx=(5, 0))
+        else:
+            self.cancel_button.pack_forget()
+        
+        if self.columnar is not None:
+            self.columnar.reclaim()
+    
+    def cancel_tasks(self):
+        """Stop the background tasks that can be stopped"""
+        if self.tasks.cancel_all():
+            self.status_var.set("Cancelling...")
+    
+    def open_diagnostics(self):
+        """Show operation timings and counters, and profile single operations"""
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Diagnostics")
+        window.geometry("900x650")
+        self.diagnostics_window = window
+        
+        # Timers, in milliseconds except the total
+        columns = ('Timer', 'Count', 'Mean ms', 'p95 ms', 'Max ms', 'Last ms', 'Total s')
+        timers_tree = ttk.Treeview(window, columns=columns, show='headings', height=12)
+        for col in columns:
+            timers_tree.heading(col, text=col)
+            timers_tree.column(col, width=160 if col == 'Timer' else 90, anchor=tk.W if col == 'Timer' else tk.E)
+        timers_tree.pack(fill=tk.X, padx=10, pady=(10, 5))
+        
+        counters_var = tk.StringVar()
+        ttk.Label(window, textvariable=counters_var, wraplength=860).pack(fill=tk.X, padx=10, pady=5)
+        
+        # Profile the next run of one operation
+        profile_frame = ttk.LabelFrame(window, text="Profile", padding="10")
+        profile_frame.pack(fill=tk.X, padx=10, pady=5)
+        targets = dict(PROFILE_TARGETS)
+        target_box = ttk.Combobox(profile_frame, state='readonly', width=22, values=list(targets))
+        target_box.set(PROFILE_TARGETS[0][0])
+        target_box.pack(side=tk.LEFT)
+        cpu_var = tk.BooleanVar(value=True)
+        memory_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(profile_frame, text="CPU (cProfile)", variable=cpu_var).pack(side=tk.LEFT, padx=5)
+        ttk.Checkbutton(profile_frame, text="Memory (tracemalloc)", variable=memory_var).pack(side=tk.LEFT, padx=5)
+        armed_var = tk.StringVar()
+        
+        def arm():
+            if cpu_var.get() or memory_var.get():
+                metrics.profile_next(targets[target_box.get()], cpu=cpu_var.get(), memory=memory_var.get())
+                update()
+        
+        ttk.Button(profile_frame, text="Profile Next Run", command=arm).pack(side=tk.LEFT, padx=5)
+        ttk.Label(profile_frame, textvariable=armed_var).pack(side=tk.LEFT, padx=5)
+        
+        report_text = scrolledtext.ScrolledText(window, height=14, wrap=tk.NONE, font=('Courier', 10))
+        report_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        button_frame = ttk.Frame(window)
+        button_frame.pack(fill=tk.X, padx=10, pady=10)
+        ttk.Button(button_frame, text="Close", command=window.destroy).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Save as JSON...", command=self.save_diagnostics).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="Reset", command=lambda: (metrics.reset(), update())).pack(side=tk.RIGHT)
+        
+        shown_capture = [None]
+        
+        def update():
+            snapshot = metrics.snapshot()
+            timers_tree.delete(*timers_tree.get_children(''))
+            for name, stats in snapshot['timers'].items():
+                timers_tree.insert('', tk.END, values=(
+                    name + (f" ({stats['errors']} failed)" if stats['errors'] else ''),
+                    stats['count'],
+                    f"{stats['mean'] * 1000:.1f}",
+                    f"{stats['p95'] * 1000:.1f}",
+                    f"{stats['max'] * 1000:.1f}",
+                    f"{stats['last'] * 1000:.1f}",
+                    f"{stats['total']:.2f}",
+                ))
+            
+            counters = [f"{name}: {value:,}" for name, value in snapshot['counters'].items()]
+            if snapshot['max_rss_bytes']:
+                counters.append(f"peak memory (RSS): {snapshot['max_rss_bytes'] / (1024 * 1024):.0f} MB")
+            counters_var.set("   ".join(counters) or "No counters yet")
+            
+            armed = metrics.armed()
+            armed_var.set(f"Waiting for: {', '.join(armed)}" if armed else "")
+            
+            # Show the newest capture once it arrives
+            capture = snapshot['captures'][-1] if snapshot['captures'] else None
+            if capture is not shown_capture[0]:
+                shown_capture[0] = capture
+                report_text.delete('1.0', tk.END)
+                if capture is not None:
+                    report_text.insert(tk.END, f"{capture['name']}: {capture['seconds'] * 1000:.1f} ms at {capture['time']}\n\n")
+                    for part in ('cpu', 'memory'):
+                        if capture[part]:
+                            report_text.insert(tk.END, capture[part] + "\n")
+        
+        def tick():
+            if window.winfo_exists():
+                update()
+                window.after(DIAGNOSTICS_REFRESH_MS, tick)
+        
+        tick()
+    
+    def save_diagnostics(self):
+        """Write the collected metrics and profiles to a JSON file"""
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+        try:
+            metrics.dump(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save diagnostics: {str(e)}")
+            return
+        self.status_var.set(f"Diagnostics saved to {filename}")
+    
+def main():
+    """Open the product manager window"""
+    root = tk.Tk()
+    app = ProductManager(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Undo History
+Undo and redo of catalog changes, kept as per-product diffs
+
+Each user action (adding, editing or deleting a product, a batch edit, an
+import) is one step. A step keeps only what changed:
+
+    {"id": "product_...", "fields": ["price", "updatedAt"],
+     "before": {"price": 1499, ...}, "after": {"price": 1649, ...}}
+
+for an edit, and the whole record as "before" (a delete) or "after" (an
+add), since that is what undo or redo has to bring back. A field missing
+on one side is listed in "fields" but absent from that side's values.
+Memory grows with the changes made, not with the catalog size times the
+number of steps.
+
+Undo and redo only touch a product that still looks the way the step
+left it; one changed since (by an edit that was not undone, or merged in
+from outside) is skipped rather than overwritten, and reported.
+
+updatedAt is never put back: a product brought back by undo or redo gets
+the time of the undo or redo, as any other edit does, so saves, merges
+and the sync servers see it as changed. It is also left out when checking
+whether a product still looks the way the step left it.
+
+Steps are plain JSON, so the history can be saved next to products.json
+and picked up again after a restart.
+"""
+
+import contextlib
+import json
+from datetime import datetime
+
+from product_io import atomic_write_json
+from product_store import as_dict
+
+# Steps kept for undo
+DEFAULT_LIMIT = 100
+
+_MISSING = object()
+
+# Stamped with the current time on undo/redo instead of being restored
+_TIMESTAMP = 'updatedAt'
+
+
+def diff_product(key, old, new):
+    """Return the change from old to new (either may be None), or None if they are equal"""
+    if old is None or new is None:
+        if old is None and new is None:
+            return None
+        return {
+            'id': key,
+            'before': dict(as_dict(old)) if old is not None else None,
+            'after': dict(as_dict(new)) if new is not None else None,
+        }
+
+    old, new = as_dict(old), as_dict(new)
+    fields = [field for field, value in old.items() if new.get(field, _MISSING) != value]
+    fields += [field for field in new if field not in old]
+    if not fields:
+        return None
+    return {
+        'id': key,
+        'fields': fields,
+        'before': {field: old[field] for field in fields if field in old},
+        'after': {field: new[field] for field in fields if field in new},
+    }
+
+
+def _without_timestamp(record):
+    return {field: value for field, value in as_dict(record).items() if field != _TIMESTAMP}
+
+
+def _matches(store, change, side):
+    """True if the product is as `side` ('before' or 'after') of the change has it"""
+    state = change[side]
+    current = store.get(change['id']) if change['id'] in store else None
+    if 'fields' not in change:
+        if current is None or state is None:
+            return current is None and state is None
+        return _without_timestamp(current) == _without_timestamp(state)
+    if current is None:
+        return False
+    current = as_dict(current)
+    return all(current.get(field, _MISSING) == state.get(field, _MISSING)
+               for field in change['fields'] if field != _TIMESTAMP)
+
+
+def _restore(store, change, side, now):
+    """Put the product back the way `side` of the change has it, stamped with `now`"""
+    state = change[side]
+    if 'fields' not in change:
+        if state is None:
+            store.delete(change['id'])
+        else:
+            store.put(dict(state, **{_TIMESTAMP: now}))
+        return
+
+    record = dict(as_dict(store.get(change['id'])))
+    for field in change['fields']:
+        if field in state:
+            record[field] = state[field]
+        else:
+            record.pop(field, None)
+    record[_TIMESTAMP] = now
+    store.put(record)
+
+
+class History:
+    """Undo and redo stacks of steps, each a labelled list of product diffs"""
+
+    def __init__(self, limit=DEFAULT_LIMIT):
+        self.limit = limit
+        # Oldest first; the next step to undo/redo is the last one
+        self.undo_steps = []
+        self.redo_steps = []
+
+    def can_undo(self):
+        return bool(self.undo_steps)
+
+    def can_redo(self):
+        return bool(self.redo_steps)
+
+    def push(self, label, changes):
+        """Add a step from (key, old, new) triples; returns it, or None if nothing changed
+
+        A new step clears the redo stack, as in any editor.
+        """
+        diffs = [diff for diff in (diff_product(key, old, new) for key, old, new in changes) if diff]
+        if not diffs:
+            return None
+        step = {'label': label, 'time': datetime.now().isoformat(), 'changes': diffs}
+        self.undo_steps.append(step)
+        del self.undo_steps[:-self.limit]
+        self.redo_steps = []
+        return step
+
+    @contextlib.contextmanager
+    def recording(self, store, label):
+        """Record every change made to the store in the with-block as one step"""
+        # key -> [first old, last new], so a product changed twice is one diff
+        changes = {}
+
+        def listener(op, key, old, new):
+            if op == 'reset':
+                return
+            if key in changes:
+                changes[key][1] = new
+            else:
+                changes[key] = [old, new]
+
+        store.subscribe(listener)
+        try:
+            yield
+        finally:
+            store.unsubscribe(listener)
+            # Recorded even if the block failed, as some products may have changed
+            self.push(label, [(key, old, new) for key, (old, new) in changes.items()])
+
+    def undo(self, store):
+        """Undo the newest step; returns (step, keys skipped) or (None, [])"""
+        if not self.undo_steps:
+            return None, []
+        step = self.undo_steps.pop()
+        skipped = self._apply(store, reversed(step['changes']), 'after', 'before')
+        self.redo_steps.append(step)
+        return step, skipped
+
+    def redo(self, store):
+        """Redo the newest undone step; returns (step, keys skipped) or (None, [])"""
+        if not self.redo_steps:
+            return None, []
+        step = self.redo_steps.pop()
+        skipped = self._apply(store, step['changes'], 'before', 'after')
+        self.undo_steps.append(step)
+        return step, skipped
+
+    def _apply(self, store, changes, expected, target):
+        now = datetime.now().isoformat()
+        skipped = []
+        for change in changes:
+            if _matches(store, change, expected):
+                _restore(store, change, target, now)
+            else:
+                skipped.append(change['id'])
+        return skipped
+
+    def state(self):
+        """Return the stacks as a JSON-ready dict; steps are never changed once pushed"""
+        return {'undo': list(self.undo_steps), 'redo': list(self.redo_steps)}
+
+    def save(self, path, state=None):
+        """Write the history (or a state() taken earlier) to a JSON file"""
+        atomic_write_json(path, state if state is not None else self.state(), compact=True)
+
+    @classmethod
+    def load(cls, path, limit=DEFAULT_LIMIT):
+        """Read a history saved with save(); a missing file gives an empty history"""
+        history = cls(limit)
+        try:
+            with open(path, 'rb') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return history
+        history.undo_steps = list(data.get('undo', []))[-limit:]
+        history.redo_steps = list(data.get('redo', []))
+        return history
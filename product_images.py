@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Images
+Checks that product image URLs resolve, and keeps a cache of thumbnails
+
+A product's `images` are URLs as the storefront uses them: a path such as
+`/mens-traditional-khussa.png` is served from the Next.js public/ folder,
+an http(s):// URL is fetched from the web. check_images() checks every
+distinct URL in a catalog on a bounded thread pool. Local files must exist
+under public/ and look like an image. Remote ones are asked for with HEAD,
+or a one-byte GET for servers that refuse HEAD, and must answer with an
+image. A 10k-product catalog takes minutes this way, not hours of
+one-at-a-time requests.
+
+ThumbnailCache keeps small PNG thumbnails in data/thumbnails, named after
+the SHA-256 of the source image, so identical images share one file. Once
+the folder grows past its limit, the least recently used thumbnails are
+deleted. Thumbnails are made with Pillow when it is installed. Without it,
+get() hands the source back so the caller can make the thumbnail (the GUI
+scales PNG and GIF images with Tk).
+"""
+
+import hashlib
+import http.client
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from product_io import atomic_write_json
+from product_metrics import metrics
+from product_store import product_key
+
+# Where site-relative image URLs are served from, and the thumbnail cache
+PUBLIC_DIR = 'public'
+THUMBNAIL_DIR = os.path.join('data', 'thumbnails')
+
+# Checks running at once, and how long one remote request may take
+DEFAULT_WORKERS = 16
+TIMEOUT = 10
+
+# Largest source image read for a thumbnail, and the size of the cache
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+
+# Remote images are read again for a new thumbnail after this long
+REMOTE_REFRESH_SECONDS = 7 * 24 * 3600
+
+USER_AGENT = 'PunjabiStoreProductManager/1.0'
+
+# Content types accepted from servers that do not label images properly
+GENERIC_TYPES = ('application/octet-stream', 'binary/octet-stream')
+
+# Leading bytes of the image formats the storefront uses
+_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'\x00\x00\x01\x00', 'image/x-icon'),
+    (b'BM', 'image/bmp'),
+)
+
+
+def product_images(product):
+    """Return the image URLs of a product, ignoring entries that are not strings"""
+    images = product.get('images')
+    if isinstance(images, str):
+        images = [images]
+    if not isinstance(images, (list, tuple)):
+        return []
+    return [url for url in images if isinstance(url, str)]
+
+
+def sniff_image_type(head):
+    """Return the content type of image data from its first bytes, or None"""
+    for magic, content_type in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis'):
+        return 'image/avif'
+    text = head.lstrip().lower()
+    if text.startswith(b'<svg') or (text.startswith(b'<?xml') and b'<svg' in text):
+        return 'image/svg+xml'
+    return None
+
+
+def local_path(url, public_dir=PUBLIC_DIR):
+    """Return the file under public/ a site-relative URL refers to, or None if it points outside"""
+    path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+    root = os.path.realpath(public_dir)
+    full = os.path.realpath(os.path.join(root, path.lstrip('/')))
+    if not full.startswith(root + os.sep):
+        return None
+    return full
+
+
+def _url_scheme(url):
+    return urllib.parse.urlsplit(url).scheme.lower()
+
+
+def _open(url, timeout, method='GET', headers=None):
+    request = urllib.request.Request(url, method=method, headers={'User-Agent': USER_AGENT, **(headers or {})})
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def _check_remote(url, timeout):
+    try:
+        try:
+            with _open(url, timeout, method='HEAD') as response:
+                content_type = response.headers.get_content_type()
+        except urllib.error.HTTPError as e:
+            e.close()
+            if e.code not in (403, 405, 501):
+                raise
+            # Some servers and CDNs refuse HEAD; ask for the first byte instead
+            with _open(url, timeout, headers={'Range': 'bytes=0-0'}) as response:
+                content_type = response.headers.get_content_type()
+    except urllib.error.HTTPError as e:
+        e.close()
+        return False, f"HTTP {e.code} {e.reason}"
+    except urllib.error.URLError as e:
+        return False, str(e.reason)
+    except (OSError, ValueError, http.client.HTTPException) as e:
+        # Timeouts, dropped connections, malformed URLs
+        return False, str(e) or type(e).__name__
+
+    if not content_type.startswith('image/') and content_type not in GENERIC_TYPES:
+        return False, f"Not an image ({content_type})"
+    return True, content_type
+
+
+def check_image(url, public_dir=PUBLIC_DIR, timeout=TIMEOUT):
+    """Check that one image URL resolves to an image; returns (ok, content type or reason)"""
+    if not url.strip():
+        return False, "Empty image URL"
+    scheme = _url_scheme(url)
+    if scheme in ('http', 'https'):
+        return _check_remote(url, timeout)
+    if scheme == 'data':
+        if url[5:].lower().startswith('image/'):
+            return True, url[5:].split(';', 1)[0].split(',', 1)[0]
+        return False, "Inline data is not an image"
+    if scheme:
+        return False, f"Unsupported URL scheme '{scheme}'"
+
+    path = local_path(url, public_dir)
+    if path is None:
+        return False, f"Points outside {public_dir}/"
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(512)
+    except FileNotFoundError:
+        return False, f"Not found in {public_dir}/"
+    except OSError as e:
+        return False, e.strerror or str(e)
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        return False, "Not an image file"
+    return True, content_type
+
+
+def check_urls(urls, workers=DEFAULT_WORKERS, public_dir=PUBLIC_DIR, timeout=TIMEOUT,
+               progress=None, cancelled=None):
+    """Check image URLs `workers` at a time, yielding (url, ok, message) as each finishes
+
+    progress(done, total) is called as checks finish; setting the
+    `cancelled` threading.Event stops handing out new checks.
+    """
+    urls = list(urls)
+    pending = iter(urls)
+    futures = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-check') as pool:
+        while True:
+            # Only a few checks are queued per worker, so a cancel takes effect quickly
+            while len(futures) < 2 * workers and not (cancelled is not None and cancelled.is_set()):
+                url = next(pending, None)
+                if url is None:
+                    break
+                futures[pool.submit(check_image, url, public_dir, timeout)] = url
+            if not futures:
+                return
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                url = futures.pop(future)
+                try:
+                    ok, message = future.result()
+                except Exception as e:
+                    ok, message = False, str(e) or type(e).__name__
+                done += 1
+                yield url, ok, message
+            if progress is not None:
+                progress(done, len(urls))
+
+
+def check_images(products, workers=DEFAULT_WORKERS, public_dir=PUBLIC_DIR, timeout=TIMEOUT,
+                 progress=None, cancelled=None):
+    """Check every distinct image URL used by the products
+
+    Returns (number of URLs checked, [(product key, url, reason), ...] for
+    broken images in catalog order). Each URL is checked once however many
+    products use it.
+    """
+    uses = []
+    for product in products:
+        key = product_key(product)
+        uses.extend((key, url) for url in product_images(product))
+    urls = list(dict.fromkeys(url for _, url in uses))
+
+    results = {}
+    with metrics.timer('images.check'):
+        for url, ok, message in check_urls(urls, workers, public_dir, timeout, progress, cancelled):
+            results[url] = (ok, message)
+    broken = [(key, url, results[url][1]) for key, url in uses if url in results and not results[url][0]]
+    metrics.incr('images.checked', len(results))
+    metrics.incr('images.broken', len(broken))
+    return len(results), broken
+
+
+def pillow_available():
+    """True if Pillow is installed, for thumbnails of every image format"""
+    try:
+        import PIL.Image
+    except ImportError:
+        return False
+    return True
+
+
+def pillow_thumbnail(data, size, path):
+    """Write a PNG thumbnail of image data, at most size x size pixels, with Pillow"""
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.save(path, 'PNG')
+
+
+class ThumbnailCache:
+    """PNG thumbnails on disk keyed by the SHA-256 of their source image
+
+    Which source each URL had last time is kept in index.json, so a
+    thumbnail is found again without downloading the image. Local
+    sources are re-read when their file changes, remote ones after
+    REMOTE_REFRESH_SECONDS. Files are deleted least recently used first
+    once the folder holds more than max_bytes. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, directory=THUMBNAIL_DIR, max_bytes=MAX_CACHE_BYTES, public_dir=PUBLIC_DIR,
+                 timeout=TIMEOUT, make=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.public_dir = public_dir
+        self.timeout = timeout
+        # make(data, size, path) writes a thumbnail; without one get() returns the source
+        self.make = make if make is not None else (pillow_thumbnail if pillow_available() else None)
+        self.index_path = os.path.join(directory, 'index.json')
+
+        self._lock = threading.Lock()
+        self._scanned = False
+        # url -> [digest, local file signature or None, time read]
+        self._sources = {}
+        self._sources_changed = False
+        # thumbnail file name -> bytes, least recently used first
+        self._files = OrderedDict()
+        self._total = 0
+
+    def _scan(self):
+        """Read the index and list the cached files, oldest use first (call with the lock held)"""
+        if self._scanned:
+            return
+        self._scanned = True
+        try:
+            with open(self.index_path, 'rb') as f:
+                self._sources = json.load(f).get('sources', {})
+        except (OSError, ValueError):
+            self._sources = {}
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.png')]
+        except FileNotFoundError:
+            return
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            size = entry.stat().st_size
+            self._files[entry.name] = size
+            self._total += size
+
+    def _signature(self, url):
+        """Size and modification time of a local source, or None for a remote one"""
+        if _url_scheme(url):
+            return None
+        path = local_path(url, self.public_dir)
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size] if stat else None
+
+    def _use(self, name):
+        """Mark a cached file as just used and return its path, or None if it is gone (lock held)"""
+        if name not in self._files:
+            return None
+        self._files.move_to_end(name)
+        path = os.path.join(self.directory, name)
+        try:
+            # The modification time keeps the LRU order across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            self._total -= self._files.pop(name)
+            return None
+        except OSError:
+            pass
+        return path
+
+    def lookup(self, url, size):
+        """Return the path of a cached thumbnail of url without reading the source, or None"""
+        with self._lock:
+            self._scan()
+            entry = self._sources.get(url)
+            if entry is None:
+                return None
+            digest, signature, read_at = entry
+            if _url_scheme(url):
+                if time.time() - read_at > REMOTE_REFRESH_SECONDS:
+                    return None
+            elif signature is None or signature != self._signature(url):
+                return None
+            return self._use(_file_name(digest, size))
+
+    def fetch(self, url):
+        """Read the source image at url and return (SHA-256 hex digest, bytes)
+
+        Raises OSError if it cannot be read and ValueError if it is not a
+        usable image URL.
+        """
+        signature = self._signature(url)
+        scheme = _url_scheme(url)
+        if scheme in ('http', 'https'):
+            with _open(url, self.timeout) as response:
+                data = response.read(MAX_IMAGE_BYTES + 1)
+        elif scheme:
+            raise ValueError(f"Unsupported URL scheme '{scheme}'")
+        else:
+            path = local_path(url, self.public_dir)
+            if path is None:
+                raise ValueError(f"Points outside {self.public_dir}/")
+            with open(path, 'rb') as f:
+                data = f.read(MAX_IMAGE_BYTES + 1)
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ValueError(f"Image is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB")
+        if sniff_image_type(data[:512]) is None:
+            raise ValueError("Not an image file")
+
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._scan()
+            self._sources[url] = [digest, signature, time.time()]
+            self._sources_changed = True
+        return digest, data
+
+    def get(self, url, size):
+        """Return (thumbnail path, None), making the thumbnail if needed
+
+        If there is no thumbnail maker for the image, returns (None, source)
+        with source = (digest, data) for the caller to make one with add().
+        Raises OSError or ValueError if the image cannot be read.
+        """
+        path = self.lookup(url, size)
+        if path is not None:
+            return path, None
+        with metrics.timer('thumbnails.fetch'):
+            digest, data = self.fetch(url)
+        with self._lock:
+            # Another URL with the same image may have made it already
+            path = self._use(_file_name(digest, size))
+        if path is not None:
+            return path, None
+        if self.make is None:
+            return None, (digest, data)
+        with metrics.timer('thumbnails.make'):
+            return self.add(digest, size, lambda tmp: self.make(data, size, tmp)), None
+
+    def add(self, digest, size, write):
+        """Store a thumbnail written by write(path) for the source digest, returning its path"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = _file_name(digest, size)
+        path = os.path.join(self.directory, name)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        with self._lock:
+            self._scan()
+            self._total -= self._files.pop(name, 0)
+            self._files[name] = os.path.getsize(path)
+            self._total += self._files[name]
+            self._evict()
+        return path
+
+    def _evict(self):
+        """Delete least recently used thumbnails until the cache fits (lock held)"""
+        while self._total > self.max_bytes and len(self._files) > 1:
+            name, size = self._files.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def save_index(self):
+        """Write which source each URL had, forgetting sources with no thumbnail left"""
+        with self._lock:
+            if not self._sources_changed:
+                return
+            digests = {name.split('_', 1)[0] for name in self._files}
+            sources = {url: entry for url, entry in self._sources.items() if entry[0] in digests}
+            self._sources = sources
+            self._sources_changed = False
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write_json(self.index_path, {'sources': sources}, compact=True)
+
+    def usage(self):
+        """Return (number of thumbnails, total bytes)"""
+        with self._lock:
+            self._scan()
+            return len(self._files), self._total
+
+
+def _file_name(digest, size):
+    return f"{digest}_{size}.png"
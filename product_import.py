@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Import
+Bulk CSV/JSONL import with validation, upsert by ID and a dry-run diff
+
+Rows are read from a CSV file (the format product_export writes, gzipped or
+not) or a JSONL file with one product object per line. Each row is checked
+with the same validate_product() rules as the add/edit form and then
+upserted:
+
+- a row whose _id/id is already in the catalog is merged into that product
+- a row with an unknown ID is added under that ID
+- a row without an ID is added under a freshly generated one
+
+Rows that fail are collected as (line, message) errors and the import
+carries on. Nothing touches the catalog until ImportPlan.apply() is called,
+so the plan doubles as a dry run that can be reviewed first; apply() plans
+again any product the catalog changed in the meantime.
+
+CSV cells are decoded as the reverse of product_export.encode_cell(): an
+empty cell means the field is not set, a cell holding a quoted JSON string
+is that string (export quotes strings such as "123" or "true"), text
+fields stay text, and other cells holding JSON (lists, objects, numbers,
+true/false/null) are decoded.
+"""
+
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from product_store import ValidationError, as_dict, generate_product_id, product_key, validate_product
+
+# Fields always kept as text, even when a cell looks like a number
+TEXT_FIELDS = frozenset((
+    '_id', 'id', 'name', 'punjabiName', 'description', 'punjabiDescription',
+    'category', 'subcategory', 'productType', 'createdAt', 'updatedAt',
+))
+
+# First characters of a cell that may hold a JSON value
+_JSON_START = frozenset('[{-0123456789tfn')
+
+# Timestamp fields left out of the per-field diff
+_DIFF_IGNORED = ('updatedAt',)
+
+
+def decode_cell(field, text):
+    """Decode one CSV cell, the reverse of product_export.encode_cell()"""
+    if text[:1] == '"':
+        # A string export quoted so it would not read back as another type
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return text
+        return value if isinstance(value, str) else text
+    if field in TEXT_FIELDS or not text or text[0] not in _JSON_START:
+        return text
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    return value
+
+
+def _open_text(path):
+    """Open a possibly gzipped text file for reading"""
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def read_csv(path):
+    """Yield (line, product, error) for each row of a CSV file"""
+    with _open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        width = len(header)
+        for cells in reader:
+            line = reader.line_num
+            if not any(cells):
+                continue
+            if len(cells) > width:
+                yield line, None, f"Row has {len(cells)} cells but the header has {width}"
+                continue
+            product = {}
+            for field, text in zip(header, cells):
+                if text != '':
+                    product[field] = decode_cell(field, text)
+            yield line, product, None
+
+
+def read_jsonl(path):
+    """Yield (line, product, error) for each line of a JSONL file"""
+    with _open_text(path) as f:
+        for line, text in enumerate(f, 1):
+            text = text.strip()
+            if not text:
+                continue
+            try:
+                product = json.loads(text)
+            except ValueError as e:
+                yield line, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(product, dict):
+                yield line, None, "Expected a JSON object"
+                continue
+            yield line, product, None
+
+
+def read_rows(path):
+    """Yield (line, product, error) from a CSV or JSONL file, picked by extension"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith(('.jsonl', '.ndjson')):
+        return read_jsonl(path)
+    return read_csv(path)
+
+
+def changed_fields(old, new):
+    """Return the fields whose values differ between two versions of a product"""
+    fields = [f for f in new if f not in _DIFF_IGNORED and (f not in old or old[f] != new[f])]
+    fields.extend(f for f in old if f not in _DIFF_IGNORED and f not in new)
+    return fields
+
+
+class ImportPlan:
+    """The changes a bulk import would make, built without touching the catalog
+
+    Feed rows with add_rows() (in as many batches as convenient), review
+    summary()/describe(), then apply() them to the store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        # key -> (old record or None, new record), in first-seen order
+        self.changes = {}
+        self.unchanged = set()
+        self.errors = []
+        self.rows = 0
+        self.now = datetime.now().isoformat()
+
+    def add_rows(self, rows):
+        """Validate and plan a batch of (line, product, error) rows"""
+        for line, row, error in rows:
+            self.rows += 1
+            if error is None:
+                try:
+                    self._plan_row(row)
+                    continue
+                except ValidationError as e:
+                    error = str(e)
+            self.errors.append((line, error))
+
+    def _plan_row(self, row):
+        key = product_key(row)
+        old = None
+        base = None
+        current = self.store.lookup(key) if key is not None else None
+        if current is not None:
+            old = as_dict(current)
+            key = product_key(old)
+        if key in self.changes:
+            # The same product appears more than once: later rows build on earlier ones
+            base = self.changes[key][1]
+            old = self.changes[key][0]
+        elif old is not None:
+            base = old
+
+        if base is None:
+            product = validate_product(row)
+            if key is None:
+                key = generate_product_id()
+            product['_id'] = product.get('_id') or key
+            product['id'] = product.get('id') or key
+            product.setdefault('createdAt', self.now)
+            product.setdefault('updatedAt', self.now)
+        else:
+            product = validate_product({**base, **row})
+            if old is not None and product == old:
+                self.changes.pop(key, None)
+                self.unchanged.add(key)
+                return
+            if 'updatedAt' not in row or (old is not None and row['updatedAt'] == old.get('updatedAt')):
+                product['updatedAt'] = self.now
+
+        self.unchanged.discard(key)
+        self.changes[key] = (old, product)
+
+    @property
+    def added(self):
+        return [new for old, new in self.changes.values() if old is None]
+
+    @property
+    def updated(self):
+        return [(key, old, new) for key, (old, new) in self.changes.items() if old is not None]
+
+    def summary(self):
+        """One-line count of what the import would do"""
+        added = sum(1 for old, _ in self.changes.values() if old is None)
+        updated = len(self.changes) - added
+        return (f"{self.rows} rows: {added} to add, {updated} to update, "
+                f"{len(self.unchanged)} unchanged, {len(self.errors)} with errors")
+
+    def describe(self, limit=200):
+        """Yield human-readable diff lines, at most `limit` per section"""
+        for new in self.added[:limit]:
+            yield f"+ {product_key(new)}  {new.get('name', '')}"
+        for key, old, new in self.updated[:limit]:
+            for field in changed_fields(old, new):
+                yield f"~ {key}  {field}: {old.get(field)!r} -> {new.get(field)!r}"
+        for line, message in self.errors[:limit]:
+            yield f"! line {line}: {message}"
+
+    def apply(self):
+        """Write the planned changes into the store and return how many were applied
+
+        A product that changed in the store since it was planned (an outside
+        edit merged in meanwhile, say) is planned again: the fields the
+        import sets are laid over its current version. If one of those no
+        longer validates, ValidationError is raised and nothing is written.
+        """
+        writes = []
+        errors = []
+        for key, (old, new) in list(self.changes.items()):
+            current = self.store.get(key)
+            current = as_dict(current) if current is not None else None
+            if current != old:
+                try:
+                    new = self._rebase(current, old, new)
+                except ValidationError as e:
+                    errors.append(f"{key}: {e}")
+                    continue
+                if new == current:
+                    del self.changes[key]
+                    self.unchanged.add(key)
+                    continue
+                self.changes[key] = (current, new)
+            writes.append(new)
+        if errors:
+            raise ValidationError(f"{len(errors)} products changed since the preview and no longer "
+                                  f"import cleanly, e.g. {errors[0]}")
+
+        for new in writes:
+            self.store.put(new)
+        return len(writes)
+
+    def _rebase(self, current, old, new):
+        """Plan a change again on top of the product as it is in the store now"""
+        if current is None:
+            # Deleted since: added back as planned, like a row with an unknown ID
+            return new
+        fields = {f: v for f, v in new.items()
+                  if f not in _DIFF_IGNORED and (old is None or f not in old or old[f] != v)}
+        product = validate_product({**current, **fields})
+        if product == current:
+            return current
+        product['updatedAt'] = new.get('updatedAt', self.now)
+        return product
+
+
+def plan_import(store, path):
+    """Read a whole CSV/JSONL file and return its ImportPlan"""
+    plan = ImportPlan(store)
+    plan.add_rows(read_rows(path))
+    return plan
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product File I/O
+Crash-safe writes and a cross-process lock for the shared data files
+
+Writes go to a temp file in the same directory, are fsynced and then swapped
+in with os.replace(), so readers (the GUI, the Node sync servers) only ever
+see the old or the new file, never a truncated one.
+
+The lock is a plain `<file>.lock` file created with O_CREAT|O_EXCL holding
+the owner's pid, host and start time. Any process can take part, including
+Node (`fs.openSync(lockPath, 'wx')`). A lock left behind by a crashed
+process on this host is broken once its pid is gone; a lock from another
+host (or one that cannot be read) once it has not been touched for
+`stale_after` seconds. The holder touches the file while it holds the
+lock, so a long save is never mistaken for a crashed one.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+# How long the heartbeat thread sleeps while no lock is held
+HEARTBEAT_IDLE = 60.0
+
+
+class LockTimeout(TimeoutError):
+    """Raised when a file lock could not be acquired in time"""
+
+
+def _pid_alive(pid):
+    """Best-effort check whether a process is still running on this host"""
+    if os.name != 'posix':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FileLock:
+    """Exclusive cross-process lock on a data file"""
+
+    def __init__(self, path, timeout=10.0, stale_after=30.0, poll_interval=0.05):
+        self.lock_path = f"{path}.lock"
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _stale_lock(self):
+        """Return the stat of the existing lock file if it was left behind, else None"""
+        try:
+            stat = os.stat(self.lock_path)
+            with open(self.lock_path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Unreadable or half-written lock file: only trust its age
+            try:
+                stat = os.stat(self.lock_path)
+            except FileNotFoundError:
+                return None
+            return stat if time.time() - stat.st_mtime > self.stale_after else None
+
+        if owner.get('host') == _hostname() and isinstance(owner.get('pid'), int):
+            # Same host: the pid tells for sure, however long the holder takes
+            return None if _pid_alive(owner['pid']) else stat
+        return stat if time.time() - stat.st_mtime > self.stale_after else None
+
+    def _touch(self):
+        """Refresh the lock file's mtime (heartbeat thread, holding _held_mutex)"""
+        try:
+            os.utime(self._fd if os.utime in os.supports_fd else self.lock_path)
+        except OSError:
+            pass
+
+    def acquire(self):
+        """Take the lock, waiting up to `timeout` seconds"""
+        deadline = time.monotonic() + self.timeout
+        owner = json.dumps({
+            'pid': os.getpid(),
+            'host': _hostname(),
+            'created': time.time(),
+        }).encode('utf-8')
+
+        while True:
+            try:
+                self._fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+                os.write(self._fd, owner)
+                _hold(self)
+                return self
+            except FileExistsError:
+                stale = self._stale_lock()
+                if stale is not None:
+                    # Only remove the file judged stale, not one another process just created
+                    if _same_file(self.lock_path, stale):
+                        try:
+                            os.remove(self.lock_path)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"Timed out waiting for {self.lock_path}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """Release the lock if held"""
+        if self._fd is None:
+            return
+        _unhold(self)
+        try:
+            # Only remove the lock file if it is still ours; it may have been
+            # broken and re-created by another process meanwhile
+            if _same_file(self.lock_path, os.fstat(self._fd)):
+                os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+# Locks held by this process, kept fresh by one shared daemon thread, so
+# taking a lock for a single journal append does not start a thread
+_held = set()
+_held_mutex = threading.Lock()
+_held_changed = threading.Event()
+_heartbeat = None
+
+
+def _hold(lock):
+    global _heartbeat
+    with _held_mutex:
+        _held.add(lock)
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_touch_held, name='file-lock-heartbeat', daemon=True)
+            _heartbeat.start()
+    _held_changed.set()
+
+
+def _unhold(lock):
+    # Once this returns the heartbeat no longer uses the lock's fd
+    with _held_mutex:
+        _held.discard(lock)
+
+
+def _touch_held():
+    """Heartbeat thread: touch every held lock at a third of its stale_after"""
+    touched = time.monotonic()
+    while True:
+        with _held_mutex:
+            interval = min((lock.stale_after / 3 for lock in _held), default=HEARTBEAT_IDLE)
+        # Woken early when a lock is taken, as it may want a shorter interval
+        _held_changed.wait(max(0.0, touched + interval - time.monotonic()))
+        _held_changed.clear()
+        if time.monotonic() - touched >= interval:
+            with _held_mutex:
+                for lock in _held:
+                    lock._touch()
+            touched = time.monotonic()
+
+
+def _hostname():
+    """The host name recorded in lock files, as Node's os.hostname() gives it"""
+    import socket
+    return socket.gethostname()
+
+
+def _same_file(path, stat):
+    """True if path is still the file `stat` was taken of"""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (current.st_dev, current.st_ino) == (stat.st_dev, stat.st_ino)
+
+
+def _fsync_directory(directory):
+    """Persist a rename by syncing the containing directory (POSIX only)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class AtomicFile:
+    """Binary file that only replaces `path` if the with-block succeeds
+
+    Data is written to a temp file in the same directory, fsynced and renamed
+    over `path` on exit. If the block raises, the temp file is removed and
+    `path` is left untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.temp_path = None
+        self.file = None
+
+    def __enter__(self):
+        # Imported here, like socket, to keep command-line startup fast
+        import tempfile
+        fd, self.temp_path = tempfile.mkstemp(dir=self.directory,
+                                              prefix=f".{os.path.basename(self.path)}.", suffix='.tmp')
+        self.file = os.fdopen(fd, 'wb')
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            self.file.close()
+
+            if exc_type is not None:
+                os.remove(self.temp_path)
+                return False
+
+            # Keep the permissions of the file being replaced
+            if os.path.exists(self.path):
+                os.chmod(self.temp_path, os.stat(self.path).st_mode & 0o777)
+            else:
+                os.chmod(self.temp_path, 0o644)
+
+            os.replace(self.temp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        _fsync_directory(self.directory)
+        return False
+
+
+def atomic_write_bytes(path, data):
+    """Write bytes to path via temp file + fsync + atomic rename"""
+    with AtomicFile(path) as f:
+        f.write(data)
+
+
+def encode_json(data, compact=False):
+    """Encode data as UTF-8 JSON, either indented or compact"""
+    if compact:
+        text = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(data, indent=2, ensure_ascii=False)
+    return text.encode('utf-8')
+
+
+def atomic_write_json(path, data, compact=False):
+    """Write data as JSON to path atomically"""
+    atomic_write_bytes(path, encode_json(data, compact=compact))
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Journal
+Append-only JSONL log of per-product changes made since the last full save
+
+Every add, update and delete is written as one line:
+
+    {"seq": 42, "ts": "...", "op": "update", "id": "product_...", "product": {...}}
+
+Add and update lines carry the full resulting record and delete lines only
+the ID, so replaying the journal over products.json is idempotent. A full
+save compacts the journal down to a checkpoint line that keeps the sequence
+number (followed by any changes made while the save was running), so
+consumers tailing the journal (sync servers, exports) can tell when
+entries they had not read yet were folded into the snapshot.
+
+The GUI and the command line may share one journal. Appends and
+checkpoints take the journal's FileLock and number entries after the last
+one in the file, so sequence numbers stay unique across processes, and a
+checkpoint only drops entries this process has seen (read or written); an
+entry another process appended since stays in the journal.
+
+Bulk edits (batch edits, imports, big undo steps) record their changes
+inside batch(), which writes them as usual lines but in one locked write
+and one fsync when the block ends.
+"""
+
+import contextlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from product_io import FileLock, atomic_write_bytes
+from product_store import as_dict
+
+# Compact once this many changes have accumulated in the journal
+DEFAULT_COMPACT_AFTER = 1000
+
+# Bytes read at a time from the end of the journal to find its last entry
+TAIL_CHUNK = 8 * 1024
+
+
+class ChangeJournal:
+    """Append-only change log next to products.json"""
+
+    def __init__(self, path, compact_after=DEFAULT_COMPACT_AFTER, sync=True):
+        self.path = path
+        self.compact_after = compact_after
+        self.sync = sync
+
+        # Sequence number of the last entry, and the checkpoint it follows
+        self.seq = 0
+        self.base_seq = 0
+        self.pending = 0
+        # Last entry read from the file, and the entries appended by this process
+        self.seen_seq = 0
+        self._own = set()
+        self._scan()
+
+        # Appends on the GUI thread vs. a checkpoint from a background save
+        self._lock = threading.Lock()
+        # Changes recorded inside batch(), written when it ends
+        self._batch = None
+
+    def _read_lines(self):
+        """Yield (entry, end offset) for each journal line, stopping at a torn last line"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Crash in the middle of an append
+                    break
+                offset += len(line)
+                line = line.strip()
+                if line:
+                    yield json.loads(line.decode('utf-8')), offset
+
+    def _entries(self):
+        """Yield decoded journal entries"""
+        for entry, _ in self._read_lines():
+            yield entry
+
+    def _scan(self):
+        """Find the current sequence number and checkpoint, dropping a torn tail"""
+        good_end = 0
+        for entry, good_end in self._read_lines():
+            self.seq = max(self.seq, entry['seq'])
+            if entry['op'] == 'checkpoint':
+                self.base_seq = entry['seq']
+            else:
+                # Every entry still in the file is waiting for a save
+                self.pending += 1
+        self.seen_seq = self.seq
+
+        # Later appends must not be glued onto a half-written line
+        if os.path.exists(self.path) and os.path.getsize(self.path) > good_end:
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_end)
+
+    def _last_seq(self):
+        """Return the sequence number of the last entry in the file (caller holds the FileLock)"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return 0
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            tail = b''
+            while end > 0:
+                start = max(0, end - TAIL_CHUNK)
+                f.seek(start)
+                tail = f.read(end - start) + tail
+                end = start
+                # Complete lines end with a newline; anything after the last one is torn
+                stop = tail.rfind(b'\n')
+                while stop != -1:
+                    begin = tail.rfind(b'\n', 0, stop)
+                    if begin == -1 and start:
+                        # The line starts before what was read so far
+                        break
+                    line = tail[begin + 1:stop]
+                    if line.strip():
+                        return json.loads(line.decode('utf-8'))['seq']
+                    stop = begin
+        return 0
+
+    def append(self, op, key, product=None):
+        """Write one change to the journal and return its entry"""
+        return self._append([(op, key, product)])[0]
+
+    def _append(self, changes):
+        """Write (op, key, product) changes with one write and fsync, returning their entries"""
+        with self._lock, FileLock(self.path):
+            # Another process sharing the journal may have appended since
+            seq = max(self.seq, self._last_seq())
+            now = datetime.now().isoformat()
+            entries = []
+            for op, key, product in changes:
+                seq += 1
+                entry = {
+                    'seq': seq,
+                    'ts': now,
+                    'op': op,
+                    'id': key,
+                }
+                if product is not None:
+                    entry['product'] = as_dict(product)
+                entries.append(entry)
+
+            data = memoryview(b''.join(_encode(entry) for entry in entries))
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                while data:
+                    data = data[os.write(fd, data):]
+                if self.sync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.seq = seq
+            self._own.update(entry['seq'] for entry in entries)
+            self.pending += len(entries)
+        return entries
+
+    def record(self, op, key, old, new):
+        """ProductStore listener that journals every change"""
+        if op == 'reset':
+            return
+        change = ('delete', key, None) if op == 'delete' else (op, key, new)
+        if self._batch is not None:
+            self._batch.append(change)
+        else:
+            self._append([change])
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Journal the changes recorded inside the block together, when it ends
+
+        For bulk edits (batch edits, imports, big undo steps): one lock, one
+        write and one fsync instead of one per product, and the edit is on
+        disk before the full save that follows it has run.
+        """
+        self._batch = []
+        try:
+            yield
+        finally:
+            changes, self._batch = self._batch, None
+            if changes:
+                self._append(changes)
+
+    def entries_since(self, seq=0):
+        """Return (entries after seq, complete)
+
+        `complete` is False when some of those entries were already compacted
+        into products.json, in which case the caller should reload it first.
+        """
+        entries = []
+        base_seq = 0
+        for entry in self._entries():
+            if entry['op'] == 'checkpoint':
+                # Another process may have compacted since we scanned
+                base_seq = entry['seq']
+            elif entry['seq'] > seq:
+                entries.append(entry)
+        return entries, seq >= base_seq
+
+    def replay(self, store):
+        """Apply journaled changes to a ProductStore loaded from the snapshot"""
+        applied = 0
+        for entry in self._entries():
+            self.seen_seq = max(self.seen_seq, entry['seq'])
+            if entry['op'] == 'checkpoint':
+                continue
+            if entry['op'] == 'delete':
+                store.delete(entry['id'])
+            else:
+                store.put(entry['product'])
+            applied += 1
+        return applied
+
+    def needs_compaction(self):
+        """True once enough changes have piled up to warrant a full save"""
+        return self.pending >= self.compact_after
+
+    def checkpoint(self, seq=None):
+        """Truncate the journal after its changes were written to products.json
+
+        `seq` is the journal position the saved snapshot was taken at
+        (default: now). Entries after it, made while a background save was
+        running, are kept after the checkpoint line, and so are entries
+        another process appended that this one has not read: they are not
+        in the snapshot either.
+        """
+        with self._lock, FileLock(self.path):
+            if seq is None:
+                seq = self.seq
+
+            def saved(e):
+                return e['seq'] <= seq and (e['seq'] <= self.seen_seq or e['seq'] in self._own)
+
+            entries = list(self._entries())
+            # Never behind a checkpoint another process already wrote
+            base = max([seq] + [e['seq'] for e in entries if e['op'] == 'checkpoint'])
+            kept = [e for e in entries if e['op'] != 'checkpoint' and not saved(e)]
+            entry = {
+                'seq': base,
+                'ts': datetime.now().isoformat(),
+                'op': 'checkpoint',
+            }
+            # Kept in sequence order, so the last line always has the highest seq
+            data = (b''.join(_encode(e) for e in kept if e['seq'] <= base)
+                    + (json.dumps(entry) + '\n').encode('utf-8')
+                    + b''.join(_encode(e) for e in kept if e['seq'] > base))
+            atomic_write_bytes(self.path, data)
+            self.seq = max(self.seq, base)
+            self.base_seq = base
+            self.pending = len(kept)
+            self._own = {own for own in self._own if own > seq}
+
+
+def _encode(entry):
+    """Encode one journal entry as a JSONL line"""
+    return (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Loader
+Streams the products array out of products.json without parsing it all at once
+
+stream_products() yields one product at a time together with its byte
+offset and length in the file. CatalogIndex keeps just those offsets (in
+compact arrays) so a full record can be re-read on demand, while the
+catalog itself only holds the small summary() of each product that the
+list view, sorting and filters need. The offsets only hold for the file as
+it was indexed: a rewrite in place (as the Node sync servers do) makes
+read_raw() raise IndexOutdated instead of returning the wrong bytes.
+"""
+
+import codecs
+import json
+import os
+import re
+import threading
+from array import array
+
+from product_store import product_key
+
+# Bytes read from disk per step while streaming
+READ_CHUNK = 1 << 20
+
+# Fields kept in memory for products that are not fully loaded (list view
+# and its thumbnails, sorting, filters and search facets)
+SUMMARY_FIELDS = (
+    '_id', 'id', 'name', 'punjabiName', 'category', 'subcategory', 'productType',
+    'price', 'stock', 'isActive', 'createdAt', 'updatedAt', 'sizes', 'colors', 'tags', 'images',
+)
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+class IndexOutdated(Exception):
+    """The indexed file was rewritten in place, so its offsets no longer hold"""
+
+
+def _handle_signature(f):
+    """Same (inode, size, mtime_ns) as product_watch.file_signature(), of an open file"""
+    stat = os.fstat(f.fileno())
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def summary(product):
+    """Return the subset of a product kept in memory until it is materialized"""
+    return {field: product[field] for field in SUMMARY_FIELDS if field in product}
+
+
+class _Reader:
+    """Incrementally decoded UTF-8 text with byte offset tracking"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.offset = 0
+        self.eof = False
+
+    def _more(self, size=None):
+        """Append the next chunk to the buffer; False at end of file"""
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return True
+
+    def _advance(self, end):
+        self.offset += len(self.buf[self.pos:end].encode('utf-8'))
+        self.pos = end
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at end of file)"""
+        while True:
+            self._advance(_WHITESPACE.match(self.buf, self.pos).end())
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ''
+
+    def take(self, expected):
+        """Consume one expected structural character"""
+        ch = self.peek()
+        if ch != expected:
+            raise ValueError(f"Expected {expected!r} at byte {self.offset}, found {ch!r}")
+        self._advance(self.pos + 1)
+
+    def value(self):
+        """Decode the next JSON value, reading more of the file as needed"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number or literal at the very end of the buffer may be cut short
+                if end < len(self.buf) or self.eof:
+                    self._advance(end)
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads for unusually large records to avoid rescanning
+            self._more(size)
+            size *= 2
+
+
+def stream_products(path, chunk_size=READ_CHUNK):
+    """Yield (product, byte offset, byte length) for each product in the file
+
+    Accepts both the manager's {"products": [...]} layout and the bare array
+    the Node sync servers write.
+    """
+    with open(path, 'rb') as f:
+        reader = _Reader(f, chunk_size)
+        ch = reader.peek()
+        if ch == '{':
+            reader.take('{')
+            while True:
+                if reader.peek() == '}':
+                    return
+                key = reader.value()
+                reader.take(':')
+                if key == 'products' and reader.peek() == '[':
+                    break
+                reader.value()
+                if reader.peek() == ',':
+                    reader.take(',')
+        elif ch != '[':
+            raise ValueError(f"{path} does not contain a products array")
+
+        reader.take('[')
+        if reader.peek() == ']':
+            return
+        while True:
+            reader.peek()
+            start = reader.offset
+            product = reader.value()
+            yield product, start, reader.offset - start
+
+            ch = reader.peek()
+            if ch == ']':
+                return
+            reader.take(',')
+
+
+class CatalogIndex:
+    """Byte offsets of every product in a products.json file
+
+    Offsets and lengths live in typed arrays, so the index costs a few bytes
+    per product plus one dict entry. The file handle stays open, so records
+    can still be read after products.json is atomically replaced (the old
+    contents stay reachable through the handle on POSIX systems). Writing
+    into the same file does change what the handle reads, so every read
+    checks the file's signature against the one taken when it was opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self.positions = {}
+        self._file = open(path, 'rb')
+        self.signature = _handle_signature(self._file)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def add(self, key, offset, length):
+        """Record where a product lives in the file"""
+        self.positions[key] = len(self.offsets)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def read_raw(self, key):
+        """Return the JSON bytes of one product"""
+        position = self.positions[key]
+        with self._lock:
+            if _handle_signature(self._file) != self.signature:
+                raise IndexOutdated(f"{self.path} was rewritten since it was indexed; reload it to read {key}")
+            self._file.seek(self.offsets[position])
+            return self._file.read(self.lengths[position])
+
+    def read(self, key):
+        """Materialize one full product record"""
+        return json.loads(self.read_raw(key).decode('utf-8'))
+
+    def close(self):
+        self._file.close()
+
+
+def lazy_loading_supported():
+    """Reading through a handle after products.json is replaced needs POSIX rename semantics"""
+    return os.name == 'posix'
+
+
+def index_products(path, index=None, chunk_size=READ_CHUNK):
+    """Yield (record, partial) for the catalog, filling `index` if given
+
+    With an index the yielded records are summary() stubs that can be
+    materialized later through it; without one they are full products.
+    """
+    for product, offset, length in stream_products(path, chunk_size):
+        key = product_key(product)
+        if index is None or not key:
+            yield product, False
+        else:
+            index.add(key, offset, length)
+            yield summary(product), True
@@ -1,519 +1,581 @@
 #!/usr/bin/env python3
 """
 Punjabi E-commerce Store Product Manager
-A GUI application to directly manage products in the JSON file
+Desktop GUI, plus a command-line mode for headless hosts, cron jobs and scripts
+
+Without arguments (or with `gui`) the Tkinter window opens. Any other
+subcommand works on data/products.json directly and never imports tkinter,
+so it runs without a display:
+
+    python3 product_manager.py list --category men
+    python3 product_manager.py get product_123
+    echo '{"name": "Jutti", ...}' | python3 product_manager.py add
+    python3 product_manager.py update product_123 --set price=1499 --set stock=5
+    python3 product_manager.py delete product_123
+    python3 product_manager.py import new_products.csv --dry-run
+    python3 product_manager.py check-images --workers 32
+    python3 product_manager.py export - > products.csv
+    python3 product_manager.py backup --note "before sale"
+    python3 product_manager.py backup --diff 20250825_221114_000000
+    python3 product_manager.py restore 20250825_221114_000000
+
+Products are read from stdin as a JSON object, a JSON array or JSONL, and
+written to stdout as JSONL (or a JSON array with --format json). Commands
+that change the catalog run in one backend transaction: with the default
+json backend that holds the products.json lock for the whole
+read-modify-write, saves through the same backup store as the GUI and folds
+any pending journal changes in.
+
+With --backend sqlite (or PRODUCTS_BACKEND=sqlite) the same commands work
+on data/products.db, where lookups, listings and single-product edits do
+not read or rewrite the whole catalog (see product_backends):
+
+    python3 product_manager.py migrate
+    python3 product_manager.py --backend sqlite list --out-of-stock
+    python3 product_manager.py --backend sqlite export-json
+
+On hosts short of memory, --memory-mode columnar (or
+PRODUCTS_MEMORY_MODE=columnar, as for the GUI) keeps loaded products in
+compact columns instead of one dict each.
+
+Only what a command needs is imported, to keep startup fast for shell
+pipelines that call this thousands of times.
 """
 
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog, scrolledtext
+import argparse
 import json
 import os
-import shutil
-from datetime import datetime
-import uuid
-
-class ProductManager:
-    def __init__(self, root):
-        self.root = root
-        self.root.title("Punjabi E-commerce Store - Product Manager")
-        self.root.geometry("1200x800")
-        self.root.configure(bg='#f0f0f0')
-        
-        # File paths
-        self.products_file = "data/products.json"
-        self.backup_dir = "data/backups"
-        
-        # Ensure directories exist
-        os.makedirs("data", exist_ok=True)
-        os.makedirs(self.backup_dir, exist_ok=True)
-        
-        # Load existing products
-        self.products = self.load_products()
-        
-        # Create GUI
-        self.create_gui()
-        
-        # Refresh product list
-        self.refresh_product_list()
-    
-    def load_products(self):
-        """Load products from JSON file"""
-        try:
-            if os.path.exists(self.products_file):
-                with open(self.products_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return data.get('products', [])
-            else:
-                # Create empty products file
-                empty_data = {"products": []}
-                with open(self.products_file, 'w', encoding='utf-8') as f:
-                    json.dump(empty_data, f, indent=2, ensure_ascii=False)
-                return []
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load products: {str(e)}")
-            return []
-    
-    def save_products(self):
-        """Save products to JSON file with backup"""
+import sys
+
+from product_metrics import metrics
+from product_store import (BACKEND_MEMORY_MODES, BACKENDS, PRODUCTS_DB, PRODUCTS_FILE, ProductStore,
+                           ValidationError, product_key, validate_product)
+
+# Names that used to live here and moved to product_gui with the window code
+_GUI_NAMES = ('ProductManager', 'VirtualProductList', 'product_row_values')
+
+
+def __getattr__(name):
+    # Importing them loads tkinter, so only do it when someone asks
+    if name in _GUI_NAMES:
+        import product_gui
+        return getattr(product_gui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CommandError(Exception):
+    """A command failed in a way that should be reported without a traceback"""
+
+
+# Input and output
+
+def read_products(stream):
+    """Read products from a JSON object, a JSON array, {"products": [...]} or JSONL"""
+    text = stream.read()
+    if isinstance(text, bytes):
+        text = text.decode('utf-8-sig')
+    text = text.strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # More than one value: JSON Lines
         try:
-            # Create backup
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(self.backup_dir, f"products_backup_{timestamp}.json")
-            
-            if os.path.exists(self.products_file):
-                shutil.copy2(self.products_file, backup_file)
-            
-            # Save current data
-            data = {"products": self.products}
-            with open(self.products_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            
-            messagebox.showinfo("Success", f"Products saved successfully!\nBackup created: {backup_file}")
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save products: {str(e)}")
-            return False
-    
-    def create_gui(self):
-        """Create the main GUI"""
-        # Main frame
-        main_frame = ttk.Frame(self.root, padding="10")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Configure grid weights
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
-        main_frame.columnconfigure(1, weight=1)
-        main_frame.rowconfigure(2, weight=1)
-        
-        # Title
-        title_label = ttk.Label(main_frame, text="🛍️ Punjabi E-commerce Store Product Manager", 
-                               font=('Arial', 16, 'bold'))
-        title_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
-        
-        # Buttons frame
-        buttons_frame = ttk.Frame(main_frame)
-        buttons_frame.grid(row=1, column=0, columnspan=3, pady=(0, 20), sticky=(tk.W, tk.E))
-        
-        ttk.Button(buttons_frame, text="➕ Add New Product", command=self.add_product_window).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="✏️ Edit Selected", command=self.edit_product_window).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="🗑️ Delete Selected", command=self.delete_product).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="💾 Save All Changes", command=self.save_products).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="🔄 Refresh List", command=self.refresh_product_list).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="📊 Export to CSV", command=self.export_to_csv).pack(side=tk.LEFT, padx=5)
-        ttk.Button(buttons_frame, text="📁 Open Data Folder", command=self.open_data_folder).pack(side=tk.LEFT, padx=5)
-        
-        # Product list frame
-        list_frame = ttk.LabelFrame(main_frame, text="Products List", padding="10")
-        list_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
-        list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
-        
-        # Create Treeview
-        columns = ('ID', 'Name', 'Punjabi Name', 'Category', 'Subcategory', 'Price', 'Stock', 'Status')
-        self.tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=15)
-        
-        # Configure columns
-        for col in columns:
-            self.tree.heading(col, text=col, command=lambda c=col: self.sort_treeview(c))
-            self.tree.column(col, width=120, minwidth=100)
-        
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(list_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid layout
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-        
-        # Status bar
-        self.status_var = tk.StringVar()
-        self.status_var.set("Ready")
-        status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E))
-        
-        # Bind double-click to edit
-        self.tree.bind('<Double-1>', lambda e: self.edit_product_window())
-        
-        # Bind selection change
-        self.tree.bind('<<TreeviewSelect>>', self.on_selection_change)
-    
-    def add_product_window(self):
-        """Open window to add new product"""
-        self.product_window = tk.Toplevel(self.root)
-        self.product_window.title("Add New Product")
-        self.product_window.geometry("600x700")
-        self.product_window.transient(self.root)
-        self.product_window.grab_set()
-        
-        self.create_product_form(self.product_window, mode="add")
-    
-    def edit_product_window(self):
-        """Open window to edit selected product"""
-        selection = self.tree.selection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a product to edit")
-            return
-        
-        item = self.tree.item(selection[0])
-        product_id = item['values'][0]
-        
-        # Find product
-        product = None
-        for p in self.products:
-            if p.get('_id') == product_id or p.get('id') == product_id:
-                product = p
-                break
-        
-        if not product:
-            messagebox.showerror("Error", "Product not found")
-            return
-        
-        self.product_window = tk.Toplevel(self.root)
-        self.product_window.title(f"Edit Product: {product.get('name', 'Unknown')}")
-        self.product_window.geometry("600x700")
-        self.product_window.transient(self.root)
-        self.product_window.grab_set()
-        
-        self.create_product_form(self.product_window, mode="edit", product=product)
-    
-    def create_product_form(self, window, mode="add", product=None):
-        """Create product form in the given window"""
-        # Main frame
-        main_frame = ttk.Frame(window, padding="20")
-        main_frame.pack(fill=tk.BOTH, expand=True)
-        
-        # Form fields
-        fields = []
-        
-        # Basic Information
-        basic_frame = ttk.LabelFrame(main_frame, text="Basic Information", padding="10")
-        basic_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        fields.append(('name', 'Product Name*:', 'text', basic_frame))
-        fields.append(('punjabiName', 'Punjabi Name:', 'text', basic_frame))
-        fields.append(('description', 'Description:', 'text', basic_frame))
-        
-        # Category Information
-        category_frame = ttk.LabelFrame(main_frame, text="Category Information", padding="10")
-        category_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        fields.append(('productType', 'Product Type*:', 'combo', category_frame, ['jutti', 'fulkari']))
-        fields.append(('category', 'Category*:', 'combo', category_frame, ['men', 'women', 'kids', 'fulkari']))
-        fields.append(('subcategory', 'Subcategory:', 'text', category_frame))
-        
-        # Pricing and Stock
-        pricing_frame = ttk.LabelFrame(main_frame, text="Pricing & Stock", padding="10")
-        pricing_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        fields.append(('price', 'Price (₹)*:', 'number', pricing_frame))
-        fields.append(('stock', 'Stock Quantity*:', 'number', pricing_frame))
-        
-        # Variants
-        variants_frame = ttk.LabelFrame(main_frame, text="Variants", padding="10")
-        variants_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        fields.append(('sizes', 'Available Sizes:', 'list', variants_frame))
-        fields.append(('colors', 'Available Colors:', 'list', variants_frame))
-        
-        # Images
-        images_frame = ttk.LabelFrame(main_frame, text="Images", padding="10")
-        images_frame.pack(fill=tk.X, pady=(0, 10))
-        
-        fields.append(('images', 'Image URLs:', 'list', images_frame))
-        
-        # Create form widgets
-        self.form_widgets = {}
-        for i, field_info in enumerate(fields):
-            field_name, label_text, field_type, parent_frame, *extra = field_info
-            
-            # Label
-            label = ttk.Label(parent_frame, text=label_text)
-            label.grid(row=i, column=0, sticky=tk.W, padx=(0, 10), pady=5)
-            
-            # Input widget
-            if field_type == 'text':
-                widget = ttk.Entry(parent_frame, width=40)
-                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
-            elif field_type == 'number':
-                widget = ttk.Entry(parent_frame, width=40)
-                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
-            elif field_type == 'combo':
-                widget = ttk.Combobox(parent_frame, values=extra[0], width=37)
-                widget.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
-            elif field_type == 'list':
-                # Create frame for list input
-                list_frame = ttk.Frame(parent_frame)
-                list_frame.grid(row=i, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=5)
-                
-                entry = ttk.Entry(list_frame, width=30)
-                entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                
-                add_btn = ttk.Button(list_frame, text="+", width=3, 
-                                   command=lambda e=entry, f=field_name: self.add_list_item(e, f))
-                add_btn.pack(side=tk.LEFT, padx=(5, 0))
-                
-                # Create listbox for display
-                listbox_frame = ttk.Frame(parent_frame)
-                listbox_frame.grid(row=i+1, column=1, sticky=(tk.W, tk.E), padx=(0, 10), pady=(0, 5))
-                
-                listbox = tk.Listbox(listbox_frame, height=3)
-                listbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
-                
-                scrollbar = ttk.Scrollbar(listbox_frame, orient=tk.VERTICAL, command=listbox.yview)
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-                listbox.configure(yscrollcommand=scrollbar.set)
-                
-                # Store both entry and listbox
-                widget = {'entry': entry, 'listbox': listbox}
-                
-                # Move to next row for listbox
-                i += 1
-            
-            self.form_widgets[field_name] = widget
-        
-        # Buttons
-        button_frame = ttk.Frame(main_frame)
-        button_frame.pack(fill=tk.X, pady=(20, 0))
-        
-        if mode == "add":
-            ttk.Button(button_frame, text="Add Product", command=lambda: self.save_product(mode)).pack(side=tk.RIGHT, padx=(5, 0))
+            data = [json.loads(line) for line in text.splitlines() if line.strip()]
+        except ValueError as e:
+            raise CommandError(f"Input is neither JSON nor JSONL: {e}")
+
+    if isinstance(data, dict):
+        data = data['products'] if isinstance(data.get('products'), list) else [data]
+    if not isinstance(data, list) or not all(isinstance(p, dict) for p in data):
+        raise CommandError("Expected a product object, an array of them or JSONL")
+    return data
+
+
+def write_products(products, fmt='jsonl', out=None):
+    """Write products to stdout as JSONL or a JSON array"""
+    out = out or sys.stdout
+    if fmt == 'json':
+        out.write(json.dumps([dict(p) for p in products], indent=2, ensure_ascii=False))
+        out.write('\n')
+    else:
+        for product in products:
+            out.write(json.dumps(dict(product), ensure_ascii=False))
+            out.write('\n')
+    out.flush()
+
+
+def open_input(path):
+    """Open a file argument for reading, '-' meaning stdin"""
+    if path in (None, '-'):
+        return sys.stdin
+    try:
+        return open(path, 'r', encoding='utf-8')
+    except OSError as e:
+        raise CommandError(f"Cannot read {path}: {e.strerror}")
+
+
+def parse_assignments(assignments):
+    """Turn ['price=1499', 'sizes=["UK 7"]'] into a dict of decoded values"""
+    from product_import import decode_cell
+
+    changes = {}
+    for assignment in assignments:
+        field, sep, text = assignment.partition('=')
+        if not sep or not field:
+            raise CommandError(f"Expected field=value, got '{assignment}'")
+        changes[field] = decode_cell(field, text)
+    return changes
+
+
+def warn(message):
+    print(message, file=sys.stderr)
+
+
+# Commands
+
+def select_products(args, backend):
+    """Return the products matching the --category/--type/--search/--out-of-stock options"""
+    products = backend.query(category=args.category, product_type=args.type,
+                             out_of_stock=args.out_of_stock)
+    if args.search:
+        from product_search import SearchIndex
+        matches = SearchIndex(ProductStore(products)).search(args.search)
+        products = [p for p in products if product_key(p) in matches]
+    return products
+
+
+def cmd_list(args, backend):
+    products = select_products(args, backend)
+    if args.fields:
+        fields = args.fields.split(',')
+        products = [{f: p[f] for f in fields if f in p} for p in products]
+    write_products(products, args.format)
+    return 0
+
+
+def cmd_get(args, backend):
+    found = []
+    status = 0
+    for product_id in args.ids:
+        product = backend.get(product_id)
+        if product is None:
+            warn(f"Product not found: {product_id}")
+            status = 1
         else:
-            ttk.Button(button_frame, text="Update Product", command=lambda: self.save_product(mode, product)).pack(side=tk.RIGHT, padx=(5, 0))
-        
-        ttk.Button(button_frame, text="Cancel", command=window.destroy).pack(side=tk.RIGHT)
-        
-        # Populate form if editing
-        if mode == "edit" and product:
-            self.populate_form(product)
-        
-        # Configure grid weights
-        for frame in [basic_frame, category_frame, pricing_frame, variants_frame, images_frame]:
-            frame.columnconfigure(1, weight=1)
-    
-    def add_list_item(self, entry, field_name):
-        """Add item to list field"""
-        value = entry.get().strip()
-        if value:
-            widget = self.form_widgets[field_name]
-            if isinstance(widget, dict) and 'listbox' in widget:
-                widget['listbox'].insert(tk.END, value)
-                entry.delete(0, tk.END)
-    
-    def populate_form(self, product):
-        """Populate form with existing product data"""
-        for field_name, widget in self.form_widgets.items():
-            value = product.get(field_name, '')
-            
-            if isinstance(widget, dict):
-                # List field
-                if 'listbox' in widget:
-                    widget['listbox'].delete(0, tk.END)
-                    if isinstance(value, list):
-                        for item in value:
-                            widget['listbox'].insert(tk.END, item)
-            else:
-                # Regular field
-                if hasattr(widget, 'set'):
-                    widget.set(value)
-                elif hasattr(widget, 'insert'):
-                    widget.delete(0, tk.END)
-                    widget.insert(0, str(value))
-    
-    def save_product(self, mode, product=None):
-        """Save product data"""
+            found.append(product)
+    write_products(found, args.format)
+    return status
+
+
+def cmd_add(args, backend):
+    with open_input(args.file) as stream:
+        items = read_products(stream)
+
+    status = 0
+    added = []
+    with backend.transaction() as store:
+        for number, item in enumerate(items, 1):
+            try:
+                added.append(store.create(validate_product(item)))
+            except ValidationError as e:
+                warn(f"Product {number}: {e}")
+                status = 1
+    write_products(added, args.format)
+    return status
+
+
+def cmd_update(args, backend):
+    if args.set:
+        changes = parse_assignments(args.set)
+    else:
+        with open_input(args.file) as stream:
+            items = read_products(stream)
+        if len(items) != 1:
+            raise CommandError("update expects exactly one JSON object of changes")
+        changes = items[0]
+
+    with backend.transaction() as store:
+        product = store.get(args.id)
+        if product is None:
+            raise CommandError(f"Product not found: {args.id}")
         try:
-            # Collect form data
-            product_data = {}
-            
-            for field_name, widget in self.form_widgets.items():
-                if isinstance(widget, dict):
-                    # List field
-                    if 'listbox' in widget:
-                        values = list(widget['listbox'].get(0, tk.END))
-                        product_data[field_name] = values
-                else:
-                    # Regular field
-                    if hasattr(widget, 'get'):
-                        value = widget.get()
-                    elif hasattr(widget, 'get_value'):
-                        value = widget.get_value()
-                    else:
-                        value = ''
-                    
-                    # Convert number fields
-                    if field_name in ['price', 'stock']:
-                        try:
-                            value = float(value) if field_name == 'price' else int(value)
-                        except ValueError:
-                            messagebox.showerror("Error", f"Invalid {field_name}: {value}")
-                            return
-                    
-                    product_data[field_name] = value
-            
-            # Validation
-            required_fields = ['name', 'productType', 'category', 'price', 'stock']
-            for field in required_fields:
-                if not product_data.get(field):
-                    messagebox.showerror("Error", f"Field '{field}' is required")
-                    return
-            
-            # Auto-set subcategory based on productType
-            if product_data['productType'] == 'fulkari':
-                product_data['category'] = 'fulkari'
-                product_data['subcategory'] = 'fulkari'
-            else:
-                product_data['subcategory'] = 'jutti'
-            
-            # Generate ID
-            if mode == "add":
-                product_data['_id'] = f"product_{int(datetime.now().timestamp() * 1000)}_{str(uuid.uuid4())[:8]}"
-                product_data['id'] = product_data['_id']
-                product_data['createdAt'] = datetime.now().isoformat()
-                product_data['updatedAt'] = datetime.now().isoformat()
-                
-                # Add to products list
-                self.products.append(product_data)
-                messagebox.showinfo("Success", "Product added successfully!")
+            validated = validate_product({**product, **changes})
+        except ValidationError as e:
+            raise CommandError(str(e))
+        updated = store.update(args.id, validated)
+    write_products([updated], args.format)
+    return 0
+
+
+def cmd_delete(args, backend):
+    status = 0
+    deleted = []
+    with backend.transaction() as store:
+        for product_id in args.ids:
+            product = store.delete(product_id)
+            if product is None:
+                warn(f"Product not found: {product_id}")
+                status = 1
             else:
-                # Update existing product
-                product_data['updatedAt'] = datetime.now().isoformat()
-                
-                # Find and update product
-                for i, p in enumerate(self.products):
-                    if p.get('_id') == product.get('_id') or p.get('id') == product.get('id'):
-                        self.products[i] = {**p, **product_data}
-                        break
-                
-                messagebox.showinfo("Success", "Product updated successfully!")
-            
-            # Close window
-            self.product_window.destroy()
-            
-            # Refresh product list
-            self.refresh_product_list()
-            
-            # Update status
-            self.status_var.set(f"Product {'added' if mode == 'add' else 'updated'} successfully")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save product: {str(e)}")
-    
-    def delete_product(self):
-        """Delete selected product"""
-        selection = self.tree.selection()
-        if not selection:
-            messagebox.showwarning("Warning", "Please select a product to delete")
-            return
-        
-        item = self.tree.item(selection[0])
-        product_id = item['values'][0]
-        product_name = item['values'][1]
-        
-        # Confirm deletion
-        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{product_name}'?"):
-            return
-        
-        # Remove from products list
-        self.products = [p for p in self.products 
-                        if p.get('_id') != product_id and p.get('id') != product_id]
-        
-        # Refresh product list
-        self.refresh_product_list()
-        
-        # Update status
-        self.status_var.set(f"Product '{product_name}' deleted")
-        
-        messagebox.showinfo("Success", f"Product '{product_name}' deleted successfully!")
-    
-    def refresh_product_list(self):
-        """Refresh the product list display"""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add products
-        for product in self.products:
-            values = (
-                product.get('_id', ''),
-                product.get('name', ''),
-                product.get('punjabiName', ''),
-                product.get('category', ''),
-                product.get('subcategory', ''),
-                f"₹{product.get('price', 0)}",
-                product.get('stock', 0),
-                'Active' if product.get('stock', 0) > 0 else 'Out of Stock'
-            )
-            self.tree.insert('', tk.END, values=values)
-        
-        # Update status
-        self.status_var.set(f"Showing {len(self.products)} products")
-    
-    def sort_treeview(self, col):
-        """Sort treeview by column"""
-        # Get all items
-        items = [(self.tree.set(item, col), item) for item in self.tree.get_children('')]
-        
-        # Sort items
-        items.sort()
-        
-        # Rearrange items in sorted positions
-        for index, (val, item) in enumerate(items):
-            self.tree.move(item, '', index)
-    
-    def on_selection_change(self, event):
-        """Handle selection change in treeview"""
-        selection = self.tree.selection()
-        if selection:
-            item = self.tree.item(selection[0])
-            product_name = item['values'][1]
-            self.status_var.set(f"Selected: {product_name}")
+                deleted.append(product)
+    write_products(deleted, args.format)
+    return status
+
+
+def cmd_batch(args, backend):
+    from product_batch import BatchEdit, parse_adjustment
+
+    try:
+        price = parse_adjustment(args.price or '', 'price')
+        stock = parse_adjustment(args.stock or '', 'stock')
+    except ValidationError as e:
+        raise CommandError(str(e))
+    active = True if args.activate else False if args.deactivate else None
+    if price is None and stock is None and active is None and not args.delete:
+        raise CommandError("Nothing to change: pass --price, --stock, --activate, --deactivate or --delete")
+    filtered = args.all or args.category or args.type or args.search or args.out_of_stock
+    if not (args.ids or filtered):
+        raise CommandError("Pick the products with IDs or --category/--type/--search/--out-of-stock, "
+                           "or pass --all")
+    if args.ids and filtered:
+        # Either would silently narrow or widen what the other picked
+        raise CommandError("Pick the products with either IDs or filters, not both")
+
+    keys = args.ids or [product_key(p) for p in select_products(args, backend)]
+    with backend.transaction() as store:
+        batch = BatchEdit(store, price=price, stock=stock, active=active, delete=args.delete).plan(keys)
+        if args.dry_run:
+            for line in batch.describe(limit=args.limit):
+                print(line)
+        else:
+            for key, message in batch.errors[:args.limit]:
+                warn(f"{key}: {message}")
+            if not batch.errors:
+                batch.apply()
+    warn(batch.summary() + (", nothing was changed" if batch.errors and not args.dry_run else ""))
+    return 1 if batch.errors else 0
+
+
+def cmd_check_images(args, backend):
+    from product_images import DEFAULT_WORKERS, TIMEOUT, check_images
+
+    products = select_products(args, backend)
+    progress = None
+    if sys.stderr.isatty():
+        def progress(done, total):
+            print(f"\rChecked {done}/{total} image URLs", end='', file=sys.stderr, flush=True)
+
+    count, broken = check_images(products, workers=max(1, args.workers or DEFAULT_WORKERS),
+                                 public_dir=args.public_dir, timeout=args.timeout or TIMEOUT,
+                                 progress=progress)
+    if progress is not None and count:
+        print(file=sys.stderr)
+    names = {product_key(p): p.get('name', '') for p in products}
+    write_products([{'id': key, 'name': names.get(key, ''), 'url': url, 'reason': reason}
+                    for key, url, reason in broken], args.format)
+    warn(f"Checked {count} image URLs: {len(broken)} broken images in "
+         f"{len({key for key, _, _ in broken})} products")
+    return 1 if broken else 0
+
+
+def cmd_import(args, backend):
+    from product_import import ImportPlan, read_rows
+
+    with backend.transaction() as store:
+        plan = ImportPlan(store)
+        try:
+            plan.add_rows(read_rows(args.file))
+        except OSError as e:
+            raise CommandError(f"Cannot read {args.file}: {e.strerror}")
+
+        if args.dry_run:
+            for line in plan.describe(limit=args.limit):
+                print(line)
         else:
-            self.status_var.set("Ready")
-    
-    def export_to_csv(self):
-        """Export products to CSV file"""
+            for line, message in plan.errors[:args.limit]:
+                warn(f"line {line}: {message}")
+            plan.apply()
+    warn(plan.summary())
+    return 1 if plan.errors else 0
+
+
+def cmd_export(args, backend):
+    from product_export import export_products, guess_format, write_products as write_export
+
+    products = backend.all()
+    if args.file == '-':
+        fmt = args.format or 'csv'
+        count = write_export(sys.stdout.buffer, products, fmt=fmt, compress=args.gzip)
+    else:
+        fmt = args.format or guess_format(args.file)
+        compress = True if args.gzip else None
+        count = export_products(products, args.file, fmt=fmt, compress=compress)
+    warn(f"Exported {count} products")
+    return 0
+    return 0
+
+
+def cmd_export_json(args, backend):
+    count = backend.export_json(args.file)
+    warn(f"Wrote {count} products to {args.file or 'products.json'}")
+    return 0
+
+
+def cmd_migrate(args, backend):
+    from product_backends import SqliteBackend
+
+    if not os.path.exists(args.products_file):
+        raise CommandError(f"{args.products_file} does not exist")
+    database = SqliteBackend(args.db)
+    try:
+        if len(database) and not args.force:
+            raise CommandError(f"{args.db} already holds {len(database)} products; "
+                               "use --force to replace them")
+        count = database.migrate_json(args.products_file)
+    finally:
+        database.close()
+    warn(f"Copied {count} products from {args.products_file} to {args.db}")
+    return 0
+
+
+def cmd_backup(args, backend):
+    backups = backend.backups()
+    migrated = backups.migrate_legacy()
+    if migrated:
+        warn(f"Moved {migrated} old products_backup_*.json files into the backup store")
+    if args.list:
+        write_products(backups.list_snapshots(), args.format)
+        return 0
+    if args.diff:
+        snapshots = backups.list_snapshots()
+        if len(args.diff) > 2:
+            raise CommandError("--diff takes one or two snapshot IDs")
+        if not snapshots:
+            raise CommandError("There are no snapshots yet")
+        old_id, new_id = args.diff if len(args.diff) == 2 else (args.diff[0], snapshots[-1]['id'])
         try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
-            )
-            
-            if filename:
-                import csv
-                with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                    if self.products:
-                        fieldnames = self.products[0].keys()
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                        writer.writeheader()
-                        writer.writerows(self.products)
-                
-                messagebox.showinfo("Success", f"Products exported to {filename}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export: {str(e)}")
-    
-    def open_data_folder(self):
-        """Open the data folder in file explorer"""
+            changes = backups.diff(old_id, new_id)
+        except KeyError as e:
+            raise CommandError(e.args[0])
+        write_products([{'id': key, 'change': change} for change, keys in changes.items() for key in keys],
+                       args.format)
+        warn(f"{old_id} -> {new_id}: {len(changes['added'])} added, {len(changes['removed'])} removed, "
+             f"{len(changes['changed'])} changed")
+        return 0
+
+    newest = backups.list_snapshots()[-1:]
+    entry = backend.backup(args.note)
+    if entry is None and args.note:
+        # Only when another snapshot was taken in between
+        raise CommandError("The backups changed while taking this one; the note was not recorded")
+    if entry is None:
+        entry = backups.list_snapshots()[-1]
+        warn(f"No changes since snapshot {entry['id']}")
+    elif newest and entry['id'] == newest[0]['id']:
+        warn(f"No changes since snapshot {entry['id']}; the note was added to it")
+    write_products([entry], args.format)
+    return 0
+
+
+def cmd_restore(args, backend):
+    try:
+        backend.restore(args.snapshot_id)
+    except KeyError:
+        raise CommandError(f"No snapshot with ID {args.snapshot_id}")
+    warn(f"Restored snapshot {args.snapshot_id}")
+    return 0
+
+
+def cmd_gui(args, backend):
+    return run_gui(args.metrics)
+
+
+def run_gui(metrics_file=None):
+    """Open the Tkinter window"""
+    try:
+        import product_gui
+    except ImportError as e:
+        warn(f"The GUI needs tkinter ({e}); use a subcommand instead, see --help")
+        return 1
+    try:
+        product_gui.main()
+    except product_gui.tk.TclError as e:
+        # Typically no $DISPLAY on a server
+        warn(f"Cannot open the GUI: {e}\nUse a subcommand instead, see --help")
+        return 1
+    finally:
+        write_metrics(metrics_file)
+    return 0
+
+
+def write_metrics(path):
+    """Dump the timings collected by this run, if asked to with --metrics"""
+    if path:
         try:
-            import subprocess
-            import platform
-            
-            if platform.system() == "Windows":
-                subprocess.run(["explorer", "data"])
-            elif platform.system() == "Darwin":  # macOS
-                subprocess.run(["open", "data"])
-            else:  # Linux
-                subprocess.run(["xdg-open", "data"])
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open folder: {str(e)}")
-
-def main():
-    """Main function"""
-    root = tk.Tk()
-    app = ProductManager(root)
-    root.mainloop()
+            metrics.dump(path)
+        except OSError as e:
+            warn(f"Cannot write metrics to {path}: {e}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='product_manager.py',
+        description="Manage the Punjabi E-commerce Store product catalog. "
+                    "Run without a command to open the GUI.",
+    )
+    parser.add_argument('--backend', choices=BACKENDS,
+                        help="where the catalog is kept (default: $PRODUCTS_BACKEND, else json)")
+    parser.add_argument('--file', dest='products_file', default=PRODUCTS_FILE, metavar='FILE',
+                        help=f"products file for the json backend (default: {PRODUCTS_FILE}); "
+                             "backups and the journal live next to it")
+    parser.add_argument('--db', default=PRODUCTS_DB,
+                        help=f"database for the sqlite backend (default: {PRODUCTS_DB})")
+    parser.add_argument('--memory-mode', choices=BACKEND_MEMORY_MODES,
+                        help="hold loaded products as dicts or in compact columns for low-memory "
+                             "hosts (default: $PRODUCTS_MEMORY_MODE, else full)")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="write timings of this run as JSON to FILE when done "
+                             "(set PRODUCTS_PROFILE=save.encode,... to include profiles)")
+    commands = parser.add_subparsers(dest='command', metavar='command')
+
+    def command(name, handler, help_text):
+        sub = commands.add_parser(name, help=help_text, description=help_text)
+        sub.set_defaults(handler=handler)
+        return sub
+
+    def output_format(sub):
+        sub.add_argument('--format', choices=('jsonl', 'json'), default='jsonl',
+                         help="print JSON Lines (default) or one JSON array")
+
+    def filters(sub):
+        sub.add_argument('--category', help="only this category")
+        sub.add_argument('--type', help="only this productType")
+        sub.add_argument('--search', help="only products matching this text")
+        sub.add_argument('--out-of-stock', action='store_true', help="only products with no stock")
+
+    command('gui', cmd_gui, "open the GUI (the default)")
+
+    sub = command('list', cmd_list, "print products")
+    filters(sub)
+    sub.add_argument('--fields', help="comma-separated fields to print")
+    output_format(sub)
+
+    sub = command('get', cmd_get, "print products by ID")
+    sub.add_argument('ids', nargs='+', metavar='ID')
+    output_format(sub)
+
+    sub = command('add', cmd_add, "add products read as JSON/JSONL")
+    sub.add_argument('file', nargs='?', default='-', help="input file (default: stdin)")
+    output_format(sub)
+
+    sub = command('update', cmd_update, "change fields of one product")
+    sub.add_argument('id', metavar='ID')
+    sub.add_argument('--set', action='append', metavar='FIELD=VALUE',
+                     help="field to change; lists and numbers as JSON (repeatable)")
+    sub.add_argument('file', nargs='?', default='-',
+                     help="JSON object of changes when --set is not given (default: stdin)")
+    output_format(sub)
+
+    sub = command('delete', cmd_delete, "delete products by ID")
+    sub.add_argument('ids', nargs='+', metavar='ID')
+    output_format(sub)
+
+    sub = command('batch', cmd_batch, "change price, stock or status of many products in one go")
+    sub.add_argument('ids', nargs='*', metavar='ID', help="products to change (instead of the filters)")
+    filters(sub)
+    sub.add_argument('--all', action='store_true', help="every product, when no IDs or filters are given")
+    sub.add_argument('--price', help="1499 sets it, +100/-100 adjusts, +10%%/-10%% by a percentage")
+    sub.add_argument('--stock', help="25 sets it, +10/-5 adjusts")
+    status = sub.add_mutually_exclusive_group()
+    status.add_argument('--activate', action='store_true', help="mark the products active")
+    status.add_argument('--deactivate', action='store_true', help="mark the products inactive")
+    status.add_argument('--delete', action='store_true', help="delete the products instead")
+    sub.add_argument('--dry-run', action='store_true', help="only show what would change")
+    sub.add_argument('--limit', type=int, default=200, help="lines of diff/errors to show")
+
+    sub = command('check-images', cmd_check_images,
+                  "check that product image URLs resolve (files in public/, or http(s) URLs)")
+    filters(sub)
+    sub.add_argument('--workers', type=int, default=None,
+                     help="checks running at once (default: 16)")
+    sub.add_argument('--timeout', type=float, default=None,
+                     help="seconds to wait for each remote image (default: 10)")
+    sub.add_argument('--public-dir', default='public',
+                     help="folder site-relative URLs are served from (default: public)")
+    output_format(sub)
+
+    sub = command('import', cmd_import, "upsert products from a CSV or JSONL file")
+    sub.add_argument('file')
+    sub.add_argument('--dry-run', action='store_true', help="only show what would change")
+    sub.add_argument('--limit', type=int, default=200, help="lines of diff/errors to show")
+
+    sub = command('export', cmd_export, "export products as CSV or columnar TSV")
+    sub.add_argument('file', help="output file, or - for stdout")
+    sub.add_argument('--format', choices=('csv', 'columns'),
+                     help="default: from the file name (.tsv means columns), else csv")
+    sub.add_argument('--gzip', action='store_true', help="gzip the output (default for .gz names)")
+
+    sub = command('export-json', cmd_export_json,
+                  "write the catalog in products.json format, e.g. from the sqlite backend "
+                  "for the GUI and the Node servers")
+    sub.add_argument('file', nargs='?', help="output file (default: products.json next to the catalog)")
+
+    sub = command('migrate', cmd_migrate, "copy products.json (--file) into the sqlite database (--db)")
+    sub.add_argument('--force', action='store_true', help="replace products already in the database")
+
+    sub = command('backup', cmd_backup, "snapshot the catalog into the backup store")
+    sub.add_argument('--note', default='', help="note stored with the snapshot")
+    action = sub.add_mutually_exclusive_group()
+    action.add_argument('--list', action='store_true', help="list snapshots instead")
+    action.add_argument('--diff', nargs='+', metavar='SNAPSHOT_ID',
+                        help="instead list the products added, removed or changed between two "
+                             "snapshots (one ID: from it to the newest)")
+    output_format(sub)
+
+    sub = command('restore', cmd_restore, "replace the catalog with a backup snapshot")
+    sub.add_argument('snapshot_id', metavar='SNAPSHOT_ID')
+
+    return parser
+
+
+def main(argv=None):
+    """Run a command, or open the GUI when there is none"""
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        return run_gui(args.metrics)
+
+    # Punjabi text must survive a pipe even under a C/POSIX locale
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(encoding='utf-8')
+
+    from product_backends import open_backend
+    try:
+        backend = open_backend(args.backend, args.products_file, args.db, args.memory_mode)
+    except Exception as e:
+        warn(f"Error: {e}")
+        return 1
+
+    metrics.arm_from_environment()
+    try:
+        with metrics.timer(f"cli.{args.command}"):
+            return args.handler(args, backend)
+    except CommandError as e:
+        warn(f"Error: {e}")
+        return 1
+    except BrokenPipeError:
+        # e.g. piped into head
+        sys.stderr.close()
+        return 0
+    except Exception as e:
+        warn(f"Error: {e}")
+        return 1
+    finally:
+        backend.close()
+        write_metrics(args.metrics)
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
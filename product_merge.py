@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Merge
+Merges changes another program made to products.json into the open catalog
+
+SyncState remembers the file as the manager last loaded or saved it - its
+signature and each product's updatedAt - and, for every product edited
+here since, that product's version before the first edit (the merge base).
+
+When the file changes on disk, read_changes() streams it and keeps only the
+products whose updatedAt differs from the remembered one, plus added and
+removed ones; the rest of the catalog is left alone. apply() then brings
+those into the ProductStore:
+
+- products not edited here take the other side's version
+- products edited on both sides are merged field by field against the
+  base: a field changed on one side takes that side's value, and a field
+  changed differently on both sides keeps ours and is reported as a
+  conflict (their version stays in the backups)
+- a product deleted on one side and changed on the other is kept
+
+Products without an updatedAt (hand-edited files) are only seen as changed
+when they are added or removed.
+"""
+
+from datetime import datetime
+
+from product_loader import stream_products
+from product_store import as_dict, product_key
+
+_MISSING = object()
+
+# Fields that always differ between two edits and are not conflicts
+_MERGE_IGNORED = ('updatedAt',)
+
+
+class ChangedOnDisk(Exception):
+    """Raised by a save that would overwrite changes made by another program"""
+
+
+def record_version(product):
+    """The value compared to tell whether a product changed"""
+    return product.get('updatedAt')
+
+
+def merge_record(base, ours, theirs):
+    """Three-way merge of one product, returning (merged, conflicting fields)
+
+    Any of the three may be None for "does not exist" (not yet added, or
+    deleted). A merged value of None means the product should be deleted.
+    """
+    if ours == theirs:
+        return ours, []
+    if base == ours:
+        return theirs, []
+    if base == theirs:
+        return ours, []
+    if ours is None or theirs is None:
+        # Deleted on one side, changed on the other: keep the changes
+        return ours if theirs is None else theirs, ['deleted']
+
+    base = base or {}
+    merged = {}
+    conflicts = []
+    for field in list(ours) + [f for f in theirs if f not in ours]:
+        b = base.get(field, _MISSING)
+        o = ours.get(field, _MISSING)
+        t = theirs.get(field, _MISSING)
+        if o == t or t == b:
+            value = o
+        elif o == b:
+            value = t
+        else:
+            value = o
+            if field not in _MERGE_IGNORED:
+                conflicts.append(field)
+        if value is not _MISSING:
+            merged[field] = value
+    merged['updatedAt'] = datetime.now().isoformat()
+    return merged, conflicts
+
+
+def read_changes(path, versions, index=None):
+    """Stream products.json and return (changed {key: product}, removed keys)
+
+    `versions` maps each key to its record_version() as last synced. When a
+    product_loader.CatalogIndex is given, every product's offset is recorded
+    in it, so partial records can be re-read from the new file.
+    """
+    changed = {}
+    seen = set()
+    for product, offset, length in stream_products(path):
+        key = product_key(product)
+        if not key:
+            continue
+        if index is not None:
+            index.add(key, offset, length)
+        seen.add(key)
+        if key not in versions or record_version(product) != versions[key]:
+            changed[key] = product
+        else:
+            # Listed twice in the file; the last copy wins, as when loading
+            changed.pop(key, None)
+    removed = [key for key in versions if key not in seen]
+    return changed, removed
+
+
+class SyncState:
+    """What products.json held at the last load or save, and what was edited since
+
+    Subscribe on_change() to the ProductStore once loading has finished.
+    """
+
+    def __init__(self):
+        self.signature = None
+        # key -> record_version() as in the file
+        self.versions = {}
+        # key -> version before the first local edit (None if added here)
+        self.edited = {}
+        # Same, for edits made after each pending background save took its snapshot
+        self._pending_saves = []
+        self._muted = False
+
+    def on_change(self, op, key, old, new):
+        """ProductStore listener that remembers the merge base of local edits"""
+        if op == 'reset' or self._muted:
+            return
+        base = as_dict(old) if old is not None else None
+        self.edited.setdefault(key, base)
+        for since in self._pending_saves:
+            since.setdefault(key, base)
+
+    def begin_save(self):
+        """Call when a save takes its snapshot; pass the result to saved() or save_failed()"""
+        since = {}
+        self._pending_saves.append(since)
+        return since
+
+    def saved(self, since, versions, signature):
+        """The snapshot was written: it is the new base"""
+        self.versions = versions
+        self.signature = signature
+        self.edited = since
+        self._pending_saves.remove(since)
+
+    def save_failed(self, since):
+        self._pending_saves.remove(since)
+
+    def apply(self, store, changed, removed, signature, journal=None):
+        """Bring the result of read_changes() into the store
+
+        Returns [(key, conflicting fields)]. Products taken unchanged from
+        the file are not journaled (pass the journal listener to mute it);
+        merged ones are, so replaying the journal after a crash keeps both
+        sides' edits.
+        """
+        theirs_only = []
+        both = []
+        for key in list(changed) + list(removed):
+            (both if key in self.edited else theirs_only).append(key)
+
+        conflicts = []
+        self._muted = True
+        try:
+            if journal is not None:
+                store.unsubscribe(journal)
+            try:
+                for key in theirs_only:
+                    self._put(store, key, changed.get(key))
+            finally:
+                if journal is not None:
+                    store.subscribe(journal)
+
+            for key in both:
+                theirs = changed.get(key)
+                ours = store.get(key)
+                ours = as_dict(ours) if ours is not None else None
+                merged, fields = merge_record(self.edited[key], ours, theirs)
+                if merged != ours:
+                    self._put(store, key, merged)
+                if fields:
+                    conflicts.append((key, fields))
+
+                # The file is the new base; what differs from it is still a local edit
+                if merged == theirs:
+                    del self.edited[key]
+                else:
+                    self.edited[key] = theirs
+                for since in self._pending_saves:
+                    since[key] = theirs
+        finally:
+            self._muted = False
+
+        # A new dict, as a queued read_changes() may already be reading the old one
+        versions = dict(self.versions)
+        for key, product in changed.items():
+            versions[key] = record_version(product)
+        for key in removed:
+            versions.pop(key, None)
+        self.versions = versions
+        self.signature = signature
+        return conflicts
+
+    def _put(self, store, key, product):
+        # The file behind a partial record may have been rewritten in place,
+        # so the record is replaced without reading it
+        if product is None:
+            store.delete(key, load=False)
+        else:
+            store.put(product, load=False)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Metrics
+Timings and counters for the manager's slow paths, cheap enough to leave on
+
+Code wraps its slow steps in `metrics.timer('save.encode')` and counts
+work with `metrics.incr('export.rows', n)`. Names are dotted: 'save' is
+the whole save as the user waits for it, 'save.encode', 'save.backup'
+and so on the steps inside it. Each timer keeps a count, total, min,
+max, last and the RECENT_SAMPLES most recent durations for percentiles;
+a timer costs a few microseconds, so the hooks stay on in normal use.
+
+Work that starts on one callback and ends on another (a background save
+from the click to the "saved" message) is timed with start()/stop().
+
+For a closer look at one operation, profile_next(name) arms a capture of
+the next run of that timer: a cProfile of the thread it runs on and a
+tracemalloc diff of what it allocated. Setting PRODUCTS_PROFILE to a
+comma-separated list of timer names arms them at startup, e.g. to profile
+loading. Captures are kept with the metrics and included in dump().
+
+Timers and counters can be updated from worker threads.
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from product_io import atomic_write_json
+
+# Durations kept per timer for the percentiles
+RECENT_SAMPLES = 200
+
+# Captures kept, and lines in each part of a capture report
+MAX_CAPTURES = 5
+PROFILE_LINES = 30
+
+# Stack frames tracemalloc records per allocation during a capture
+TRACE_FRAMES = 5
+
+
+def max_rss_bytes():
+    """Return the peak resident size of this process, where the OS reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class TimerStats:
+    """Running statistics of one timer"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds, failed=False):
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.total += seconds
+        self.last = seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        """Return the statistics as a dict of seconds"""
+        ordered = sorted(self.recent)
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min or 0.0,
+            'max': self.max,
+            'last': self.last,
+            'p50': _percentile(ordered, 0.5) if ordered else 0.0,
+            'p95': _percentile(ordered, 0.95) if ordered else 0.0,
+        }
+
+
+class Capture:
+    """cProfile and tracemalloc capture of one run of a timer"""
+
+    def __init__(self, name, cpu=True, memory=True):
+        self.name = name
+        self.profiler = None
+        if cpu:
+            # Imported here, as pstats is slow to import and only needed for captures
+            import cProfile
+            self.profiler = cProfile.Profile()
+        self.memory = memory
+        self._started_tracing = False
+        self._before = None
+
+    def start(self):
+        if self.memory:
+            # Imported here too, as it pulls in linecache and tokenize
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACE_FRAMES)
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            self._before = tracemalloc.take_snapshot()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(self, seconds):
+        """Stop capturing and return the report as a dict"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        report = {
+            'name': self.name,
+            'time': datetime.now().isoformat(),
+            'seconds': seconds,
+            'cpu': None,
+            'memory': None,
+            'peak_bytes': None,
+        }
+
+        # Memory first, so building the CPU report is not counted
+        if self.memory:
+            import tracemalloc
+            after = tracemalloc.take_snapshot()
+            report['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            if self._started_tracing:
+                tracemalloc.stop()
+            lines = [f"Peak traced memory: {report['peak_bytes'] / (1024 * 1024):.1f} MB",
+                     "Top allocations still held, by line:"]
+            for stat in after.compare_to(self._before, 'lineno')[:PROFILE_LINES]:
+                lines.append(str(stat))
+            report['memory'] = '\n'.join(lines)
+
+        if self.profiler is not None:
+            import io
+            import pstats
+            out = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=out)
+            stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+            report['cpu'] = out.getvalue()
+        return report
+
+
+class Metrics:
+    """Named timers and counters, safe to update from any thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+        self.timers = {}
+        self.counters = {}
+        self.captures = deque(maxlen=MAX_CAPTURES)
+        # name -> (cpu, memory) for captures waiting for their timer
+        self._armed = {}
+        self._capturing = False
+
+    def record(self, name, seconds, failed=False):
+        """Add one measured duration to a timer"""
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = TimerStats()
+            stats.add(seconds, failed)
+
+    def incr(self, name, amount=1):
+        """Add to a counter"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time the with-block under `name`, capturing it if profile_next() asked for it"""
+        capture = self._take_capture(name) if self._armed else None
+        if capture is not None:
+            capture.start()
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(name, seconds, failed)
+            if capture is not None:
+                self._finish_capture(capture, seconds)
+
+    def start(self, name):
+        """Start timing work that ends in another callback; pass the result to stop()"""
+        return name, time.perf_counter()
+
+    def stop(self, token, failed=False):
+        """Finish timing started with start() and return the seconds taken"""
+        name, start = token
+        seconds = time.perf_counter() - start
+        self.record(name, seconds, failed)
+        return seconds
+
+    def profile_next(self, name, cpu=True, memory=True):
+        """Capture the next run of the timer `name`"""
+        with self._lock:
+            self._armed[name] = (cpu, memory)
+
+    def armed(self):
+        """Return the timer names waiting to be captured"""
+        with self._lock:
+            return list(self._armed)
+
+    def arm_from_environment(self):
+        """Arm captures listed in PRODUCTS_PROFILE"""
+        for name in os.environ.get('PRODUCTS_PROFILE', '').split(','):
+            if name.strip():
+                self.profile_next(name.strip())
+
+    def _take_capture(self, name):
+        with self._lock:
+            # cProfile and tracemalloc diffs do not nest; one capture at a time
+            if name not in self._armed or self._capturing:
+                return None
+            cpu, memory = self._armed.pop(name)
+            self._capturing = True
+        return Capture(name, cpu, memory)
+
+    def _finish_capture(self, capture, seconds):
+        try:
+            report = capture.finish(seconds)
+        finally:
+            with self._lock:
+                self._capturing = False
+        with self._lock:
+            self.captures.append(report)
+
+    def snapshot(self):
+        """Return all metrics as a JSON-ready dict"""
+        with self._lock:
+            timers = {name: stats.summary() for name, stats in sorted(self.timers.items())}
+            counters = dict(sorted(self.counters.items()))
+            captures = list(self.captures)
+        return {
+            'started': self.started.isoformat(),
+            'uptime_seconds': (datetime.now() - self.started).total_seconds(),
+            'max_rss_bytes': max_rss_bytes(),
+            'timers': timers,
+            'counters': counters,
+            'captures': captures,
+        }
+
+    def dump(self, path):
+        """Write snapshot() to a JSON file"""
+        atomic_write_json(path, self.snapshot())
+
+    def reset(self):
+        """Forget all timings, counters and captures"""
+        with self._lock:
+            self.started = datetime.now()
+            self.timers = {}
+            self.counters = {}
+            self.captures.clear()
+
+
+# Shared by the GUI, the command line and the headless modules
+metrics = Metrics()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Search
+In-memory inverted index for full-text, prefix and faceted search
+
+Text from name, punjabiName, description, punjabiDescription and tags is
+NFC-normalized, case-folded and split into words. Python's \\w alone splits
+Gurmukhi words apart at every vowel sign (ਪੰਜਾਬੀ would become ਪ, ਜ, ਬ), so
+combining marks count as word characters here, and zero-width (non-)joiners
+are dropped before splitting.
+
+Query words of two or more characters are matched as prefixes, so results
+narrow as the user types. The index subscribes to a ProductStore and is
+kept up to date as products are added, edited and deleted.
+
+Each product gets a row number in catalog order. Postings are sets of rows,
+and the large ones (common words, facet values) are also cached as integer
+bitmaps, so intersections and facet counts over tens of thousands of
+products are a few big-integer operations instead of Python loops. A
+search result stays a bitmap: the list pages through it, and only sorting
+turns it into a list of keys. Once deleted products leave more empty rows
+than there are live ones, the rows are renumbered without the gaps.
+
+Products loaded lazily are indexed from their in-memory summary, which
+has no description, so descriptions of those become searchable once the
+product has been opened or saved.
+"""
+
+import bisect
+import re
+import sys
+import unicodedata
+from itertools import compress, islice
+
+# Fields whose text is searched
+TEXT_FIELDS = ('name', 'punjabiName', 'description', 'punjabiDescription', 'tags')
+
+# Fields offered as facets, and whether they hold a list of values
+FACET_FIELDS = {
+    'category': False,
+    'productType': False,
+    'sizes': True,
+    'colors': True,
+}
+
+# Shorter query words only match whole words, not every word they start
+MIN_PREFIX = 2
+
+# Postings at least this large are cached as bitmaps
+BITMAP_MIN = 256
+
+# New or removed words handled one by one before the vocabulary is re-sorted
+RESORT_AFTER = 1000
+
+# Rows of deleted products are compacted away once they outnumber the live
+# rows and there are at least this many
+COMPACT_MIN = 1000
+
+# Zero-width joiners and similar are typing artefacts, not word breaks
+_INVISIBLE = re.compile('[\u200c\u200d\u00ad\ufeff]')
+
+_BITS = [1 << i for i in range(8)]
+_BINARY_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+
+def _mark_class():
+    """Character class ranges covering every combining mark in the BMP"""
+    ranges = []
+    start = None
+    for code in range(0x300, 0x10000):
+        is_mark = unicodedata.category(chr(code)).startswith('M')
+        if is_mark and start is None:
+            start = code
+        elif not is_mark and start is not None:
+            ranges.append(f'\\u{start:04x}-\\u{code - 1:04x}')
+            start = None
+    return ''.join(ranges)
+
+
+_WORD = re.compile(f'[\\w{_mark_class()}]+')
+
+
+def _popcount(bits):
+    """Number of set bits (int.bit_count() needs Python 3.10)"""
+    return bin(bits).count('1')
+
+
+if hasattr(int, 'bit_count'):
+    _popcount = int.bit_count
+
+
+def _bitmap(rows):
+    """Build an integer bitmap with the given row bits set"""
+    if not rows:
+        return 0
+    buf = bytearray((max(rows) >> 3) + 1)
+    for row in rows:
+        buf[row >> 3] |= _BITS[row & 7]
+    return int.from_bytes(buf, 'little')
+
+
+def _flags(bits):
+    """Return a bitmap as bytes, one per row: 1 if the row is set, else 0"""
+    # bin() is linear for powers of two, and compress() over the bytes
+    # picks the set rows without a Python loop
+    return bin(bits)[:1:-1].encode('ascii').translate(_BINARY_FLAGS)
+
+
+def normalize(text):
+    """Normalize text for matching: NFC, no zero-width joiners, case-folded"""
+    text = unicodedata.normalize('NFC', text)
+    if _INVISIBLE.search(text):
+        text = _INVISIBLE.sub('', text)
+    return text.casefold()
+
+
+def tokenize(text):
+    """Split text into normalized words"""
+    return _WORD.findall(normalize(text))
+
+
+def product_tokens(product):
+    """Return the set of words in a product's searchable fields"""
+    parts = []
+    for field in TEXT_FIELDS:
+        value = product.get(field)
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, list):
+            parts.extend(item for item in value if isinstance(item, str))
+    return set(tokenize('\n'.join(parts)))
+
+
+def facet_values(product, field):
+    """Return the facet values a product has for one field"""
+    value = product.get(field)
+    if FACET_FIELDS[field]:
+        if not isinstance(value, list):
+            return ()
+        return [v for v in value if isinstance(v, (str, int, float))]
+    if isinstance(value, (str, int, float)) and value != '':
+        return (value,)
+    return ()
+
+
+class SearchResult:
+    """Products matching a search, held as a bitmap of index rows
+
+    A read-only sequence of product keys in catalog order: len(), `in`,
+    index() and slices for one page are answered from the bitmap, without
+    building the list of every matching key.
+    """
+
+    def __init__(self, index, bits):
+        # The row numbering as of this search; compacting the index
+        # replaces these rather than changing them
+        self.rows = index.rows
+        self.row_keys = index.row_keys
+        self.bits = bits
+        self._flags = None
+        self._len = None
+
+    def __len__(self):
+        if self._len is None:
+            self._len = _popcount(self.bits)
+        return self._len
+
+    def __contains__(self, key):
+        row = self.rows.get(key)
+        return row is not None and self.bits >> row & 1 == 1
+
+    def __iter__(self):
+        return compress(self.row_keys, self.flags())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            return list(islice(self, start, max(start, stop), step))
+        position = item + len(self) if item < 0 else item
+        if not 0 <= position < len(self):
+            raise IndexError("search result index out of range")
+        return next(islice(self, position, None))
+
+    def index(self, key):
+        """Position of a product key among the results"""
+        if key not in self:
+            raise ValueError(f"{key!r} is not in the search result")
+        return _popcount(self.bits & ((1 << self.rows[key]) - 1))
+
+    def flags(self):
+        """The bitmap as one byte per row, built once"""
+        if self._flags is None:
+            self._flags = _flags(self.bits)
+        return self._flags
+
+    def keys(self):
+        """Matching product keys in catalog order"""
+        return list(self)
+
+
+class SearchIndex:
+    """Inverted index over a ProductStore, kept in sync through subscribe()"""
+
+    def __init__(self, store):
+        self.store = store
+        self.rebuild()
+        store.subscribe(self.on_change)
+
+    def rebuild(self):
+        """Index every product in the store from scratch"""
+        # key <-> row; rows follow catalog order, and those of deleted
+        # products stay empty until _compact()
+        self.rows = {}
+        self.row_keys = []
+        self.live = set()
+
+        # word -> {row}, and field -> value -> {row}
+        self.postings = {}
+        self.facets = {field: {} for field in FACET_FIELDS}
+
+        # Bitmaps of large postings, built on first use; see _bits()
+        self._bitmaps = {}
+        self._live_bits = None
+
+        # Sorted vocabulary for prefix lookups, None until needed
+        self._words = None
+        self._vocab_changes = 0
+
+        for key in self.store.keys():
+            self._add(key, self.store.peek(key))
+
+    def prepare(self):
+        """Sort the vocabulary and build the large bitmaps ahead of the first query"""
+        if self._words is None:
+            self._words = sorted(self.postings)
+        for word, rows in self.postings.items():
+            if len(rows) >= BITMAP_MIN:
+                self._bits(word, rows)
+        for field, index in self.facets.items():
+            for value, rows in index.items():
+                self._bits((field, value), rows)
+        self._all_bits()
+
+    def close(self):
+        """Stop following changes to the store"""
+        self.store.unsubscribe(self.on_change)
+
+    def on_change(self, op, key, old, new):
+        """ProductStore listener that updates the index incrementally"""
+        if op == 'reset':
+            self.rebuild()
+            return
+        if old is not None:
+            self._remove(key, old)
+        if new is not None:
+            self._add(key, new)
+        elif op == 'delete':
+            # Added again later, it goes to the end of the catalog
+            self.rows.pop(key, None)
+            dead = len(self.row_keys) - len(self.live)
+            if dead >= COMPACT_MIN and dead > len(self.live):
+                self._compact()
+
+    def _compact(self):
+        """Renumber the live rows in order, dropping those of deleted products"""
+        live = sorted(self.live)
+        renumbered = {row: new for new, row in enumerate(live)}
+
+        # New objects rather than edits, so earlier SearchResults keep theirs
+        self.row_keys = [self.row_keys[row] for row in live]
+        self.rows = {key: row for row, key in enumerate(self.row_keys)}
+        self.live = set(range(len(live)))
+        for word, rows in self.postings.items():
+            self.postings[word] = {renumbered[row] for row in rows if row in renumbered}
+        for index in self.facets.values():
+            for value, rows in index.items():
+                index[value] = {renumbered[row] for row in rows if row in renumbered}
+        self._bitmaps = {}
+        self._live_bits = None
+
+    def _add_word(self, word):
+        if self._words is not None:
+            if self._vocab_changes < RESORT_AFTER:
+                bisect.insort(self._words, word)
+                self._vocab_changes += 1
+            else:
+                self._words = None
+
+    def _remove_word(self, word):
+        if self._words is not None:
+            if self._vocab_changes < RESORT_AFTER:
+                del self._words[bisect.bisect_left(self._words, word)]
+                self._vocab_changes += 1
+            else:
+                self._words = None
+
+    def _set_bit(self, cache_key, row, on):
+        """Keep a cached bitmap in step with its posting"""
+        bits = self._bitmaps.get(cache_key)
+        if bits is not None:
+            self._bitmaps[cache_key] = bits | (1 << row) if on else bits & ~(1 << row)
+
+    def _add(self, key, product):
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.row_keys)
+            self.row_keys.append(key)
+        self.live.add(row)
+        if self._live_bits is not None:
+            self._live_bits |= 1 << row
+
+        for word in product_tokens(product):
+            rows = self.postings.get(word)
+            if rows is None:
+                word = sys.intern(word)
+                rows = self.postings[word] = set()
+                self._add_word(word)
+            rows.add(row)
+            self._set_bit(word, row, True)
+        for field, index in self.facets.items():
+            for value in facet_values(product, field):
+                index.setdefault(value, set()).add(row)
+                self._set_bit((field, value), row, True)
+
+    def _remove(self, key, product):
+        # The old record may hold more text than was indexed (a lazily
+        # loaded summary that was materialized since), so misses are fine
+        row = self.rows.get(key)
+        if row is None:
+            return
+        self.live.discard(row)
+        if self._live_bits is not None:
+            self._live_bits &= ~(1 << row)
+
+        for word in product_tokens(product):
+            rows = self.postings.get(word)
+            if rows is None or row not in rows:
+                continue
+            rows.discard(row)
+            self._set_bit(word, row, False)
+            if not rows:
+                del self.postings[word]
+                self._bitmaps.pop(word, None)
+                self._remove_word(word)
+        for field, index in self.facets.items():
+            for value in facet_values(product, field):
+                rows = index.get(value)
+                if rows is None or row not in rows:
+                    continue
+                rows.discard(row)
+                self._set_bit((field, value), row, False)
+                if not rows:
+                    del index[value]
+                    self._bitmaps.pop((field, value), None)
+
+    def _bits(self, cache_key, rows):
+        """Bitmap for a posting, cached when the posting is large"""
+        if len(rows) < BITMAP_MIN:
+            return _bitmap(rows)
+        bits = self._bitmaps.get(cache_key)
+        if bits is None:
+            bits = self._bitmaps[cache_key] = _bitmap(rows)
+        return bits
+
+    def _all_bits(self):
+        if self._live_bits is None:
+            self._live_bits = _bitmap(self.live)
+        return self._live_bits
+
+    def _word_bits(self, word):
+        """Bitmap of products with a word matching one query word"""
+        if len(word) < MIN_PREFIX:
+            rows = self.postings.get(word)
+            return self._bits(word, rows) if rows else 0
+
+        if self._words is None:
+            self._words = sorted(self.postings)
+        self._vocab_changes = 0
+        start = bisect.bisect_left(self._words, word)
+        end = bisect.bisect_left(self._words, word + '\U0010ffff', start)
+
+        # Large postings are OR-ed as bitmaps, small ones pooled into one
+        bits = 0
+        small = []
+        for match in self._words[start:end]:
+            rows = self.postings[match]
+            if len(rows) < BITMAP_MIN:
+                small.extend(rows)
+            else:
+                bits |= self._bits(match, rows)
+        return bits | _bitmap(small)
+
+    def search(self, text='', filters=None):
+        """Return a SearchResult for products matching every word of text and the filters
+
+        `filters` maps facet fields to a required value, e.g.
+        {'category': 'men', 'sizes': 'UK 8'}.
+        """
+        bits = self._all_bits()
+        for word in set(tokenize(text)):
+            if not bits:
+                break
+            bits &= self._word_bits(word)
+        for field, value in (filters or {}).items():
+            rows = self.facets[field].get(value)
+            bits = bits & self._bits((field, value), rows) if rows else 0
+        return SearchResult(self, bits)
+
+    def facet_counts(self, field, result=None):
+        """Return {value: count} for a facet, over a SearchResult or the whole catalog"""
+        index = self.facets[field]
+        if result is None:
+            return {value: len(rows) for value, rows in index.items()}
+        counts = {}
+        for value, rows in index.items():
+            count = _popcount(result.bits & self._bits((field, value), rows))
+            if count:
+                counts[value] = count
+        return counts
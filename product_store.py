@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Product Store
+Headless catalog logic for the product manager, usable without a display
+"""
+
+import contextlib
+import json
+import os
+from datetime import datetime
+
+from product_io import FileLock, atomic_write_bytes
+from product_metrics import metrics
+
+# Where the manager keeps its data, relative to the project root
+PRODUCTS_FILE = os.path.join('data', 'products.json')
+BACKUP_DIR = os.path.join('data', 'backups')
+JOURNAL_FILE = os.path.join('data', 'products.journal.jsonl')
+HISTORY_FILE = os.path.join('data', 'products.history.json')
+PRODUCTS_DB = os.path.join('data', 'products.db')
+
+# Storage backends product_backends.open_backend() knows, and how they can
+# hold loaded products in memory (PRODUCTS_MEMORY_MODE also takes the GUI's
+# 'auto' and 'lazy', which keep dicts there)
+BACKENDS = ('json', 'sqlite')
+BACKEND_MEMORY_MODES = ('full', 'columnar')
+
+# Fields that get a secondary index for fast filtering
+INDEXED_FIELDS = ('category', 'productType', 'subcategory')
+
+# Fields sorted as numbers and as timestamps rather than as text
+NUMERIC_FIELDS = ('price', 'originalPrice', 'stock', 'stockQuantity', 'rating', 'reviews')
+TIMESTAMP_FIELDS = ('createdAt', 'updatedAt')
+
+
+# Fields every product must have, and the product types the store sells
+REQUIRED_FIELDS = ('name', 'productType', 'category', 'price', 'stock')
+PRODUCT_TYPES = ('jutti', 'fulkari')
+
+
+class ValidationError(ValueError):
+    """Raised when product data breaks the catalog rules"""
+
+
+def generate_product_id():
+    """Generate a product ID in the same format the GUI has always used"""
+    # 8 random hex digits, as the uuid4() prefix used to give, without importing uuid
+    return f"product_{int(datetime.now().timestamp() * 1000)}_{os.urandom(4).hex()}"
+
+
+def product_key(product):
+    """Return the primary key of a product (_id, falling back to id)"""
+    return product.get('_id') or product.get('id')
+
+
+def as_dict(product):
+    """Return a product as a plain dict (records may be read-only mappings)"""
+    return product if isinstance(product, dict) else dict(product)
+
+
+def _to_number(value):
+    """Convert a price/stock value to a float, or None if it is not numeric"""
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        return float(str(value).replace('₹', '').replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+
+
+def stock_level(product):
+    """Return a product's stock as a number, or None if it is missing or not numeric"""
+    return _to_number(product.get('stock'))
+
+
+def price_level(product):
+    """Return a product's price as a number, or None if it is missing or not numeric"""
+    return _to_number(product.get('price'))
+
+
+def product_status(product):
+    """Return the status shown for a product: Inactive, Active or Out of Stock"""
+    if product.get('isActive') is False:
+        return 'Inactive'
+    stock = stock_level(product)
+    return 'Active' if stock and stock > 0 else 'Out of Stock'
+
+
+def _convert_number(field, value):
+    """Convert a price/stock value from a form or import to a number"""
+    if isinstance(value, bool):
+        raise ValidationError(f"Invalid {field}: {value}")
+    if field == 'stock' and isinstance(value, float):
+        if value.is_integer():
+            return int(value)
+        raise ValidationError(f"Invalid {field}: {value}")
+    try:
+        return float(value) if field == 'price' else int(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"Invalid {field}: {value}")
+
+
+def validate_product(product_data):
+    """Check a product against the catalog rules and return a normalized copy
+    
+    Shared by the add/edit form and bulk imports so both enforce the same
+    rules: price and stock are converted to numbers, the required fields
+    must be filled in, and productType decides the category/subcategory.
+    Raises ValidationError describing the first problem found.
+    
+    This changes the form's old check, which treated any falsy value as
+    missing and so refused a price or stock of 0; 0 is now accepted (an
+    out-of-stock product is stock 0) and only empty values are refused.
+    """
+    product = dict(product_data)
+    for field in ('price', 'stock'):
+        if product.get(field) not in (None, ''):
+            product[field] = _convert_number(field, product[field])
+
+    for field in REQUIRED_FIELDS:
+        if product.get(field) in (None, ''):
+            raise ValidationError(f"Field '{field}' is required")
+
+    # Auto-set subcategory based on productType
+    if product['productType'] == 'fulkari':
+        product['category'] = 'fulkari'
+        product['subcategory'] = 'fulkari'
+    else:
+        product['subcategory'] = 'jutti'
+    return product
+
+
+def _to_timestamp(value):
+    """Convert an ISO timestamp (with or without Z/offset) to epoch seconds"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # Naive timestamps written by the manager are taken as local time
+    return parsed.timestamp()
+
+
+def sort_value(product, field):
+    """Return a typed sort key for one field of a product
+    
+    Keys are (rank, value) tuples so that products missing the field, or
+    holding a value of the wrong type, sort after all valid values instead
+    of raising on comparison.
+    """
+    if field == 'status':
+        return (0, product_status(product))
+
+    value = product.get(field)
+    if value is None or value == '':
+        return (2, '')
+    if field in NUMERIC_FIELDS:
+        number = _to_number(value)
+        return (0, number) if number is not None else (1, str(value))
+    if field in TIMESTAMP_FIELDS:
+        timestamp = _to_timestamp(value)
+        return (0, timestamp) if timestamp is not None else (1, str(value))
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return (0, str(value).casefold())
+
+
+def decode_catalog(data):
+    """Return the products list from decoded products.json content"""
+    # The Node sync servers store a bare array, the manager wraps it
+    if isinstance(data, list):
+        return data
+    return data.get('products', [])
+
+
+def load_catalog(products_file):
+    """Load the products list from a JSON file, creating an empty one if missing"""
+    if not os.path.exists(products_file):
+        save_catalog(products_file, [])
+        return []
+
+    with open(products_file, 'r', encoding='utf-8') as f:
+        return decode_catalog(json.load(f))
+
+
+def encode_catalog(products, compact=False):
+    """Encode products as products.json bytes, returning (data, count)
+    
+    Output is byte-for-byte what json.dumps({"products": [...]}) produces,
+    but records are encoded one at a time, so `products` may be a generator
+    that materializes each record only while it is being written.
+    """
+    if compact:
+        parts = [json.dumps(as_dict(p), ensure_ascii=False, separators=(',', ':')) for p in products]
+        text = '{"products":[' + ','.join(parts) + ']}'
+    else:
+        # JSON strings never contain a raw newline, so re-indenting is safe
+        parts = [json.dumps(as_dict(p), indent=2, ensure_ascii=False).replace('\n', '\n    ') for p in products]
+        if parts:
+            text = '{\n  "products": [\n    ' + ',\n    '.join(parts) + '\n  ]\n}'
+        else:
+            text = '{\n  "products": []\n}'
+    return text.encode('utf-8'), len(parts)
+
+
+def save_catalog(products_file, products, backups=None, compact=False, lock=True):
+    """Save the products list to a JSON file, returning the backup snapshot (if any)
+    
+    The file is replaced atomically under a cross-process lock, so a crash
+    mid-save never leaves a truncated products.json behind. `compact` drops
+    the indentation, which makes large catalogs much smaller and faster to
+    write. `backups` is an optional product_backup.BackupStore; it records
+    the saved content only when it differs from the newest snapshot. Pass
+    lock=False when the caller already holds the FileLock.
+    """
+    with metrics.timer('save.encode'):
+        data, count = encode_catalog(products, compact=compact)
+    metrics.incr('save.products', count)
+    metrics.incr('save.bytes', len(data))
+
+    with FileLock(products_file) if lock else contextlib.nullcontext():
+        snapshot = None
+        if backups is not None:
+            with metrics.timer('save.backup'):
+                # Keep anything written by someone else since our last save
+                backups.capture_file(products_file)
+                snapshot = backups.snapshot(data, count=count)
+
+        with metrics.timer('save.replace'):
+            atomic_write_bytes(products_file, data)
+
+        if backups is not None:
+            backups.remember_file(products_file)
+
+    return snapshot
+
+
+class CatalogSnapshot:
+    """Point-in-time list of products that materializes partial records on iteration"""
+
+    def __init__(self, items, materialize):
+        self._items = items
+        self._materialize = materialize
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for key, record, partial in self._items:
+            yield self._materialize(key) if partial else record
+
+
+class ProductStore:
+    """In-memory product catalog indexed by ID and category fields
+
+    Products are kept in insertion order in a dict keyed on their primary
+    key, so lookups, updates and deletes are O(1). Both `_id` and `id` are
+    accepted as lookup keys, matching what the GUI has always compared.
+
+    Listeners registered with subscribe() are called as
+    `listener(op, key, old, new)` after every add, update and delete, and
+    with op 'reset' (key/old/new None) after replace_all().
+
+    Products can be added as partial records (see product_loader.summary)
+    together with a `materialize(key)` callback that returns the full
+    record. get() and all() always return full records; peek(), filter()
+    and sorting work on whatever is held in memory.
+    """
+
+    def __init__(self, products=None, materialize=None):
+        self._listeners = []
+        self._materialize = materialize
+        self.replace_all(products or [])
+
+    def subscribe(self, listener):
+        """Register a change listener"""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        """Remove a change listener"""
+        self._listeners.remove(listener)
+
+    def _notify(self, op, key, old, new):
+        for listener in list(self._listeners):
+            listener(op, key, old, new)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __contains__(self, product_id):
+        return self._resolve(product_id) is not None
+
+    def all(self):
+        """Return all products in catalog order"""
+        return list(self.iter_full())
+
+    def iter_full(self):
+        """Iterate full products in catalog order without keeping them in memory"""
+        return iter(self.snapshot())
+
+    def snapshot(self):
+        """Return a re-iterable, sized view of the catalog as it is now
+
+        Only references are captured, so this is cheap, and the view can be
+        consumed on a worker thread while the catalog keeps changing.
+        """
+        items = [(key, record, key in self._partial) for key, record in self._records.items()]
+        return CatalogSnapshot(items, self._materialize)
+
+    def keys(self):
+        """Return all primary keys in catalog order"""
+        return list(self._records)
+
+    def _resolve(self, product_id):
+        """Map an _id or id value to the primary key used internally"""
+        if product_id is None:
+            return None
+        key = self._aliases.get(product_id)
+        if key is None and not isinstance(product_id, str):
+            # Treeview hands numeric-looking IDs back as ints
+            key = self._aliases.get(str(product_id))
+        return key
+
+    def _index(self, key, product):
+        """Add a product to the alias and secondary indexes"""
+        for alias in (product.get('_id'), product.get('id')):
+            if alias:
+                self._aliases[alias] = key
+        for field, index in self._indexes.items():
+            value = product.get(field)
+            if isinstance(value, (str, int, float, bool)) or value is None:
+                index.setdefault(value, {})[key] = None
+
+    def _unindex(self, key, product):
+        """Remove a product from the alias and secondary indexes"""
+        for alias in (product.get('_id'), product.get('id')):
+            if alias and self._aliases.get(alias) == key:
+                del self._aliases[alias]
+        for field, index in self._indexes.items():
+            value = product.get(field)
+            if isinstance(value, (str, int, float, bool)) or value is None:
+                bucket = index.get(value)
+                if bucket is not None:
+                    bucket.pop(key, None)
+                    if not bucket:
+                        del index[value]
+
+    def get(self, product_id):
+        """Return the full product with the given _id or id, or None"""
+        key = self._resolve(product_id)
+        if key is None:
+            return None
+        if key in self._partial:
+            self._records[key] = self._materialize(key)
+            self._partial.discard(key)
+        return self._records[key]
+
+    def lookup(self, product_id):
+        """Return the full product like get(), without keeping it materialized
+
+        Only reads the store, so a worker thread may call it while the GUI
+        thread keeps editing; the result may then already be out of date.
+        """
+        key = self._resolve(product_id)
+        if key is None:
+            return None
+        if key in self._partial:
+            return self._materialize(key)
+        return self._records.get(key)
+
+    def peek(self, product_id):
+        """Return the product as held in memory, which may be a partial record"""
+        key = self._resolve(product_id)
+        return self._records.get(key) if key is not None else None
+
+    def is_partial(self, product_id):
+        """True if only a summary of the product is in memory"""
+        return self._resolve(product_id) in self._partial
+
+    def add(self, product, partial=False):
+        """Add a product, generating an ID if it has none"""
+        key = product_key(product)
+        if not key:
+            key = generate_product_id()
+            product['_id'] = key
+            product['id'] = key
+        if key in self._records or self._resolve(product.get('id')) is not None:
+            raise ValueError(f"Product '{key}' already exists")
+
+        self._records[key] = product
+        self._index(key, product)
+        if partial:
+            self._partial.add(key)
+        self._notify('add', key, None, product)
+        return product
+
+    def create(self, product_data):
+        """Create a new product with a fresh ID and timestamps"""
+        product = dict(product_data)
+        product['_id'] = generate_product_id()
+        product['id'] = product['_id']
+        now = datetime.now().isoformat()
+        product['createdAt'] = now
+        product['updatedAt'] = now
+        return self.add(product)
+
+    def update(self, product_id, changes, touch=True):
+        """Merge changes into an existing product and return the new record"""
+        key = self._resolve(product_id)
+        if key is None:
+            raise KeyError(product_id)
+
+        old = self.get(key)
+        updated = {**old, **changes}
+        if touch:
+            updated['updatedAt'] = datetime.now().isoformat()
+
+        self._replace(key, old, updated)
+        return updated
+
+    def put(self, product, load=True):
+        """Insert a product or replace the stored record with the same ID
+        
+        With load=False a partial record being replaced is not read from
+        disk first, and listeners get it as `old` in its partial form.
+        """
+        key = self._resolve(product_key(product))
+        if key is None:
+            return self.add(product)
+
+        old = self.get(key) if load else self._records[key]
+        self._replace(key, old, product)
+        return product
+
+    def _replace(self, key, old, new):
+        """Swap the record stored under key and re-index it"""
+        self._unindex(key, old)
+        self._records[key] = new
+        self._index(key, new)
+        self._partial.discard(key)
+        self._forget_sort_values(key)
+        self._notify('update', key, old, new)
+
+    def delete(self, product_id, load=True):
+        """Remove a product and return it, or None if it does not exist
+        
+        With load=False a partial record is not read from disk first and is
+        returned (and passed to listeners) in its partial form.
+        """
+        key = self._resolve(product_id)
+        if key is None:
+            return None
+
+        product = self.get(key) if load else self._records[key]
+        del self._records[key]
+        self._partial.discard(key)
+        self._unindex(key, product)
+        self._forget_sort_values(key)
+        self._notify('delete', key, product, None)
+        return product
+
+    def replace_all(self, products):
+        """Replace the whole catalog"""
+        listeners, self._listeners = self._listeners, []
+        try:
+            self._records = {}
+            self._aliases = {}
+            self._indexes = {field: {} for field in INDEXED_FIELDS}
+            self._sort_cache = {}
+            self._partial = set()
+
+            for product in products:
+                # Duplicate IDs in a hand-edited file: the last record wins
+                self.delete(product_key(product))
+                self.add(product)
+        finally:
+            self._listeners = listeners
+        self._notify('reset', None, None, None)
+
+    def filter(self, **criteria):
+        """Return products matching all indexed field criteria, e.g. filter(category='men')
+        
+        Records are returned as held in memory and may be partial.
+        """
+        keys = None
+        for field, value in criteria.items():
+            if field not in self._indexes:
+                raise ValueError(f"Field '{field}' is not indexed")
+            bucket = self._indexes[field].get(value, {})
+            if keys is None:
+                keys = list(bucket)
+            else:
+                keys = [k for k in keys if k in bucket]
+            if not keys:
+                return []
+
+        if keys is None:
+            return self.all()
+        return [self._records[k] for k in keys]
+
+    def facet_counts(self, field):
+        """Return {value: count} for an indexed field"""
+        if field not in self._indexes:
+            raise ValueError(f"Field '{field}' is not indexed")
+        return {value: len(bucket) for value, bucket in self._indexes[field].items()}
+
+    def _forget_sort_values(self, key):
+        """Drop cached sort keys for a product that changed"""
+        for cache in self._sort_cache.values():
+            cache.pop(key, None)
+
+    def sort_keys(self, keys, spec):
+        """Sort product keys by [(field, descending), ...], most significant first
+
+        Typed sort values are cached per field and only recomputed for
+        products that changed since the last sort. Each field is applied as
+        a stable sort, least significant first, giving a stable multi-column
+        order.
+        """
+        keys = list(keys)
+        for field, descending in reversed(spec):
+            cache = self._sort_cache.setdefault(field, {})
+            for key in keys:
+                if key not in cache:
+                    cache[key] = sort_value(self._records[key], field)
+            keys.sort(key=cache.__getitem__, reverse=descending)
+        return keys
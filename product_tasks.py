@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store Background Tasks
+Small thread-pool scheduler that keeps slow file work off the Tk event thread
+
+Work is submitted as `fn(task, *args)` and runs on a pool thread. Everything
+the caller gets back (progress, published items, the result or the error)
+is delivered on the GUI thread through the `schedule(delay_ms, callback)`
+function it was created with, normally `root.after`, so callbacks may touch
+widgets and the ProductStore freely.
+
+Tasks that share a `group` (e.g. everything that writes products.json) run
+one at a time in submission order; tasks in different groups run in
+parallel. Long tasks call task.report() to show progress and
+task.check_cancelled() to stop early once cancel() was requested.
+"""
+
+import itertools
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# How often finished work is collected on the GUI thread
+POLL_MS = 50
+
+DEFAULT_WORKERS = 3
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task that was asked to stop"""
+
+
+class Task:
+    """One unit of background work and its progress"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, executor, name, fn, args, group=None, cancellable=True, on_done=None,
+                 on_error=None, on_progress=None, on_publish=None, on_cancelled=None):
+        self.id = next(self._ids)
+        self.executor = executor
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.group = group
+        self.cancellable = cancellable
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.on_publish = on_publish
+        self.on_cancelled = on_cancelled
+
+        # 'waiting', 'running', 'done', 'failed' or 'cancelled'
+        self.state = 'waiting'
+        self.done = 0
+        self.total = None
+        self.message = ''
+        self.result = None
+        self.error = None
+
+        self._cancel = threading.Event()
+        self._progress_queued = False
+
+    def cancel(self):
+        """Ask the task to stop at its next check_cancelled()"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def cancel_event(self):
+        """threading.Event set on cancel(), for code that takes a cancel Event"""
+        return self._cancel
+
+    def check_cancelled(self):
+        """Raise TaskCancelled if cancel() was called (worker thread)"""
+        if self._cancel.is_set():
+            raise TaskCancelled(f"{self.name} cancelled")
+
+    def report(self, done, total=None, message=None):
+        """Update progress (worker thread); updates are coalesced for the GUI"""
+        self.done = done
+        self.total = total
+        if message is not None:
+            self.message = message
+        if not self._progress_queued:
+            self._progress_queued = True
+            self.executor._events.put(('progress', self, None))
+
+    def publish(self, item):
+        """Hand an intermediate result to on_publish on the GUI thread, in order"""
+        self.executor._events.put(('publish', self, item))
+
+    def describe(self):
+        """Short status text such as 'Saving products... 40%'"""
+        text = self.message or self.name
+        if self.total:
+            return f"{text}... {int(100 * self.done / self.total)}%"
+        if self.done:
+            return f"{text}... {self.done}"
+        return f"{text}..."
+
+
+class TaskExecutor:
+    """Runs Tasks on a thread pool and reports back on the GUI thread"""
+
+    def __init__(self, schedule, workers=DEFAULT_WORKERS, on_change=None):
+        self.schedule = schedule
+        self.on_change = on_change
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='product-task')
+        self._events = queue.Queue()
+        self._waiting = deque()
+        self._busy_groups = set()
+        self.active = []
+        self._polling = False
+
+    def submit(self, name, fn, *args, group=None, cancellable=True, **callbacks):
+        """Queue fn(task, *args) and return its Task
+
+        Tasks submitted with cancellable=False (saves, loads) are left alone
+        by cancel_all(). Callbacks (all optional, all run on the GUI thread):
+        on_done(task, result), on_error(task, error), on_cancelled(task),
+        on_progress(task) and on_publish(task, item).
+        """
+        task = Task(self, name, fn, args, group=group, cancellable=cancellable, **callbacks)
+        self.active.append(task)
+        self._waiting.append(task)
+        self._start_ready()
+        self._changed()
+        if not self._polling:
+            self._polling = True
+            self.schedule(POLL_MS, self._poll)
+        return task
+
+    def busy(self, group=None):
+        """True if any task (of the given group) is waiting or running"""
+        # A finished task stays in `active` while its callback runs
+        return any(task.state in ('waiting', 'running') and (group is None or task.group == group)
+                   for task in self.active)
+
+    def cancel_all(self):
+        """Cancel every cancellable task; returns how many were asked to stop"""
+        tasks = [task for task in self.active if task.cancellable]
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    def shutdown(self, wait=True):
+        """Cancel what has not started and stop the pool"""
+        for task in self._waiting:
+            task.cancel()
+        self._pool.shutdown(wait=wait)
+
+    def _start_ready(self):
+        """Start waiting tasks whose group is free, keeping per-group order"""
+        blocked = set()
+        still_waiting = deque()
+        for task in self._waiting:
+            if task.group is not None and (task.group in self._busy_groups or task.group in blocked):
+                blocked.add(task.group)
+                still_waiting.append(task)
+                continue
+            if task.group is not None:
+                self._busy_groups.add(task.group)
+            task.state = 'running'
+            self._pool.submit(self._run, task)
+        self._waiting = still_waiting
+
+    def _run(self, task):
+        """Worker thread: run the task and queue its outcome"""
+        try:
+            if task.cancelled:
+                raise TaskCancelled(f"{task.name} cancelled")
+            result = task.fn(task, *task.args)
+        except TaskCancelled:
+            self._events.put(('cancelled', task, None))
+        except Exception as e:
+            self._events.put(('failed', task, e))
+        else:
+            self._events.put(('done', task, result))
+
+    def _poll(self):
+        """GUI thread: deliver queued events, then poll again while busy"""
+        try:
+            while True:
+                kind, task, value = self._events.get_nowait()
+                if kind == 'progress':
+                    task._progress_queued = False
+                    if task.state == 'running':
+                        if task.on_progress:
+                            task.on_progress(task)
+                        self._changed()
+                elif kind == 'publish':
+                    if task.on_publish:
+                        task.on_publish(task, value)
+                else:
+                    self._finish(task, kind, value)
+        except queue.Empty:
+            pass
+        finally:
+            # Keep polling even if a callback raised
+            if self.active:
+                self.schedule(POLL_MS, self._poll)
+            else:
+                self._polling = False
+
+    def _finish(self, task, state, value):
+        task.state = state
+        # The callback runs before the group is freed, so the next task of the
+        # group sees whatever it changed (e.g. the signature of a save)
+        try:
+            if state == 'done':
+                task.result = value
+                if task.on_done:
+                    task.on_done(task, value)
+            elif state == 'failed':
+                task.error = value
+                if task.on_error:
+                    task.on_error(task, value)
+            elif task.on_cancelled:
+                task.on_cancelled(task)
+        finally:
+            self.active.remove(task)
+            if task.group is not None:
+                self._busy_groups.discard(task.group)
+            self._start_ready()
+            self._changed()
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change(self)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Punjabi E-commerce Store File Watcher
+Notices when another program (e.g. a Node sync server) changes products.json
+
+On Linux the data directory is watched with inotify (through ctypes, no
+extra packages), so an idle catalog costs one non-blocking read() per tick.
+Elsewhere, or if inotify is unavailable, the file is stat()ed on a slower
+timer instead. The directory rather than the file is watched because an
+atomic save replaces the file with a new inode.
+
+A change is reported only once the file's signature (inode, size, mtime)
+has stopped changing for SETTLE_MS, so a writer that rewrites the file in
+place is not caught halfway, and only if it differs from the signature
+last passed to remember() - the manager's own saves are not reported.
+Like product_tasks, the watcher runs from `schedule(delay_ms, callback)`
+(normally root.after), so on_change is called on the GUI thread.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import time
+
+# How often inotify events are collected, and how often stat() polls run
+WATCH_INTERVAL_MS = 250
+POLL_INTERVAL_MS = 1000
+
+# How long the file must stay unchanged before a change is reported
+SETTLE_MS = 300
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+
+def file_signature(path):
+    """Return (inode, size, mtime_ns) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class Inotify:
+    """Minimal non-blocking inotify watch on one directory"""
+
+    def __init__(self, directory, mask=_WATCH_MASK):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, os.strerror(errno), directory)
+
+    def read_names(self):
+        """Return the set of file names with pending events (None: events were lost)"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                if mask & IN_Q_OVERFLOW:
+                    names.add(None)
+                names.add(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+                offset += length
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Calls on_change(signature) on the GUI thread when a file is changed by someone else"""
+
+    def __init__(self, path, schedule, on_change, paused=None, use_inotify=True):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.schedule = schedule
+        self.on_change = on_change
+        # Checks are skipped while paused() is true, e.g. during our own save
+        self.paused = paused
+        self.known = file_signature(path)
+
+        self.inotify = None
+        if use_inotify:
+            try:
+                self.inotify = Inotify(os.path.dirname(os.path.abspath(path)))
+            except (OSError, AttributeError):
+                # Not Linux, no libc, or out of inotify watches: poll instead
+                self.inotify = None
+
+        # Set when inotify saw the file change; polling always looks
+        self._dirty = True
+        # Signature waiting to settle, and when it was first seen
+        self._pending = None
+        self._pending_since = 0.0
+        self._running = False
+
+    @property
+    def mode(self):
+        return 'inotify' if self.inotify is not None else 'polling'
+
+    @property
+    def interval(self):
+        return WATCH_INTERVAL_MS if self.inotify is not None else POLL_INTERVAL_MS
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.schedule(self.interval, self._tick)
+
+    def stop(self):
+        self._running = False
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def remember(self, signature=None):
+        """Treat the file as it is now (or the given signature) as known, i.e. not a change"""
+        self.known = file_signature(self.path) if signature is None else signature
+        self._pending = None
+
+    def check(self):
+        """Return the new signature if the file changed and has settled, else None"""
+        if self.inotify is not None:
+            names = self.inotify.read_names()
+            if self.name in names or None in names:
+                self._dirty = True
+            if not self._dirty and self._pending is None:
+                return None
+
+        signature = file_signature(self.path)
+        if signature is None or signature == self.known:
+            # A missing file is recreated by the next save, not merged
+            self._dirty = self.inotify is None
+            self._pending = None
+            return None
+
+        now = time.monotonic()
+        if signature != self._pending:
+            self._pending = signature
+            self._pending_since = now
+            self._dirty = self.inotify is None
+            return None
+        if (now - self._pending_since) * 1000 < SETTLE_MS:
+            return None
+
+        self._dirty = self.inotify is None
+        self._pending = None
+        return signature
+
+    def _tick(self):
+        if not self._running:
+            return
+        try:
+            if not (self.paused and self.paused()):
+                signature = self.check()
+                if signature is not None:
+                    self.on_change(signature)
+        finally:
+            if self._running:
+                self.schedule(self.interval, self._tick)
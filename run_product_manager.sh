@@ -1,15 +1,16 @@
 #!/bin/bash
 
 # Punjabi E-commerce Store Product Manager Launcher
-echo "🚀 Starting Punjabi E-commerce Store Product Manager..."
+# Messages go to stderr so CLI output (./run_product_manager.sh list) can be piped
+echo "🚀 Starting Punjabi E-commerce Store Product Manager..." >&2
 
 # Check if Python 3 is available
 if command -v python3 &> /dev/null; then
-    echo "✅ Python 3 found"
-    python3 product_manager.py
+    echo "✅ Python 3 found" >&2
+    python3 product_manager.py "$@"
 elif command -v python &> /dev/null; then
-    echo "✅ Python found"
-    python product_manager.py
+    echo "✅ Python found" >&2
+    python product_manager.py "$@"
 else
     echo "❌ Error: Python not found. Please install Python 3."
     echo "   On macOS: brew install python3"
@@ -0,0 +1,11 @@
+"""
+Shared fixtures for the product manager tests
+
+The product_*.py modules live at the repository root, so it is put on the
+import path here; the tests only touch files under pytest's tmp_path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from product_backends import JsonBackend, SqliteBackend
+from product_manager import main
+from product_store import save_catalog
+
+CATEGORIES = ('men', 'women', 'kids')
+
+
+def generated(count, seed=0):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        products.append({
+            '_id': f'product_{i}', 'id': f'product_{i}',
+            'name': f'Jutti {i}', 'punjabiName': f'ਜੁੱਤੀ {i}',
+            'category': rng.choice(CATEGORIES), 'productType': rng.choice(('jutti', 'fulkari')),
+            'price': rng.choice((1499, 1499.5, 999.0)),
+            'stock': rng.choice((0, 3, 25, -1, '7')),
+            'sizes': rng.sample(['UK 6', 'UK 7', 'UK 8', 'UK 9'], 2),
+            'isActive': rng.random() < 0.9,
+        })
+    # What hand edits and the Node servers leave behind
+    products[3]['extra'] = {'nested': [1, 'two', None]}
+    del products[5]['stock']
+    return products
+
+
+@pytest.fixture
+def catalogs(tmp_path):
+    source = str(tmp_path / 'products.json')
+    save_catalog(source, generated(300))
+    database = SqliteBackend(str(tmp_path / 'db' / 'products.db'))
+    assert database.migrate_json(source) == 300
+    yield source, JsonBackend(source), database
+    database.close()
+
+
+def test_export_json_matches_the_migrated_file(catalogs, tmp_path):
+    source, _, database = catalogs
+    exported = str(tmp_path / 'exported.json')
+    assert database.export_json(exported) == 300
+    with open(source, 'rb') as f, open(exported, 'rb') as g:
+        assert f.read() == g.read()
+
+
+def test_cli_migrate_and_export_json_round_trip(tmp_path):
+    source = str(tmp_path / 'products.json')
+    save_catalog(source, generated(50, seed=2))
+    db = str(tmp_path / 'products.db')
+    exported = str(tmp_path / 'exported.json')
+    assert main(['--file', source, '--db', db, 'migrate']) == 0
+    assert main(['--file', source, '--db', db, 'migrate']) == 1
+    assert main(['--backend', 'sqlite', '--db', db, 'export-json', exported]) == 0
+    with open(source, 'rb') as f, open(exported, 'rb') as g:
+        assert f.read() == g.read()
+
+
+@pytest.mark.parametrize('criteria', [
+    {},
+    {'category': 'women'},
+    {'product_type': 'fulkari'},
+    {'category': 'kids', 'product_type': 'jutti'},
+    {'out_of_stock': True},
+])
+def test_queries_agree(catalogs, criteria):
+    _, json_backend, database = catalogs
+    assert database.query(**criteria) == json_backend.query(**criteria)
+
+
+def test_edits_agree(catalogs):
+    _, json_backend, database = catalogs
+    for backend in (json_backend, database):
+        with backend.transaction() as store:
+            store.update('product_1', {'stock': 0}, touch=False)
+            store.delete('product_2')
+            store.put({'_id': 'new', 'id': 'new', 'name': 'New', 'category': 'men', 'stock': 1})
+    assert database.all() == json_backend.all()
+    assert database.get('new') == json_backend.get('new')
+    assert database.get('product_2') is None
+
+
+def test_failed_transaction_changes_nothing(catalogs):
+    _, json_backend, database = catalogs
+    for backend in (json_backend, database):
+        with pytest.raises(RuntimeError):
+            with backend.transaction() as store:
+                store.delete('product_1')
+                raise RuntimeError("abort")
+        assert backend.get('product_1') is not None
@@ -0,0 +1,134 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+import product_backup
+from product_backup import BackupStore
+
+
+class Clock(datetime):
+    """datetime whose now() the test sets"""
+
+    current = datetime(2025, 8, 1, 10, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(product_backup, 'datetime', Clock)
+    return Clock
+
+
+def catalog(*products):
+    return json.dumps({'products': list(products)}).encode('utf-8')
+
+
+def objects(store):
+    return sorted(name for _, _, names in os.walk(store.objects_dir) for name in names)
+
+
+def test_identical_content_is_stored_once(tmp_path, clock):
+    store = BackupStore(str(tmp_path))
+    first = store.snapshot(catalog({'id': 'p1'}), count=1, note='first')
+    assert first['note'] == 'first' and first['products'] == 1
+    assert store.snapshot(catalog({'id': 'p1'})) is None
+
+    clock.current = datetime(2025, 8, 1, 10, 5)
+    store.snapshot(catalog({'id': 'p2'}))
+    clock.current = datetime(2025, 8, 1, 10, 10)
+    again = store.snapshot(catalog({'id': 'p1'}))
+    # Back to an earlier version: a new entry, but no new object
+    assert again['hash'] == first['hash']
+    assert len(store.list_snapshots()) == 3
+    assert len(objects(store)) == 2
+    assert store.load_snapshot(again['id']) == [{'id': 'p1'}]
+
+
+def test_retention_keeps_last_hourly_and_daily(tmp_path, clock):
+    store = BackupStore(str(tmp_path), keep_last=2, keep_hourly=3, keep_daily=2)
+    times = [
+        datetime(2025, 8, 1, 10, 0), datetime(2025, 8, 1, 10, 30),
+        datetime(2025, 8, 2, 9, 0), datetime(2025, 8, 2, 11, 0),
+        datetime(2025, 8, 2, 11, 30), datetime(2025, 8, 2, 12, 0),
+    ]
+    for number, when in enumerate(times):
+        clock.current = when
+        store.snapshot(catalog({'id': 'p1', 'stock': number}))
+
+    kept = [datetime.fromisoformat(s['created']) for s in store.list_snapshots()]
+    # Two newest, then the newest of hours 12, 11 and 9, then of days 2 and 1
+    assert kept == [times[1], times[2], times[4], times[5]]
+    assert len(objects(store)) == 4
+
+
+def test_diff_by_product_id(tmp_path, clock):
+    store = BackupStore(str(tmp_path))
+    old = store.snapshot(catalog({'id': 'p1', 'stock': 1}, {'id': 'p2'}, {'_id': 'p3'}))
+    clock.current = datetime(2025, 8, 1, 11, 0)
+    new = store.snapshot(catalog({'id': 'p1', 'stock': 0}, {'_id': 'p3'}, {'id': 'p4'}))
+    assert store.diff(old['id'], new['id']) == {'added': ['p4'], 'removed': ['p2'], 'changed': ['p1']}
+    with pytest.raises(KeyError):
+        store.diff(old['id'], 'missing')
+
+
+def test_restore_keeps_the_replaced_file(tmp_path, clock):
+    store = BackupStore(str(tmp_path / 'backups'))
+    path = str(tmp_path / 'products.json')
+    with open(path, 'wb') as f:
+        f.write(catalog({'id': 'old'}))
+    entry = store.capture_file(path)
+    with open(path, 'wb') as f:
+        f.write(catalog({'id': 'edited by hand'}))
+
+    clock.current = datetime(2025, 8, 1, 11, 0)
+    store.restore(entry['id'], path)
+    with open(path, 'rb') as f:
+        assert f.read() == catalog({'id': 'old'})
+    assert [s['note'] for s in store.list_snapshots()] == ['external change', 'external change']
+
+
+def test_legacy_copies_become_snapshots(tmp_path, clock):
+    clock.current = datetime(2025, 8, 20, 10, 0)
+    store = BackupStore(str(tmp_path), keep_last=3, keep_hourly=0, keep_daily=0)
+    store.snapshot(catalog({'id': 'current'}))
+    for stamp, product_id in (('20250801_090000', 'a'), ('20250802_090000', 'b'), ('20250803_090000', 'c')):
+        with open(tmp_path / f'products_backup_{stamp}.json', 'wb') as f:
+            f.write(catalog({'id': product_id}))
+    with open(tmp_path / 'products_backup_20250804_090000.json', 'wb') as f:
+        f.write(b'not json')
+
+    assert store.migrate_legacy() == 4
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('products_backup_')]
+    snapshots = store.list_snapshots()
+    # Sorted in by date, then pruned like any other snapshot
+    assert [s['created'] for s in snapshots] == ['2025-08-03T09:00:00', '2025-08-04T09:00:00',
+                                                 '2025-08-20T10:00:00']
+    assert [s['note'] for s in snapshots] == ['legacy backup', 'legacy backup', '']
+    assert store.load_snapshot(snapshots[0]['id']) == [{'id': 'c'}]
+    assert store.read_snapshot(snapshots[1]['id']) == b'not json'
+    assert snapshots[1]['products'] is None
+    assert len(objects(store)) == 3
+    assert store.migrate_legacy() == 0
+
+
+def test_cli_diff(tmp_path, clock, capsys):
+    from product_manager import main
+
+    store = BackupStore(str(tmp_path / 'backups'))
+    old = store.snapshot(catalog({'id': 'p1'}, {'id': 'p2'}))
+    clock.current = datetime(2025, 8, 1, 11, 0)
+    store.snapshot(catalog({'id': 'p1', 'stock': 3}, {'id': 'p3'}))
+    products_file = str(tmp_path / 'products.json')
+
+    assert main(['--file', products_file, 'backup', '--diff', old['id']]) == 0
+    out, err = capsys.readouterr()
+    assert [json.loads(line) for line in out.splitlines()] == [
+        {'id': 'p3', 'change': 'added'}, {'id': 'p2', 'change': 'removed'}, {'id': 'p1', 'change': 'changed'}]
+    assert '1 added, 1 removed, 1 changed' in err
+    assert main(['--file', products_file, 'backup', '--diff', old['id'], 'missing']) == 1
+    assert main(['--file', products_file, 'backup', '--diff', 'a', 'b', 'c']) == 1
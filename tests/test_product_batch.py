@@ -0,0 +1,76 @@
+import pytest
+
+from product_batch import BatchEdit, parse_adjustment, revert
+from product_store import ProductStore, ValidationError
+
+
+def product(key, **fields):
+    return {'_id': key, 'id': key, 'name': f'Jutti {key}', 'category': 'men', 'productType': 'jutti',
+            'price': 1499, 'stock': 5, 'isActive': True, **fields}
+
+
+@pytest.fixture
+def store():
+    return ProductStore([product('p1'), product('p2', price=999.99, stock=2), product('p3', stock=0)])
+
+
+def test_adjustments_are_parsed_as_typed():
+    assert parse_adjustment('+10%') == ('percent', 10.0)
+    assert parse_adjustment('-5.5%') == ('percent', -5.5)
+    assert parse_adjustment('₹1,499') == ('set', 1499.0)
+    assert parse_adjustment('= 1499') == ('set', 1499.0)
+    assert parse_adjustment('-2', 'stock') == ('add', -2)
+    assert parse_adjustment('  ') is None
+
+    for text, field in (('10%', 'price'), ('+10%', 'stock'), ('=-1', 'price'), ('=-1', 'stock'),
+                        ('1.5', 'stock'), ('cheap', 'price')):
+        with pytest.raises(ValidationError):
+            parse_adjustment(text, field)
+
+
+def test_percentages_round_to_paise(store):
+    batch = BatchEdit(store, price=parse_adjustment('+10%')).plan(['p1', 'p2'])
+    assert batch.changes['p1'][1]['price'] == 1648.9
+    # 999.99 * 1.1 = 1099.989
+    assert batch.changes['p2'][1]['price'] == 1099.99
+    assert isinstance(batch.changes['p1'][1]['price'], float)
+
+    batch = BatchEdit(store, stock=parse_adjustment('+3', 'stock')).plan(['p1'])
+    assert batch.changes['p1'][1]['stock'] == 8 and isinstance(batch.changes['p1'][1]['stock'], int)
+
+
+def test_negative_stock_is_refused_and_nothing_applied(store):
+    batch = BatchEdit(store, stock=parse_adjustment('-3', 'stock')).plan(store.keys())
+    assert [key for key, _ in batch.errors] == ['p2', 'p3']
+    assert 'negative' in batch.errors[0][1]
+    assert list(batch.changes) == ['p1']
+    with pytest.raises(ValidationError):
+        batch.apply()
+    assert [store.get(key)['stock'] for key in store.keys()] == [5, 2, 0]
+
+
+def test_plan_is_a_dry_run_and_apply_writes(store):
+    batch = BatchEdit(store, price=('set', 1299.0), active=False).plan(store.keys() + ['missing'])
+    assert batch.summary() == "3 products to change, 0 unchanged, 0 with errors"
+    assert any('price: 1499 -> 1299.0' in line for line in batch.describe())
+    assert store.get('p1')['price'] == 1499 and store.get('p1')['isActive']
+
+    changes = batch.apply()
+    assert [key for key, _, _ in changes] == ['p1', 'p2', 'p3']
+    assert {store.get(key)['price'] for key in store.keys()} == {1299.0}
+    assert not any(store.get(key)['isActive'] for key in store.keys())
+
+    # Reverting leaves products edited since as they are
+    store.update('p2', {'stock': 9})
+    assert revert(store, changes) == ['p2']
+    assert store.get('p1')['price'] == 1499 and store.get('p2')['price'] == 1299.0
+
+
+def test_unchanged_products_and_deletes(store):
+    batch = BatchEdit(store, active=True).plan(store.keys())
+    assert (batch.changes, batch.unchanged) == ({}, 3)
+
+    batch = BatchEdit(store, delete=True).plan(['p3'])
+    assert batch.label() == 'delete'
+    batch.apply()
+    assert store.keys() == ['p1', 'p2']
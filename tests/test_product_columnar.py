@@ -0,0 +1,102 @@
+import json
+
+from product_backends import open_backend
+from product_columnar import ColumnarCatalog, ColumnarRow
+from product_store import ProductStore
+
+
+def product(i, **fields):
+    return {
+        '_id': f'p{i}', 'id': f'p{i}', 'name': f'Jutti {i}', 'category': 'men',
+        'productType': 'jutti', 'price': 1500, 'stock': i, 'sizes': ['UK 7', 'UK 8'],
+        'isActive': True, **fields,
+    }
+
+
+def test_round_trip_keeps_types_order_and_extras():
+    products = [
+        product(1),
+        # Floats stay floats, ints stay ints
+        product(2, price=1500.0, rating=4),
+        # Bools are not numbers, and 1/True/1.0 are not one value
+        product(3, stock=True, featured=1, inStock=1.0, isActive=False),
+        # Key order, unknown keys and values of unexpected types
+        {'name': 'Odd', 'id': 'p4', 'vendor': {'city': 'Amritsar'}, 'price': '₹1,500',
+         'sizes': [['UK', 7]], 'category': None, 'stock': 2 ** 70},
+    ]
+    catalog = ColumnarCatalog(products)
+
+    restored = catalog.to_products()
+    assert json.dumps(restored) == json.dumps(products)
+    for original, copy in zip(products, restored):
+        assert list(copy) == list(original)
+        for key, value in original.items():
+            assert type(copy[key]) is type(value)
+    assert catalog[1]['price'] == 1500.0 and isinstance(catalog[1]['price'], float)
+    assert catalog[0]['price'] == 1500 and isinstance(catalog[0]['price'], int)
+    assert catalog[2]['stock'] is True
+    assert 'rating' not in catalog[0]
+
+
+def tracked_store(products):
+    catalog = ColumnarCatalog()
+    store = ProductStore()
+    catalog.track(store)
+    for record in catalog.pack(products):
+        store.add(record)
+    return catalog, store
+
+
+def test_edited_and_deleted_rows_are_freed():
+    catalog, store = tracked_store([product(i, description='long text ' * 20) for i in range(3)])
+    view = store.get('p1')
+    store.update('p1', {'price': 999})
+    deleted = store.delete('p2')
+
+    assert len(catalog) == 1
+    assert catalog.columns['description'].values[1:] == [None, None]
+    assert catalog.row_keys(2) == ()
+    # Views handed out before keep the product as it was
+    assert isinstance(view, ColumnarRow)
+    assert view['price'] == 1500 and dict(deleted)['name'] == 'Jutti 2'
+    assert store.get('p1')['price'] == 999
+    assert [p['id'] for p in catalog.to_products()] == ['p0']
+
+
+def test_rows_are_kept_while_readers_may_be_inside_them():
+    catalog = ColumnarCatalog()
+    store = ProductStore()
+    busy = [True]
+    catalog.track(store, idle=lambda: not busy[0])
+    for record in catalog.pack([product(1)]):
+        store.add(record)
+
+    store.delete('p1')
+    assert catalog.row_keys(0) != ()
+    busy[0] = False
+    catalog.reclaim()
+    assert catalog.row_keys(0) == ()
+
+
+def test_products_without_an_id_stay_dicts():
+    catalog, store = tracked_store([{'name': 'No ID'}, product(1)])
+    assert len(catalog) == 1
+    assert len(store) == 2
+
+
+def test_backend_loads_columnar(tmp_path):
+    path = str(tmp_path / 'products.json')
+    products = [product(i) for i in range(5)] + [product(1, name='Duplicate')]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'products': products}, f)
+
+    backend = open_backend('json', path, memory_mode='columnar')
+    store = backend.load()
+    assert all(isinstance(p, ColumnarRow) for p in store)
+    assert store.get('p1')['name'] == 'Duplicate'
+
+    with backend.transaction() as store:
+        store.update('p3', {'stock': 0})
+    full = open_backend('json', path, memory_mode='full')
+    assert full.get('p3')['stock'] == 0
+    assert [dict(p) for p in backend.all()] == full.all()
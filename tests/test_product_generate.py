@@ -0,0 +1,20 @@
+import io
+import json
+
+from product_generate import generate_catalog, write_catalog_stream
+from product_store import validate_product
+
+
+def test_generated_products_are_valid():
+    for product in generate_catalog(2000, seed=1):
+        validated = validate_product(product)
+        assert validated['category'] == product['category']
+        assert validated['subcategory'] == product['subcategory']
+
+
+def test_same_seed_gives_same_file():
+    first, second = io.BytesIO(), io.BytesIO()
+    write_catalog_stream(first, 100, seed=3)
+    write_catalog_stream(second, 100, seed=3)
+    assert first.getvalue() == second.getvalue()
+    assert len(json.loads(first.getvalue())['products']) == 100
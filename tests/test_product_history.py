@@ -0,0 +1,52 @@
+from product_history import History
+from product_store import ProductStore
+
+OLD = '2024-01-01T00:00:00'
+
+
+def jutti(key, **fields):
+    return dict({'_id': key, 'id': key, 'name': 'Jutti', 'price': 999, 'stock': 5, 'updatedAt': OLD}, **fields)
+
+
+def test_undo_and_redo_stamp_the_current_time():
+    store = ProductStore([jutti('p1')])
+    history = History()
+    with history.recording(store, "Edit"):
+        store.update('p1', {'price': 1499})
+    edited_at = store.get('p1')['updatedAt']
+
+    step, skipped = history.undo(store)
+    assert skipped == []
+    undone = store.get('p1')
+    assert undone['price'] == 999
+    assert undone['updatedAt'] not in (OLD, None)
+
+    step, skipped = history.redo(store)
+    assert skipped == []
+    assert store.get('p1')['price'] == 1499
+    assert store.get('p1')['updatedAt'] >= edited_at
+
+
+def test_undo_of_delete_and_redo_of_it():
+    store = ProductStore([jutti('p1'), jutti('p2')])
+    history = History()
+    with history.recording(store, "Delete"):
+        store.delete('p2')
+
+    history.undo(store)
+    assert store.get('p2')['name'] == 'Jutti'
+    assert store.get('p2')['updatedAt'] != OLD
+    step, skipped = history.redo(store)
+    assert skipped == [] and 'p2' not in store
+
+
+def test_product_changed_since_is_skipped():
+    store = ProductStore([jutti('p1')])
+    history = History()
+    with history.recording(store, "Edit"):
+        store.update('p1', {'price': 1499})
+    store.update('p1', {'price': 1599})
+
+    step, skipped = history.undo(store)
+    assert skipped == ['p1']
+    assert store.get('p1')['price'] == 1599
@@ -0,0 +1,146 @@
+import http.server
+import os
+import threading
+
+import pytest
+
+from product_images import ThumbnailCache, check_image, check_images, check_urls
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the cases the checker has to tell apart"""
+
+    def _reply(self, status, content_type=None, body=b''):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        if self.path.startswith('/no-head.png'):
+            self._reply(405)
+        else:
+            self.do_GET()
+
+    def do_GET(self):
+        self.server.requests.append((self.command, self.path, self.headers.get('Range')))
+        path = self.path.split('?', 1)[0]
+        if path in ('/image.png', '/no-head.png'):
+            ranged = self.headers.get('Range') == 'bytes=0-0'
+            self._reply(206 if ranged else 200, 'image/png', PNG[:1] if ranged else PNG)
+        elif path == '/page.html':
+            self._reply(200, 'text/html; charset=utf-8', b'<html></html>')
+        else:
+            self._reply(404, 'text/plain', b'not found')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_head_hit(server):
+    assert check_image(url(server, '/image.png'), timeout=5) == (True, 'image/png')
+
+
+def test_head_refused_falls_back_to_one_byte_get(server):
+    server.requests.clear()
+    assert check_image(url(server, '/no-head.png'), timeout=5) == (True, 'image/png')
+    assert ('GET', '/no-head.png', 'bytes=0-0') in server.requests
+
+
+def test_not_an_image(server):
+    assert check_image(url(server, '/page.html'), timeout=5) == (False, "Not an image (text/html)")
+
+
+def test_not_found(server):
+    ok, message = check_image(url(server, '/gone.png'), timeout=5)
+    assert not ok and message.startswith('HTTP 404')
+
+
+def test_local_files(tmp_path):
+    public = tmp_path / 'public'
+    public.mkdir()
+    (public / 'jutti.png').write_bytes(PNG)
+    (public / 'notes.txt').write_text('hello')
+    assert check_image('/jutti.png', public_dir=str(public)) == (True, 'image/png')
+    assert check_image('/missing.png', public_dir=str(public)) == (False, "Not found in " + str(public) + "/")
+    assert check_image('/notes.txt', public_dir=str(public)) == (False, "Not an image file")
+    assert not check_image('/../secret.png', public_dir=str(public))[0]
+
+
+def test_check_images_checks_each_url_once(server, tmp_path):
+    good, bad = url(server, '/image.png'), url(server, '/gone.png')
+    products = [{'id': f'p{i}', 'images': [good, bad]} for i in range(20)]
+    server.requests.clear()
+    checked, broken = check_images(products, workers=4, public_dir=str(tmp_path), timeout=5)
+    assert checked == 2
+    assert [key for key, _, _ in broken] == [f'p{i}' for i in range(20)]
+    assert len(server.requests) == 2
+
+
+def test_check_urls_reports_every_url(server):
+    urls = [url(server, f'/image.png?{i}') for i in range(50)]
+    seen = []
+    results = list(check_urls(urls, workers=8, timeout=5, progress=lambda done, total: seen.append(done)))
+    assert sorted(u for u, _, _ in results) == sorted(urls)
+    assert all(ok for _, ok, _ in results)
+    assert seen[-1] == 50
+
+
+def test_thumbnail_cache_evicts_least_recently_used(tmp_path):
+    public = tmp_path / 'public'
+    public.mkdir()
+    for name in 'abc':
+        (public / f'{name}.png').write_bytes(PNG + name.encode())
+
+    def make(data, size, path):
+        with open(path, 'wb') as f:
+            f.write(b'x' * 100)
+
+    cache = ThumbnailCache(str(tmp_path / 'thumbnails'), max_bytes=250, public_dir=str(public), make=make)
+    path_a, _ = cache.get('/a.png', 32)
+    path_b, _ = cache.get('/b.png', 32)
+    # Using a makes b the least recently used
+    assert cache.lookup('/a.png', 32) == path_a
+    path_c, _ = cache.get('/c.png', 32)
+
+    assert cache.usage() == (2, 200)
+    assert os.path.exists(path_a) and os.path.exists(path_c)
+    assert not os.path.exists(path_b)
+    assert cache.lookup('/b.png', 32) is None
+
+
+def test_same_image_shares_one_thumbnail(tmp_path):
+    public = tmp_path / 'public'
+    public.mkdir()
+    (public / 'one.png').write_bytes(PNG)
+    (public / 'copy.png').write_bytes(PNG)
+    made = []
+
+    def make(data, size, path):
+        made.append(path)
+        with open(path, 'wb') as f:
+            f.write(PNG)
+
+    cache = ThumbnailCache(str(tmp_path / 'thumbnails'), public_dir=str(public), make=make)
+    assert cache.get('/one.png', 32)[0] == cache.get('/copy.png', 32)[0]
+    assert len(made) == 1
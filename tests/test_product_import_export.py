@@ -0,0 +1,104 @@
+import pytest
+
+from product_export import encode_cell, export_products
+from product_generate import generate_catalog
+from product_import import ImportPlan, decode_cell, plan_import, read_csv
+from product_store import ProductStore, ValidationError
+
+TRICKY = {
+    '_id': 'product_1',
+    'id': 'product_1',
+    'name': '123',
+    'punjabiName': 'ਜੁੱਤੀ',
+    'category': 'men',
+    'subcategory': 'jutti',
+    'productType': 'jutti',
+    'price': 1499,
+    'originalPrice': 1999.5,
+    'stock': 0,
+    'isActive': False,
+    'sku': 'true',
+    'barcode': '007',
+    'note': 'null',
+    'code': '-12.5e3',
+    'low': '-Infinity',
+    'shape': '[1, 2]',
+    'quoted': '"Royal"',
+    'blank': '',
+    'sizes': ['UK 7', 'UK 8'],
+    'meta': {'weight': 1.5, 'tags': ['a,b', 'c"d']},
+    'description': 'Line one\nline "two", with commas',
+}
+
+
+@pytest.mark.parametrize('value', ['true', 'null', '123', '-1', '', '{"a":1}', '"x"', 'plain', '2024-01-01', '01'])
+def test_string_cells_read_back_as_strings(value):
+    for field in ('name', 'sku'):
+        assert decode_cell(field, encode_cell(value)) == value
+
+
+def test_typed_cells_read_back_typed():
+    for value in (0, 1499, -2.5, True, False, ['UK 7'], {'a': [1, None]}):
+        assert decode_cell('sku', encode_cell(value)) == value
+
+
+@pytest.mark.parametrize('name', ['products.csv', 'products.csv.gz'])
+def test_csv_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    products = [TRICKY] + list(generate_catalog(50, seed=2))
+    assert export_products(products, path) == len(products)
+
+    rows = list(read_csv(path))
+    assert [error for _, _, error in rows] == [None] * len(products)
+    for (_, product, _), original in zip(rows, products):
+        assert product == original
+
+
+def test_import_of_own_export_changes_nothing(tmp_path):
+    path = str(tmp_path / 'products.csv')
+    products = list(generate_catalog(50, seed=4))
+    export_products(products, path)
+    plan = plan_import(ProductStore(products), path)
+    assert plan.errors == []
+    assert plan.changes == {}
+
+
+def jutti(key, **fields):
+    return {'_id': key, 'id': key, 'name': f'Jutti {key}', 'productType': 'jutti', 'category': 'men',
+            'subcategory': 'jutti', 'price': 1499.0, 'stock': 5, 'updatedAt': 'before', **fields}
+
+
+def test_zero_price_and_stock_are_accepted():
+    plan = ImportPlan(ProductStore([jutti('p1')]))
+    plan.add_rows([(1, {'id': 'p1', 'stock': 0}, None), (2, {**jutti('p2'), 'price': '0'}, None)])
+    assert plan.errors == []
+    assert plan.changes['p1'][1]['stock'] == 0 and plan.changes['p2'][1]['price'] == 0.0
+
+
+def test_apply_replans_products_changed_since_the_preview():
+    store = ProductStore([jutti('p1'), jutti('p2'), jutti('p3'), jutti('p4')])
+    plan = ImportPlan(store)
+    plan.add_rows([(1, {'id': 'p1', 'stock': 9}, None), (2, {'id': 'p2', 'price': 999}, None),
+                   (3, {'id': 'p3', 'stock': 1}, None), (4, {'id': 'p4', 'stock': 2}, None)])
+
+    # Outside edits merged while the preview was open
+    store.update('p1', {'name': 'Renamed'}, touch=False)
+    store.update('p2', {'price': 999.0}, touch=False)
+    store.delete('p3')
+    assert plan.apply() == 3
+
+    assert (store.get('p1')['name'], store.get('p1')['stock']) == ('Renamed', 9)
+    assert store.get('p1')['updatedAt'] == plan.now
+    # Already as imported: left alone
+    assert store.get('p2')['updatedAt'] == 'before' and 'p2' in plan.unchanged
+    assert store.get('p3')['stock'] == 1 and store.get('p4')['stock'] == 2
+
+
+def test_apply_writes_nothing_if_a_changed_product_no_longer_validates():
+    store = ProductStore([jutti('p1'), jutti('p2')])
+    plan = ImportPlan(store)
+    plan.add_rows([(1, {'id': 'p1', 'stock': 9}, None), (2, {'id': 'p2', 'stock': 3}, None)])
+    store.update('p2', {'productType': ''}, touch=False)
+    with pytest.raises(ValidationError):
+        plan.apply()
+    assert store.get('p1')['stock'] == 5
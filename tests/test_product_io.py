@@ -0,0 +1,74 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from product_io import FileLock, LockTimeout
+
+
+def write_owner(lock_path, pid, host=None):
+    with open(lock_path, 'w', encoding='utf-8') as f:
+        json.dump({'pid': pid, 'host': host or socket.gethostname(), 'created': time.time()}, f)
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'products.json')
+    with FileLock(path):
+        with pytest.raises(LockTimeout):
+            FileLock(path, timeout=0.1).acquire()
+    with FileLock(path, timeout=0.1):
+        pass
+    assert not os.path.exists(path + '.lock')
+
+
+def test_old_lock_of_live_process_is_not_broken(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_owner(path + '.lock', os.getpid())
+    old = time.time() - 3600
+    os.utime(path + '.lock', (old, old))
+    with pytest.raises(LockTimeout):
+        FileLock(path, timeout=0.1, stale_after=1).acquire()
+
+
+def test_lock_of_dead_process_is_broken(tmp_path):
+    path = str(tmp_path / 'products.json')
+    child = subprocess.Popen([sys.executable, '-c', 'pass'])
+    child.wait()
+    write_owner(path + '.lock', child.pid)
+    with FileLock(path, timeout=1):
+        with open(path + '.lock', encoding='utf-8') as f:
+            assert json.load(f)['pid'] == os.getpid()
+
+
+def test_foreign_lock_is_broken_only_when_old(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_owner(path + '.lock', 1, host='some-other-host')
+    with pytest.raises(LockTimeout):
+        FileLock(path, timeout=0.1, stale_after=30).acquire()
+    old = time.time() - 60
+    os.utime(path + '.lock', (old, old))
+    with FileLock(path, timeout=1, stale_after=30):
+        pass
+
+
+def test_held_lock_is_kept_fresh(tmp_path):
+    path = str(tmp_path / 'products.json')
+    with FileLock(path, stale_after=0.3):
+        old = time.time() - 60
+        os.utime(path + '.lock', (old, old))
+        time.sleep(0.3)
+        assert time.time() - os.path.getmtime(path + '.lock') < 1
+
+
+def test_release_leaves_someone_elses_lock(tmp_path):
+    path = str(tmp_path / 'products.json')
+    lock = FileLock(path).acquire()
+    # Broken by another process, which then took the lock itself
+    os.remove(path + '.lock')
+    write_owner(path + '.lock', os.getpid() + 1)
+    lock.release()
+    assert os.path.exists(path + '.lock')
@@ -0,0 +1,110 @@
+import json
+import os
+
+from product_journal import ChangeJournal
+from product_store import ProductStore
+
+
+def jutti(key, **fields):
+    return dict({'_id': key, 'id': key, 'name': 'Jutti', 'price': 999, 'stock': 5}, **fields)
+
+
+def journal_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_replay_applies_changes_and_is_idempotent(tmp_path):
+    journal = ChangeJournal(str(tmp_path / 'products.journal.jsonl'), sync=False)
+    journal.append('add', 'p3', jutti('p3'))
+    journal.append('update', 'p1', jutti('p1', price=1499))
+    journal.append('delete', 'p2')
+
+    store = ProductStore([jutti('p1'), jutti('p2')])
+    assert journal.replay(store) == 3
+    journal.replay(store)
+    assert store.keys() == ['p1', 'p3']
+    assert store.get('p1')['price'] == 1499
+
+
+def test_checkpoint_keeps_changes_made_during_the_save(tmp_path):
+    path = str(tmp_path / 'products.journal.jsonl')
+    journal = ChangeJournal(path, sync=False)
+    journal.append('update', 'p1', jutti('p1', price=1))
+    saved_at = journal.seq
+    journal.append('update', 'p2', jutti('p2', price=2))
+    journal.checkpoint(saved_at)
+
+    lines = journal_lines(path)
+    assert [(e['op'], e['seq']) for e in lines] == [('checkpoint', 1), ('update', 2)]
+    assert journal.pending == 1
+    entries, complete = ChangeJournal(path).entries_since(1)
+    assert complete and [e['id'] for e in entries] == ['p2']
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    path = str(tmp_path / 'products.journal.jsonl')
+    ChangeJournal(path, sync=False).append('delete', 'p1')
+    with open(path, 'ab') as f:
+        f.write(b'{"seq":2,"op":"upd')
+    journal = ChangeJournal(path, sync=False)
+    assert journal.seq == 1
+    assert journal.append('delete', 'p2')['seq'] == 2
+    assert [e['seq'] for e in journal_lines(path)] == [1, 2]
+
+
+def test_processes_sharing_the_journal_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / 'products.journal.jsonl')
+    gui = ChangeJournal(path, sync=False)
+    cli = ChangeJournal(path, sync=False)
+    gui.append('update', 'p1', jutti('p1', price=1))
+    cli.append('update', 'p2', jutti('p2', price=2))
+    gui.append('update', 'p3', jutti('p3', price=3))
+    assert [e['seq'] for e in journal_lines(path)] == [1, 2, 3]
+
+    # The GUI's save has its own changes but not the other process's
+    gui.checkpoint(gui.seq)
+    lines = journal_lines(path)
+    assert [(e['op'], e.get('id')) for e in lines] == [('update', 'p2'), ('checkpoint', None)]
+    assert cli.append('delete', 'p4')['seq'] == 4
+
+    cli.checkpoint()
+    assert [e['op'] for e in journal_lines(path)] == ['checkpoint']
+
+
+def test_batch_is_written_together_when_it_ends(tmp_path):
+    path = str(tmp_path / 'products.journal.jsonl')
+    journal = ChangeJournal(path, sync=False)
+    store = ProductStore([jutti('p1'), jutti('p2')])
+    store.subscribe(journal.record)
+
+    with journal.batch():
+        store.update('p1', {'price': 1499})
+        store.delete('p2')
+        store.put(jutti('p3'))
+        assert not os.path.exists(path)
+    store.update('p3', {'stock': 0})
+
+    # Still one line per change, so tailers read a batch like any other edits
+    lines = journal_lines(path)
+    assert [(e['seq'], e['op'], e['id']) for e in lines] == [
+        (1, 'update', 'p1'), (2, 'delete', 'p2'), (3, 'add', 'p3'), (4, 'update', 'p3')]
+    assert journal.pending == 4
+
+    replayed = ProductStore([jutti('p1'), jutti('p2')])
+    ChangeJournal(path).replay(replayed)
+    assert replayed.keys() == ['p1', 'p3'] and replayed.get('p3')['stock'] == 0
+
+
+def test_batch_keeps_the_changes_made_before_an_error(tmp_path):
+    path = str(tmp_path / 'products.journal.jsonl')
+    journal = ChangeJournal(path, sync=False)
+    store = ProductStore([jutti('p1')])
+    store.subscribe(journal.record)
+    try:
+        with journal.batch():
+            store.delete('p1')
+            raise RuntimeError("halfway")
+    except RuntimeError:
+        pass
+    assert [e['op'] for e in journal_lines(path)] == ['delete']
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from product_loader import CatalogIndex, IndexOutdated, index_products
+
+
+def write_catalog(path, products):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(products, f, indent=2)
+
+
+def indexed(path):
+    index = CatalogIndex(path)
+    records = list(index_products(path, index))
+    return index, records
+
+
+def test_index_reads_full_records(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [{'id': f'p{i}', 'name': f'Product {i}', 'description': 'x' * i} for i in range(50)])
+    index, records = indexed(path)
+    assert len(index) == 50
+    assert all(partial for _, partial in records)
+    assert index.read('p7')['description'] == 'x' * 7
+    index.close()
+
+
+def test_index_survives_atomic_replace(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [{'id': 'p1', 'name': 'Old'}])
+    index, _ = indexed(path)
+    write_catalog(path + '.tmp', [{'id': 'p1', 'name': 'New'}])
+    os.replace(path + '.tmp', path)
+    assert index.read('p1')['name'] == 'Old'
+    index.close()
+
+
+def test_index_refuses_file_rewritten_in_place(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [{'id': 'p1', 'name': 'Old'}, {'id': 'p2', 'name': 'Other'}])
+    index, _ = indexed(path)
+    # What fs.writeFileSync() does: truncate and write the same inode
+    write_catalog(path, [{'id': 'p2', 'name': 'Moved up'}, {'id': 'p1', 'name': 'New'}])
+    with pytest.raises(IndexOutdated):
+        index.read('p1')
+    index.close()
@@ -0,0 +1,137 @@
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from product_manager import build_parser, main
+from product_store import save_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def product(key, **fields):
+    return {'_id': key, 'id': key, 'name': f'Jutti {key}', 'productType': 'jutti', 'category': 'men',
+            'subcategory': 'jutti', 'price': 1499, 'stock': 5, **fields}
+
+
+@pytest.fixture
+def products_file(tmp_path):
+    path = str(tmp_path / 'data' / 'products.json')
+    os.makedirs(os.path.dirname(path))
+    save_catalog(path, [product('p1'), product('p2', category='women', stock=0)])
+    return path
+
+
+@pytest.fixture
+def run(products_file, capsys, monkeypatch):
+    """Run the CLI on the test catalog, returning (exit code, stdout, stderr)"""
+    def run(*argv, stdin=''):
+        monkeypatch.setattr(sys, 'stdin', io.StringIO(stdin))
+        code = main(['--file', products_file, *argv])
+        out, err = capsys.readouterr()
+        return code, out, err
+    return run
+
+
+def lines(out):
+    return [json.loads(line) for line in out.splitlines()]
+
+
+def test_parser_wiring():
+    parser = build_parser()
+    args = parser.parse_args(['--backend', 'sqlite', 'update', 'p1', '--set', 'price=1', '--set', 'stock=2'])
+    assert (args.backend, args.command, args.id, args.set) == ('sqlite', 'update', 'p1', ['price=1', 'stock=2'])
+    assert parser.parse_args([]).command is None
+    with pytest.raises(SystemExit) as exit_info:
+        parser.parse_args(['batch', '--activate', '--deactivate'])
+    assert exit_info.value.code == 2
+
+
+def test_list_and_get(run):
+    code, out, _ = run('list', '--out-of-stock', '--fields', 'id,stock')
+    assert (code, lines(out)) == (0, [{'id': 'p2', 'stock': 0}])
+    code, out, _ = run('list', '--format', 'json')
+    assert [p['id'] for p in json.loads(out)] == ['p1', 'p2']
+
+    code, out, err = run('get', 'p1', 'missing')
+    assert code == 1
+    assert [p['id'] for p in lines(out)] == ['p1']
+    assert 'Product not found: missing' in err
+
+
+def test_add_update_delete(run):
+    code, out, _ = run('add', stdin=json.dumps({'name': 'New', 'productType': 'fulkari', 'category': 'women',
+                                                 'price': 999, 'stock': 0}))
+    assert code == 0
+    new_id = lines(out)[0]['id']
+
+    code, out, _ = run('update', new_id, '--set', 'price=1099', '--set', 'sizes=["Free"]')
+    assert (code, lines(out)[0]['price'], lines(out)[0]['sizes']) == (0, 1099.0, ['Free'])
+
+    code, _, err = run('update', 'missing', '--set', 'price=1')
+    assert (code, err.strip()) == (1, 'Error: Product not found: missing')
+    code, _, err = run('update', new_id, '--set', 'price=free')
+    assert code == 1 and 'price' in err
+
+    code, out, _ = run('delete', new_id)
+    assert (code, lines(out)[0]['id']) == (0, new_id)
+    assert run('get', new_id)[0] == 1
+
+
+def test_invalid_products_are_reported_and_the_rest_added(run):
+    items = [{'name': 'No type', 'category': 'men', 'price': 1, 'stock': 1},
+             {'name': 'Fine', 'productType': 'jutti', 'category': 'men', 'price': 1, 'stock': 1}]
+    code, out, err = run('add', stdin='\n'.join(json.dumps(item) for item in items))
+    assert code == 1
+    assert [p['name'] for p in lines(out)] == ['Fine']
+    assert err.startswith('Product 1:')
+
+
+def test_export_to_stdout(run):
+    code, out, err = run('export', '-')
+    assert code == 0
+    rows = list(csv.DictReader(io.StringIO(out)))
+    assert [row['id'] for row in rows] == ['p1', 'p2']
+    assert rows[1]['stock'] == '0'
+    assert 'Exported 2 products' in err
+
+
+def test_backup_note_is_kept_when_nothing_changed(run):
+    code, out, _ = run('backup')
+    first = lines(out)[0]
+    assert (code, first['note']) == (0, '')
+
+    code, out, err = run('backup', '--note', 'before sale')
+    assert code == 0
+    assert lines(out)[0]['id'] == first['id']
+    assert 'the note was added' in err
+    code, out, _ = run('backup', '--list')
+    assert [s['note'] for s in lines(out)] == ['before sale']
+
+    code, _, err = run('restore', 'missing')
+    assert (code, err.strip()) == (1, 'Error: No snapshot with ID missing')
+
+
+def test_batch_dry_run_and_ids_with_filters(run):
+    code, out, err = run('batch', '--all', '--price', '+10%', '--dry-run')
+    assert code == 0 and '2 products to change' in err
+    assert lines(run('get', 'p1')[1])[0]['price'] == 1499
+
+    code, _, err = run('batch', 'p1', '--category', 'men', '--stock', '1')
+    assert code == 1 and 'either IDs or filters' in err
+    code, _, err = run('batch', '--all')
+    assert code == 1 and 'Nothing to change' in err
+
+
+def test_runs_headless_without_tkinter(products_file):
+    # Checked in a fresh interpreter: importing product_manager must not load the GUI
+    script = ("import sys, product_manager; code = product_manager.main(sys.argv[1:]); "
+              "assert 'tkinter' not in sys.modules; sys.exit(code)")
+    result = subprocess.run([sys.executable, '-c', script, '--file', products_file, 'get', 'p1'],
+                            cwd=ROOT, capture_output=True, text=True, env={**os.environ, 'DISPLAY': ''})
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)['id'] == 'p1'
@@ -0,0 +1,47 @@
+from product_merge import SyncState, merge_record
+from product_store import ProductStore
+
+BASE = {'id': 'p1', 'name': 'Jutti', 'price': 1499, 'stock': 10, 'updatedAt': '2024-01-01T00:00:00'}
+
+
+def edited(**changes):
+    product = dict(BASE, updatedAt='2024-02-01T00:00:00')
+    product.update(changes)
+    return product
+
+
+def test_one_sided_change_is_taken():
+    theirs = edited(price=1599)
+    assert merge_record(BASE, BASE, theirs) == (theirs, [])
+    assert merge_record(BASE, theirs, BASE) == (theirs, [])
+
+
+def test_fields_changed_on_different_sides_are_combined():
+    merged, conflicts = merge_record(BASE, edited(price=1599), edited(stock=3))
+    assert (merged['price'], merged['stock'], conflicts) == (1599, 3, [])
+
+
+def test_field_changed_on_both_sides_keeps_ours_and_reports_it():
+    merged, conflicts = merge_record(BASE, edited(price=1599), edited(price=1699, stock=3))
+    assert (merged['price'], merged['stock'], conflicts) == (1599, 3, ['price'])
+
+
+def test_deleted_on_one_side_and_changed_on_the_other_is_kept():
+    ours = edited(price=1599)
+    assert merge_record(BASE, ours, None) == (ours, ['deleted'])
+    assert merge_record(BASE, None, ours) == (ours, ['deleted'])
+    assert merge_record(BASE, None, BASE) == (None, [])
+
+
+def test_apply_merges_only_locally_edited_products():
+    store = ProductStore([dict(BASE), dict(BASE, id='p2', name='Fulkari')])
+    sync = SyncState()
+    sync.versions = {'p1': BASE['updatedAt'], 'p2': BASE['updatedAt']}
+    store.subscribe(sync.on_change)
+    store.update('p1', {'price': 1599})
+
+    theirs = {'p1': edited(stock=3), 'p2': dict(BASE, id='p2', name='Phulkari', updatedAt='2024-03-01T00:00:00')}
+    conflicts = sync.apply(store, theirs, [], ('inode', 1, 1))
+    assert conflicts == []
+    assert (store.get('p1')['price'], store.get('p1')['stock']) == (1599, 3)
+    assert store.get('p2')['name'] == 'Phulkari'
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import product_metrics
+from product_metrics import Metrics, TimerStats
+
+
+def test_percentiles_of_recent_samples():
+    stats = TimerStats()
+    for ms in range(1, 101):
+        stats.add(ms / 1000)
+    summary = stats.summary()
+    assert (summary['count'], summary['min'], summary['max'], summary['last']) == (100, 0.001, 0.1, 0.1)
+    assert summary['mean'] == pytest.approx(0.0505)
+    assert (summary['p50'], summary['p95']) == (0.051, 0.096)
+
+    assert TimerStats().summary()['p95'] == 0.0
+    single = TimerStats()
+    single.add(2.0)
+    assert single.summary()['p50'] == single.summary()['p95'] == 2.0
+
+
+def test_percentiles_only_use_the_most_recent_durations(monkeypatch):
+    monkeypatch.setattr(product_metrics, 'RECENT_SAMPLES', 10)
+    stats = TimerStats()
+    for _ in range(50):
+        stats.add(9.0)
+    for _ in range(10):
+        stats.add(1.0)
+    summary = stats.summary()
+    assert (summary['p95'], summary['max'], summary['count']) == (1.0, 9.0, 60)
+
+
+def test_a_block_that_raises_is_counted_as_failed():
+    metrics = Metrics()
+    with metrics.timer('save'):
+        pass
+    with pytest.raises(OSError):
+        with metrics.timer('save'):
+            raise OSError("disk full")
+    metrics.stop(metrics.start('save'), failed=True)
+
+    summary = metrics.snapshot()['timers']['save']
+    assert (summary['count'], summary['errors']) == (3, 2)
+
+
+def test_profile_next_captures_one_run(tmp_path):
+    metrics = Metrics()
+    metrics.profile_next('load', memory=False)
+    assert metrics.armed() == ['load']
+    with metrics.timer('load'):
+        sum(range(1000))
+    with metrics.timer('load'):
+        pass
+
+    assert metrics.armed() == []
+    [capture] = metrics.snapshot()['captures']
+    assert capture['name'] == 'load' and 'cumulative' in capture['cpu'] and capture['memory'] is None
+
+    path = str(tmp_path / 'metrics.json')
+    metrics.dump(path)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['captures'][0]['name'] == 'load'
+
+
+def test_only_one_capture_runs_at_a_time():
+    metrics = Metrics()
+    metrics.profile_next('save', memory=False)
+    metrics.profile_next('save.encode', memory=False)
+    with metrics.timer('save'):
+        # Nested inside a capture: timed, but its capture stays armed
+        with metrics.timer('save.encode'):
+            pass
+    assert [c['name'] for c in metrics.snapshot()['captures']] == ['save']
+    assert metrics.armed() == ['save.encode']
+
+    with metrics.timer('save.encode'):
+        pass
+    assert [c['name'] for c in metrics.snapshot()['captures']] == ['save', 'save.encode']
+    assert metrics.snapshot()['timers']['save.encode']['count'] == 2
@@ -0,0 +1,125 @@
+import unicodedata
+
+import pytest
+
+import product_search
+from product_search import SearchIndex, tokenize
+from product_store import ProductStore
+
+
+def product(key, name, **fields):
+    return {'_id': key, 'id': key, 'name': name, 'category': 'men', 'productType': 'jutti', **fields}
+
+
+@pytest.fixture
+def store():
+    return ProductStore([
+        product('p1', 'Punjabi Jutti', punjabiName='ਪੰਜਾਬੀ ਜੁੱਤੀ', sizes=['UK 7', 'UK 8'], colors=['red']),
+        product('p2', 'Phulkari Dupatta', category='women', productType='fulkari', colors=['red', 'gold']),
+        product('p3', 'Bridal Jutti', category='women', sizes=['UK 8'], tags=['wedding']),
+        product('p4', 'Kids Jutti', category='kids', description='Soft sole for ਬੱਚੇ'),
+    ])
+
+
+def test_gurmukhi_words_keep_their_vowel_signs():
+    assert tokenize('ਪੰਜਾਬੀ ਜੁੱਤੀ') == ['ਪੰਜਾਬੀ', 'ਜੁੱਤੀ']
+    # A zero-width non-joiner typed inside a word does not split it
+    assert tokenize('ਪੰ‌ਜਾਬੀ') == ['ਪੰਜਾਬੀ']
+
+
+def test_composed_and_decomposed_gurmukhi_match():
+    # ਸ਼ਾਲ with the precomposed ਸ਼, which NFC splits into ਸ and the nukta
+    composed = '\u0a36\u0a3e\u0a32'
+    decomposed = unicodedata.normalize('NFD', composed)
+    assert composed != decomposed
+    assert tokenize(composed) == tokenize(decomposed)
+
+    index = SearchIndex(ProductStore([product('p1', 'Shawl', punjabiName=decomposed)]))
+    assert index.search(composed).keys() == ['p1']
+
+
+def test_case_and_punctuation_are_ignored():
+    assert tokenize('Phulkari, RED-dupatta!') == ['phulkari', 'red', 'dupatta']
+
+
+def test_every_query_word_must_match(store):
+    index = SearchIndex(store)
+    assert index.search('jutti').keys() == ['p1', 'p3', 'p4']
+    assert index.search('bridal jutti').keys() == ['p3']
+    assert index.search('ਜੁੱਤੀ').keys() == ['p1']
+    assert index.search('ਬੱਚੇ').keys() == ['p4']
+    assert index.search('wedding').keys() == ['p3']
+    assert index.search('jutti missing').keys() == []
+
+
+def test_words_match_as_prefixes(store):
+    index = SearchIndex(store)
+    assert index.search('jut').keys() == ['p1', 'p3', 'p4']
+    assert index.search('ph').keys() == ['p2']
+    assert index.search('ਪੰਜਾ').keys() == ['p1']
+    # Single characters only match whole words
+    assert index.search('p').keys() == []
+
+
+def test_facet_filters_and_counts(store):
+    index = SearchIndex(store)
+    assert index.facet_counts('category') == {'men': 1, 'women': 2, 'kids': 1}
+    assert index.facet_counts('colors') == {'red': 2, 'gold': 1}
+
+    result = index.search('jutti', {'category': 'women'})
+    assert result.keys() == ['p3']
+    result = index.search('jutti')
+    assert index.facet_counts('sizes', result) == {'UK 7': 1, 'UK 8': 2}
+    assert index.facet_counts('category', result) == {'men': 1, 'women': 1, 'kids': 1}
+    assert index.search('', {'colors': 'red', 'category': 'women'}).keys() == ['p2']
+    assert index.search('', {'colors': 'blue'}).keys() == []
+
+
+def test_index_follows_store_changes(store):
+    index = SearchIndex(store)
+    store.update('p1', {'name': 'Golden Mojari', 'punjabiName': ''})
+    store.delete('p3')
+    store.put(product('p5', 'Velvet Jutti', colors=['red']))
+    assert index.search('jutti').keys() == ['p4', 'p5']
+    assert index.search('mojari').keys() == ['p1']
+    assert index.facet_counts('colors') == {'red': 3, 'gold': 1}
+    store.replace_all([product('q1', 'Jutti')])
+    assert index.search('jutti').keys() == ['q1']
+
+
+def test_result_is_paged_without_listing_every_key():
+    store = ProductStore([product(f'p{i}', 'Jutti' if i % 3 else 'Dupatta') for i in range(3000)])
+    index = SearchIndex(store)
+    result = index.search('jutti')
+    expected = [f'p{i}' for i in range(3000) if i % 3]
+    assert len(result) == 2000
+    assert result[:3] == ['p1', 'p2', 'p4']
+    assert result[1500:1503] == expected[1500:1503]
+    assert result[-1] == 'p2999' and result[1999] == 'p2999'
+    assert result.index('p4') == 2
+    assert 'p3' not in result and 'p4' in result
+    with pytest.raises(ValueError):
+        result.index('p3')
+    assert list(result) == expected
+
+
+def test_rows_of_deleted_products_are_compacted(monkeypatch):
+    monkeypatch.setattr(product_search, 'COMPACT_MIN', 10)
+    store = ProductStore([product(f'p{i}', f'Jutti {i % 2}') for i in range(40)])
+    index = SearchIndex(store)
+    before = index.search('jutti')
+    for i in range(20):
+        store.delete(f'p{i}')
+    assert len(index.row_keys) == 40
+    store.delete('p20')
+
+    # More empty rows than live ones: renumbered in catalog order
+    assert len(index.row_keys) == 19
+    assert index.search('jutti').keys() == [f'p{i}' for i in range(21, 40)]
+    assert index.search('1').keys() == [f'p{i}' for i in range(21, 40) if i % 2]
+    # A result from before keeps the numbering it was made with
+    assert before[:2] == ['p0', 'p1']
+
+    store.put(product('p0', 'Jutti again'))
+    assert index.search('again').keys() == ['p0']
+    assert index.search('jutti')[-1] == 'p0'
@@ -0,0 +1,115 @@
+import pytest
+
+from product_store import ProductStore
+
+
+def product(key, **fields):
+    return {'_id': key, 'id': key, 'name': f'Jutti {key}', 'category': 'men', 'productType': 'jutti',
+            'price': 1499, 'stock': 5, **fields}
+
+
+@pytest.fixture
+def store():
+    return ProductStore([product('p1'), product('p2', category='women'), product('p3', productType='fulkari')])
+
+
+def test_products_are_found_by_id_or_legacy_id():
+    store = ProductStore([{'id': 'old1', 'name': 'Only id'}, {'_id': 'k2', 'id': 'alias2', 'name': 'Both'}])
+    assert store.get('old1')['name'] == 'Only id'
+    assert store.get('k2') is store.get('alias2')
+    assert 'alias2' in store and 'missing' not in store
+    assert store.get(None) is None
+
+
+def test_numeric_ids_from_the_treeview_are_resolved():
+    store = ProductStore([{'id': '123', 'name': 'Numeric'}])
+    assert store.get(123)['name'] == 'Numeric'
+
+
+def test_put_get_delete(store):
+    store.put(product('p4'))
+    assert store.keys() == ['p1', 'p2', 'p3', 'p4']
+
+    replaced = product('p2', price=999)
+    store.put(replaced)
+    assert store.get('p2') is replaced
+    # Replacing keeps the catalog order
+    assert store.keys() == ['p1', 'p2', 'p3', 'p4']
+
+    assert store.delete('p1')['name'] == 'Jutti p1'
+    assert store.get('p1') is None
+    assert store.delete('p1') is None
+    assert len(store) == 3
+
+
+def test_add_refuses_duplicates_and_generates_missing_ids(store):
+    with pytest.raises(ValueError):
+        store.add(product('p1'))
+    added = store.add({'name': 'New'})
+    assert added['_id'] == added['id'] and store.get(added['id']) is added
+
+
+def test_update_merges_and_touches(store):
+    updated = store.update('p1', {'price': 1599})
+    assert (updated['price'], updated['stock']) == (1599, 5)
+    assert 'updatedAt' in updated
+    assert 'updatedAt' not in store.update('p2', {'stock': 1}, touch=False)
+    with pytest.raises(KeyError):
+        store.update('missing', {})
+
+
+def test_secondary_indexes_follow_changes(store):
+    assert [p['id'] for p in store.filter(category='men')] == ['p1', 'p3']
+    assert [p['id'] for p in store.filter(category='men', productType='fulkari')] == ['p3']
+    store.update('p1', {'category': 'women'})
+    store.delete('p3')
+    assert store.filter(category='men') == []
+    assert store.facet_counts('category') == {'women': 2}
+    with pytest.raises(ValueError):
+        store.filter(name='Jutti p1')
+
+
+def test_listeners_are_told_about_every_change(store):
+    events = []
+
+    def listener(op, key, old, new):
+        events.append((op, key, old and old['price'], new and new['price']))
+
+    store.subscribe(listener)
+    store.put(product('p4'))
+    store.update('p4', {'price': 1599})
+    store.delete('p4')
+    assert events == [('add', 'p4', None, 1499), ('update', 'p4', 1499, 1599), ('delete', 'p4', 1599, None)]
+
+    store.unsubscribe(listener)
+    store.put(product('p5'))
+    assert len(events) == 3
+
+
+def test_replace_all_sends_one_reset(store):
+    events = []
+    store.subscribe(lambda *event: events.append(event))
+    store.replace_all([product('a'), product('b'), product('a', name='Last wins')])
+    assert events == [('reset', None, None, None)]
+    assert store.keys() == ['b', 'a']
+    assert store.get('a')['name'] == 'Last wins'
+    assert store.filter(category='men') and store.get('p1') is None
+
+
+def test_sorting_is_typed_and_stable():
+    store = ProductStore([product('a', price='₹1,200'), product('b', price=900), product('c', price=None),
+                          product('d', price=900, name='Another')])
+    assert store.sort_keys(store.keys(), [('price', False)]) == ['b', 'd', 'a', 'c']
+    assert store.sort_keys(store.keys(), [('price', False), ('name', True)]) == ['b', 'd', 'a', 'c']
+    store.update('a', {'price': 100})
+    assert store.sort_keys(store.keys(), [('price', False)])[0] == 'a'
+
+
+def test_lookup_reads_partial_records_without_keeping_them():
+    full = product('p1', description='Hand stitched')
+    store = ProductStore(materialize=lambda key: dict(full))
+    store.add({'_id': 'p1', 'id': 'p1', 'name': 'Jutti p1'}, partial=True)
+    assert store.lookup('p1') == full
+    assert store.is_partial('p1')
+    assert store.lookup('missing') is None
+    assert store.get('p1') == full and not store.is_partial('p1')
@@ -0,0 +1,47 @@
+import time
+
+from product_tasks import TaskExecutor
+
+
+def run_until_idle(executor, scheduled):
+    deadline = time.monotonic() + 5
+    while scheduled and time.monotonic() < deadline:
+        time.sleep(0.01)
+        scheduled.pop(0)()
+
+
+def test_group_waits_for_callback_before_next_task():
+    scheduled = []
+    executor = TaskExecutor(lambda delay, callback: scheduled.append(callback))
+    state = {'signature': 0}
+    seen = []
+
+    def save(task, n):
+        seen.append((n, state['signature']))
+        time.sleep(0.02)
+        return n
+
+    def saved(task, n):
+        # Slow enough that a save started before this returned would see the old value
+        time.sleep(0.05)
+        state['signature'] = n
+
+    for n in (1, 2, 3):
+        executor.submit("Saving", save, n, group='catalog', on_done=saved)
+    run_until_idle(executor, scheduled)
+
+    # Each save starts from what the one before it left
+    assert seen == [(1, 0), (2, 1), (3, 2)]
+    assert not executor.busy()
+    executor.shutdown()
+
+
+def test_finished_task_is_not_busy_in_its_callback():
+    scheduled = []
+    executor = TaskExecutor(lambda delay, callback: scheduled.append(callback))
+    busy = []
+    executor.submit("Saving", lambda task: None, group='catalog',
+                    on_done=lambda task, result: busy.append(executor.busy('catalog')))
+    run_until_idle(executor, scheduled)
+    assert busy == [False]
+    executor.shutdown()
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+import product_watch
+from product_io import atomic_write_bytes
+from product_watch import FileWatcher, file_signature
+
+
+class Scheduler:
+    """Stands in for root.after: ticks run when the test calls run()"""
+
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, delay_ms, callback):
+        self.pending.append(callback)
+
+    def run(self, changes, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not changes and time.monotonic() < deadline:
+            callbacks, self.pending = self.pending, []
+            for callback in callbacks:
+                callback()
+            time.sleep(0.01)
+
+
+def write_catalog(path, products):
+    atomic_write_bytes(path, json.dumps({'products': products}).encode('utf-8'))
+
+
+@pytest.fixture(autouse=True)
+def no_settle_delay(monkeypatch):
+    monkeypatch.setattr(product_watch, 'SETTLE_MS', 0)
+
+
+@pytest.mark.parametrize('use_inotify', [True, False])
+def test_rewrite_by_another_program_is_reported(tmp_path, use_inotify):
+    if use_inotify and not sys.platform.startswith('linux'):
+        pytest.skip("inotify is Linux only")
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [{'id': 'p1'}])
+    schedule = Scheduler()
+    changes = []
+    watcher = FileWatcher(path, schedule, changes.append, use_inotify=use_inotify)
+    assert watcher.mode == ('inotify' if use_inotify else 'polling')
+    watcher.start()
+
+    schedule.run(changes, timeout=0.2)
+    assert changes == []
+
+    write_catalog(path, [{'id': 'p1'}, {'id': 'p2'}])
+    schedule.run(changes)
+    assert changes == [file_signature(path)]
+    watcher.stop()
+
+
+def test_own_saves_are_not_reported(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [{'id': 'p1'}])
+    schedule = Scheduler()
+    changes = []
+    watcher = FileWatcher(path, schedule, changes.append)
+    watcher.start()
+
+    write_catalog(path, [{'id': 'p1', 'price': 1499}])
+    watcher.remember()
+    schedule.run(changes, timeout=0.3)
+    assert changes == []
+
+    # Nor while paused, e.g. during a save
+    paused = [True]
+    watcher.paused = lambda: paused[0]
+    write_catalog(path, [{'id': 'p2'}])
+    schedule.run(changes, timeout=0.3)
+    assert changes == []
+    paused[0] = False
+    schedule.run(changes)
+    assert len(changes) == 1
+    watcher.stop()
+
+
+def test_deleted_file_is_not_reported(tmp_path):
+    path = str(tmp_path / 'products.json')
+    write_catalog(path, [])
+    schedule = Scheduler()
+    changes = []
+    watcher = FileWatcher(path, schedule, changes.append)
+    watcher.start()
+    os.remove(path)
+    schedule.run(changes, timeout=0.3)
+    assert changes == []
+    watcher.stop()